@@ -0,0 +1,109 @@
+"""Measure the cold import time of miniflux-ai with ``python -X importtime``.
+
+Each run imports ``main`` in a fresh interpreter, from a temporary directory
+holding a minimal config.yml, and prints a JSON report with the median total
+and the slowest modules:
+
+    python benchmarks/import_time.py --provider gemini --repeat 5
+
+As a regression gate it exits with status 1 when the median exceeds
+``--max-ms`` or when a provider SDK is imported before the first LLM request:
+
+    python benchmarks/import_time.py --max-ms 600
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# provider SDKs are only imported by core.llm_providers when the first request is made, the tracing SDK once tracing is enabled
+LAZY_MODULES = ('openai', 'google.genai', 'opentelemetry')
+
+CONFIG_TEMPLATE = """\
+miniflux:
+  base_url: http://127.0.0.1:9
+  api_key: benchmark
+  webhook_secret: benchmark
+llm:
+  provider: {provider}
+  base_url: http://127.0.0.1:9
+  api_key: benchmark
+  model: benchmark
+agents:
+  summary:
+    title: "Summary: "
+    prompt: "Summarize"
+"""
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative microseconds} from ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        modules[name] = max(modules.get(name, 0), int(cumulative))
+    return modules
+
+
+def measure_import(module='main', provider='openai'):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        Path(tmpdir, 'config.yml').write_text(CONFIG_TEMPLATE.format(provider=provider), encoding='utf8')
+        env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), PYTHONDONTWRITEBYTECODE='1')
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=tmpdir,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    return parse_importtime(completed.stderr)
+
+
+def report(module='main', provider='openai', repeat=3, top=10):
+    runs = [measure_import(module, provider) for _ in range(repeat)]
+    last = runs[-1]
+    slowest = sorted(last.items(), key=lambda item: item[1], reverse=True)
+    return {
+        'module': module,
+        'provider': provider,
+        'repeat': repeat,
+        'median_ms': round(statistics.median(run.get(module, 0) for run in runs) / 1000, 1),
+        'lazy_modules_imported': [name for name in LAZY_MODULES if name in last],
+        'slowest': [{'module': name, 'cumulative_ms': round(value / 1000, 1)} for name, value in slowest[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='main', help='module to import (default: main)')
+    parser.add_argument('--provider', default='openai', choices=('openai', 'gemini'))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help='number of slowest modules to report')
+    parser.add_argument('--max-ms', type=float, help='fail if the median import time is above this')
+    args = parser.parse_args()
+
+    results = report(args.module, args.provider, args.repeat, args.top)
+    print(json.dumps(results, indent=2))
+
+    failures = []
+    if results['lazy_modules_imported']:
+        failures.append(f"imported at startup: {', '.join(results['lazy_modules_imported'])}")
+    if args.max_ms is not None and results['median_ms'] > args.max_ms:
+        failures.append(f"median import time {results['median_ms']}ms > {args.max_ms}ms")
+    if failures:
+        print('FAIL: ' + '; '.join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
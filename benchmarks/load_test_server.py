@@ -0,0 +1,132 @@
+"""Load test the miniflux-ai HTTP endpoints.
+
+Start miniflux-ai once with ``server.mode: development`` and once with
+``server.mode: gunicorn``, then run for example:
+
+    python benchmarks/load_test_server.py http://localhost/rss/feeds-status --concurrency 32 --duration 20
+
+Optionally keep the webhook busy at the same time to see whether RSS fetches are blocked:
+
+    python benchmarks/load_test_server.py http://localhost/rss/feeds-status \\
+        --webhook-url http://localhost/api/miniflux-ai --webhook-secret secret
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import statistics
+import threading
+import time
+from urllib import error, request
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def build_webhook_request(url, secret, entry_id):
+    payload = json.dumps({
+        'event_type': 'new_entries',
+        'feed': {'id': 1, 'site_url': 'https://load-test.miniflux', 'category': {'title': 'Load test'}},
+        'entries': [{
+            'id': entry_id,
+            'title': f'Load test entry {entry_id}',
+            'url': f'https://load-test.miniflux/{entry_id}',
+            'content': '<p>load test</p>',
+            'created_at': '2026-01-01T00:00:00Z',
+        }],
+    }).encode('utf-8')
+    signature = hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+    return request.Request(
+        url,
+        data=payload,
+        method='POST',
+        headers={'Content-Type': 'application/json', 'X-Miniflux-Signature': signature},
+    )
+
+
+def run_worker(make_request, deadline, timeout, latencies, errors, lock):
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        try:
+            with request.urlopen(make_request(), timeout=timeout) as response:
+                response.read()
+            elapsed = time.monotonic() - start
+            with lock:
+                latencies.append(elapsed)
+        except (error.URLError, TimeoutError, OSError):
+            with lock:
+                errors.append(time.monotonic() - start)
+
+
+def load_test(make_request, concurrency, duration, timeout):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=run_worker, args=(make_request, deadline, timeout, latencies, errors, lock), daemon=True)
+        for _ in range(concurrency)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_second': round(len(latencies) / elapsed, 2),
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url', help='GET endpoint to measure, e.g. http://localhost/rss/feeds-status')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--webhook-url', help='also POST signed webhook requests to this URL')
+    parser.add_argument('--webhook-secret', help='miniflux.webhook_secret of the server under test')
+    parser.add_argument('--webhook-concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    results = {}
+    webhook_thread = None
+    if args.webhook_url:
+        if not args.webhook_secret:
+            parser.error('--webhook-secret is required with --webhook-url')
+        entry_ids = iter(range(10_000_000, 20_000_000))
+        ids_lock = threading.Lock()
+
+        def make_webhook_request():
+            with ids_lock:
+                entry_id = next(entry_ids)
+            return build_webhook_request(args.webhook_url, args.webhook_secret, entry_id)
+
+        def run_webhook_load():
+            results['webhook'] = load_test(make_webhook_request, args.webhook_concurrency, args.duration, args.timeout)
+
+        webhook_thread = threading.Thread(target=run_webhook_load, daemon=True)
+        webhook_thread.start()
+
+    results['get'] = load_test(lambda: request.Request(args.url), args.concurrency, args.duration, args.timeout)
+    if webhook_thread:
+        webhook_thread.join()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
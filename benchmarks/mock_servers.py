@@ -0,0 +1,343 @@
+"""Local stand-ins for Miniflux and an OpenAI/Gemini-compatible LLM endpoint.
+
+Both servers answer from synthetic data with configurable latency and
+failure behaviour, so the pipeline can be measured without network access:
+
+    python benchmarks/mock_servers.py --entries 10000 --llm-latency 0.2 --llm-429-rate 0.05
+
+Miniflux serves ``--entries`` unread entries (generated from their id, so
+nothing is kept in memory until an entry is updated). The LLM server answers
+``/v1/chat/completions`` (OpenAI) and ``/v1beta/models/<model>:generateContent``
+(Gemini); ``--llm-servers`` starts several of them on consecutive ports and
+``--llm-capacity`` limits how many requests each answers at once.
+``GET /_benchmark/stats`` on any server returns what it saw.
+"""
+import argparse
+import contextlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = (
+    'miniflux feed entry reader summary model latency queue worker token request response cache index '
+    'network server client batch stream priority backlog article paragraph sentence update category'
+).split()
+
+FEEDS = 50
+CATEGORIES = ('News', 'Tech', 'Science', 'Blogs', 'Videos')
+
+
+def make_entry(entry_id, min_words=100, max_words=800):
+    """Synthetic Miniflux entry; the same id always gives the same entry."""
+    rnd = random.Random(entry_id)
+    paragraphs = []
+    remaining = rnd.randint(min_words, max_words)
+    while remaining > 0:
+        size = min(remaining, rnd.randint(20, 80))
+        paragraphs.append('<p>' + ' '.join(rnd.choice(WORDS) for _ in range(size)).capitalize() + '.</p>')
+        remaining -= size
+    feed_id = entry_id % FEEDS + 1
+    published_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() - rnd.randint(0, 72 * 3600)))
+    return {
+        'id': entry_id,
+        'user_id': 1,
+        'feed_id': feed_id,
+        'status': 'unread',
+        'hash': f'{entry_id:016x}',
+        'title': f'Synthetic entry {entry_id}',
+        'url': f'https://benchmark.example.com/{feed_id}/{entry_id}',
+        'comments_url': '',
+        'published_at': published_at,
+        'created_at': published_at,
+        'changed_at': published_at,
+        'content': ''.join(paragraphs),
+        'author': '',
+        'share_code': '',
+        'starred': False,
+        'reading_time': 1,
+        'enclosures': None,
+        'feed': {
+            'id': feed_id,
+            'title': f'Synthetic feed {feed_id}',
+            'site_url': f'https://benchmark.example.com/{feed_id}',
+            'feed_url': f'https://benchmark.example.com/{feed_id}/rss',
+            'category': {'id': feed_id % len(CATEGORIES) + 1, 'title': CATEGORIES[feed_id % len(CATEGORIES)]},
+        },
+    }
+
+
+class Behaviour:
+    """Latency and failure injection shared by the mock handlers."""
+
+    def __init__(self, latency=0.0, jitter=0.5, error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def next_outcome(self):
+        """Return (delay, status) for the next request: status is 200, 429 or 500."""
+        with self.lock:
+            delay = self.latency * self.random.uniform(1 - self.jitter, 1 + self.jitter) if self.latency else 0.0
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 0.0, 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, 500
+        return delay, 200
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def inject(self):
+        """Apply the configured latency and failures; returns True when the request was answered with an error."""
+        delay, status = self.server.behaviour.next_outcome()
+        if delay:
+            time.sleep(delay)
+        if status == 200:
+            return False
+        self.server.count(f'status_{status}')
+        headers = {'Retry-After': str(self.server.behaviour.retry_after)} if status == 429 else None
+        self.send_json({'error': {'message': 'injected failure', 'code': status}, 'error_message': 'injected failure'},
+                       status, headers)
+        return True
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, behaviour):
+        super().__init__(address, handler)
+        self.behaviour = behaviour
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+class MinifluxHandler(MockHandler):
+    entry_re = re.compile(r'^/v1/entries/(\d+)$')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/_benchmark/stats':
+            return self.send_json(self.server.stats())
+        if self.inject():
+            return
+        if url.path == '/v1/me':
+            return self.send_json({'id': 1, 'username': 'benchmark'})
+        if url.path == '/v1/feeds':
+            return self.send_json([])
+        if url.path == '/v1/entries':
+            return self.send_json(self.server.page(parse_qs(url.query)))
+        match = self.entry_re.match(url.path)
+        if match and 0 < int(match.group(1)) <= self.server.entries:
+            return self.send_json(self.server.entry(int(match.group(1))))
+        self.send_json({'error_message': 'not found'}, 404)
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        payload = self.read_json()
+        if self.inject():
+            return
+        match = self.entry_re.match(url.path)
+        if match and 0 < int(match.group(1)) <= self.server.entries:
+            return self.send_json(self.server.update(int(match.group(1)), payload.get('content')), 201)
+        if url.path.endswith('/refresh'):
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_json({'error_message': 'not found'}, 404)
+
+
+class MinifluxServer(MockServer):
+    def __init__(self, address, behaviour, entries=1000, min_words=100, max_words=800):
+        super().__init__(address, MinifluxHandler, behaviour)
+        self.entries = entries
+        self.min_words = min_words
+        self.max_words = max_words
+        self.contents = {}
+        self.served_at = {}
+        self.updated_at = {}
+
+    def entry(self, entry_id):
+        entry = make_entry(entry_id, self.min_words, self.max_words)
+        with self.lock:
+            if entry_id in self.contents:
+                entry['content'] = self.contents[entry_id]
+        return entry
+
+    def page(self, params):
+        after_entry_id = int(params.get('after_entry_id', ['0'])[0])
+        limit = int(params.get('limit', ['100'])[0])
+        ids = range(after_entry_id + 1, min(self.entries, after_entry_id + limit) + 1)
+        now = time.time()
+        with self.lock:
+            for entry_id in ids:
+                self.served_at.setdefault(entry_id, now)
+        return {'total': self.entries, 'entries': [self.entry(entry_id) for entry_id in ids]}
+
+    def update(self, entry_id, content):
+        with self.lock:
+            self.contents[entry_id] = content
+            self.updated_at[entry_id] = time.time()
+        self.count('updates')
+        return self.entry(entry_id)
+
+    def stats(self):
+        with self.lock:
+            return {'counters': dict(self.counters), 'served_at': self.served_at, 'updated_at': self.updated_at}
+
+
+class LLMHandler(MockHandler):
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/_benchmark/stats':
+            return self.send_json({'counters': dict(self.server.counters)})
+        # health checks: the OpenAI model list and the Gemini model lookup
+        if path.endswith('/models'):
+            return self.send_json({'object': 'list', 'data': [{'id': 'benchmark', 'object': 'model'}]})
+        if '/models/' in path:
+            return self.send_json({'name': 'models/' + path.rsplit('/', 1)[-1]})
+        self.send_json({'error': {'message': 'not found'}}, 404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        payload = self.read_json()
+        self.server.count('requests')
+        with self.server.capacity:
+            self.answer(path, payload)
+
+    def answer(self, path, payload):
+        if self.inject():
+            return
+        text = self.server.completion()
+        if path.endswith('/chat/completions'):
+            self.server.count('openai')
+            return self.send_json({
+                'id': 'chatcmpl-benchmark',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': payload.get('model', 'benchmark'),
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': text}}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            })
+        if path.endswith(':generateContent'):
+            self.server.count('gemini')
+            return self.send_json({
+                'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}],
+            })
+        self.send_json({'error': {'message': 'not found'}}, 404)
+
+
+class LLMServer(MockServer):
+    def __init__(self, address, behaviour, completion_words=40, capacity=0):
+        super().__init__(address, LLMHandler, behaviour)
+        self.completion_words = completion_words
+        self.random = random.Random(1)
+        # an inference server answers a limited number of requests at once, the others queue
+        self.capacity = threading.Semaphore(capacity) if capacity else contextlib.nullcontext()
+
+    def completion(self):
+        with self.lock:
+            return ' '.join(self.random.choice(WORDS) for _ in range(self.completion_words)).capitalize() + '.'
+
+
+def add_arguments(parser):
+    """Mock behaviour options, shared with pipeline.py."""
+    parser.add_argument('--min-words', type=int, default=100)
+    parser.add_argument('--max-words', type=int, default=800)
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='mean LLM response time in seconds')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='fraction of LLM requests answered with 500')
+    parser.add_argument('--llm-429-rate', type=float, default=0.0, help='fraction of LLM requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After header of 429 responses')
+    parser.add_argument('--completion-words', type=int, default=40)
+    parser.add_argument('--llm-servers', type=int, default=1, help='mock LLM servers, configured as llm.endpoints')
+    parser.add_argument('--llm-capacity', type=int, default=0,
+                        help='requests each LLM server answers at once, 0 for unlimited')
+    parser.add_argument('--miniflux-latency', type=float, default=0.0, help='mean Miniflux API response time in seconds')
+    parser.add_argument('--miniflux-error-rate', type=float, default=0.0,
+                        help='fraction of Miniflux requests answered with 500')
+
+
+def start_mock_servers(args, host='127.0.0.1', miniflux_port=0, llm_port=0):
+    """Start the servers on background threads; returns (Miniflux server, list of LLM servers)."""
+    miniflux = MinifluxServer(
+        (host, miniflux_port),
+        Behaviour(args.miniflux_latency, error_rate=args.miniflux_error_rate, seed=1),
+        args.entries,
+        args.min_words,
+        args.max_words,
+    )
+    llms = [
+        LLMServer(
+            (host, llm_port + index if llm_port else 0),
+            Behaviour(args.llm_latency, error_rate=args.llm_error_rate, rate_limit_rate=args.llm_429_rate,
+                      retry_after=args.retry_after, seed=2 + index),
+            args.completion_words,
+            args.llm_capacity,
+        )
+        for index in range(args.llm_servers)
+    ]
+    for server in (miniflux, *llms):
+        threading.Thread(target=server.serve_forever, name='mock-server', daemon=True).start()
+    return miniflux, llms
+
+
+def serve(args, ports, stop):
+    """Entry point for a separate process, so the mocks do not compete with the pipeline for the GIL."""
+    miniflux, llms = start_mock_servers(args)
+    ports.put((miniflux.server_port, [llm.server_port for llm in llms]))
+    stop.wait()
+    for server in (miniflux, *llms):
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=1000, help='unread entries served by the mock Miniflux')
+    add_arguments(parser)
+    parser.add_argument('--miniflux-port', type=int, default=8081)
+    parser.add_argument('--llm-port', type=int, default=8082)
+    args = parser.parse_args()
+
+    start_mock_servers(args, miniflux_port=args.miniflux_port, llm_port=args.llm_port)
+    llm_urls = '  '.join(f'http://127.0.0.1:{args.llm_port + index}/v1' for index in range(args.llm_servers))
+    print(f'Miniflux: http://127.0.0.1:{args.miniflux_port}  LLM: {llm_urls}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
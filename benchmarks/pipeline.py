@@ -0,0 +1,385 @@
+"""Measure the throughput of the processing pipeline offline.
+
+Every run starts the mock Miniflux and LLM servers from ``mock_servers.py``
+in a separate process, writes a config.yml pointing at them into a temporary
+directory and drives one scenario in a fresh interpreter:
+
+- ``fetch``: ``fetch_unread_entries`` pages through the unread entries
+- ``webhook``: signed POSTs to ``/api/miniflux-ai``, drained by the webhook workers
+- ``daily_news``: ``generate_daily_news`` over the collected summaries
+
+It reports entries/sec, p50/p95/p99 latency (entry served or posted until
+its content is written back; per LLM call for daily_news) and peak RSS:
+
+    python benchmarks/pipeline.py --entries 1000 10000 --llm-latency 0.2 --output results.json
+
+Compare a run with the results of an earlier commit; the exit status is 1
+when entries/sec dropped by more than ``--max-regression`` percent:
+
+    python benchmarks/pipeline.py --entries 10000 --compare baseline.json --max-regression 10
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib import request
+
+import yaml
+
+import mock_servers
+from load_test_server import percentile
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+WEBHOOK_SECRET = 'benchmark'
+SCENARIOS = ('fetch', 'webhook', 'daily_news')
+
+AGENTS = {
+    'summary': {
+        'title': 'Summary: ',
+        'prompt': '${content} \n---\nSummarize the above content in three sentences.',
+        'style_block': True,
+    },
+    'translate': {
+        'title': 'Translation: ',
+        'prompt': 'Translate the following content into English.',
+        'style_block': False,
+    },
+}
+AI_NEWS_PROMPTS = {
+    'greeting': 'Write a short greeting for the date.',
+    'summary': 'Summarize the news in one paragraph.',
+    'summary_block': 'Group the news below by category.',
+}
+
+
+def build_config(args, miniflux_port, llm_ports):
+    llm_base_urls = [f'http://127.0.0.1:{port}' + ('/v1' if args.provider == 'openai' else '') for port in llm_ports]
+    return {
+        'log_level': 'WARNING',
+        'miniflux': {
+            'base_url': f'http://127.0.0.1:{miniflux_port}',
+            'api_key': WEBHOOK_SECRET,
+            'webhook_secret': WEBHOOK_SECRET,
+            'page_size': args.page_size,
+        },
+        'llm': {
+            'provider': args.provider,
+            'base_url': llm_base_urls[0],
+            'endpoints': [{'base_url': url} for url in llm_base_urls] if len(llm_base_urls) > 1 else None,
+            'routing': args.routing,
+            'api_key': 'benchmark',
+            'model': 'benchmark',
+            'engine': args.engine,
+            'max_workers': args.max_workers,
+            'max_concurrency': args.max_concurrency,
+            'RPM': args.rpm,
+        },
+        'adaptive_concurrency': {'enabled': args.adaptive_concurrency},
+        'webhook_queue': {'max_size': args.entries},
+        'ai_news': {'url': 'http://127.0.0.1', 'map_reduce': True, 'prompts': AI_NEWS_PROMPTS},
+        'agents': AGENTS,
+    }
+
+
+def get_json(url):
+    with request.urlopen(url, timeout=60) as response:
+        return json.load(response)
+
+
+def latency_ms(values):
+    if not values:
+        return None
+    return {
+        'p50': round(percentile(values, 0.50) * 1000, 2),
+        'p95': round(percentile(values, 0.95) * 1000, 2),
+        'p99': round(percentile(values, 0.99) * 1000, 2),
+        'max': round(max(values) * 1000, 2),
+    }
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def time_llm_requests():
+    """Record the duration of every provider call, as seen by the pipeline."""
+    from core.llm_pool import get_llm_pool
+
+    latencies = []
+    for endpoint in get_llm_pool().endpoints:
+        time_provider(endpoint.get_provider(), latencies)
+    return latencies
+
+
+def time_provider(provider, latencies):
+    send, send_async = provider.request, provider.request_async
+
+    def timed(prompt, request_text):
+        started = time.perf_counter()
+        try:
+            return send(prompt, request_text)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    async def timed_async(prompt, request_text):
+        started = time.perf_counter()
+        try:
+            return await send_async(prompt, request_text)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    provider.request, provider.request_async = timed, timed_async
+
+
+def wait_until_idle(deadline, *probes):
+    """Wait until every probe returns a falsy value, or the deadline passes."""
+    while time.time() < deadline and any(probe() for probe in probes):
+        time.sleep(0.05)
+
+
+def writes_in_flight():
+    from core.miniflux_writer import get_miniflux_writer
+
+    stats = get_miniflux_writer().stats()
+    return stats['pending'] + stats['in_flight']
+
+
+def entry_latencies(started_at, updated_at):
+    return [updated - started_at[entry_id] for entry_id, updated in updated_at.items() if entry_id in started_at]
+
+
+def run_fetch(args, miniflux_url):
+    from common.config import config
+    from core import fetch_unread_entries
+    from core.miniflux_writer import get_miniflux_client
+
+    llm_latencies = time_llm_requests()
+    started = time.time()
+    fetch_unread_entries(config, get_miniflux_client())
+    wait_until_idle(started + args.timeout, writes_in_flight)
+    duration = time.time() - started
+
+    stats = get_json(miniflux_url + '/_benchmark/stats')
+    latencies = entry_latencies(stats['served_at'], stats['updated_at'])
+    return duration, latencies, llm_latencies, len(stats['updated_at'])
+
+
+def run_webhook(args, miniflux_url):
+    from myapp import app
+    from myapp.ai_summary import get_webhook_queue, start_webhook_workers
+
+    llm_latencies = time_llm_requests()
+    client = app.test_client()
+    work_queue = get_webhook_queue()
+    start_webhook_workers()
+
+    posted_at = {}
+    started = time.time()
+    for first in range(1, args.entries + 1, args.webhook_batch):
+        last = min(args.entries, first + args.webhook_batch - 1)
+        entries = [mock_servers.make_entry(i, args.min_words, args.max_words) for i in range(first, last + 1)]
+        payload = json.dumps({'event_type': 'new_entries', 'feed': entries[0]['feed'], 'entries': entries}).encode()
+        signature = hmac.new(WEBHOOK_SECRET.encode(), payload, hashlib.sha256).hexdigest()
+        now = time.time()
+        client.post('/api/miniflux-ai', data=payload, content_type='application/json',
+                    headers={'X-Miniflux-Signature': signature})
+        posted_at.update((str(entry['id']), now) for entry in entries)
+
+    queued = work_queue.stats
+    wait_until_idle(started + args.timeout, lambda: queued()['depth'] or queued()['in_flight'], writes_in_flight)
+    duration = time.time() - started
+
+    stats = get_json(miniflux_url + '/_benchmark/stats')
+    latencies = entry_latencies(posted_at, stats['updated_at'])
+    return duration, latencies, llm_latencies, len(stats['updated_at'])
+
+
+def run_daily_news(args, miniflux_url):
+    import random
+
+    from core import generate_daily_news
+    from core.ai_news_store import append_entry
+    from core.miniflux_writer import get_miniflux_client
+
+    rnd = random.Random(0)
+    for entry_id in range(1, args.entries + 1):
+        entry = mock_servers.make_entry(entry_id, 1, 1)
+        append_entry({
+            'datetime': entry['created_at'],
+            'category': entry['feed']['category']['title'],
+            'title': entry['title'],
+            'content': ' '.join(rnd.choice(mock_servers.WORDS) for _ in range(args.completion_words)),
+            'url': entry['url'],
+        })
+
+    llm_latencies = time_llm_requests()
+    started = time.time()
+    generate_daily_news(get_miniflux_client())
+    duration = time.time() - started
+
+    written = Path('ai_news.json').exists() and json.loads(Path('ai_news.json').read_text(encoding='utf-8'))
+    return duration, llm_latencies, llm_latencies, args.entries if written else 0
+
+
+SCENARIO_RUNNERS = {'fetch': run_fetch, 'webhook': run_webhook, 'daily_news': run_daily_news}
+
+
+def run_scenario(args):
+    """Run one scenario against fresh mock servers; called in a child interpreter."""
+    context = multiprocessing.get_context('spawn')
+    ports, stop = context.Queue(), context.Event()
+    mocks = context.Process(target=mock_servers.serve, args=(args, ports, stop), daemon=True)
+    mocks.start()
+    miniflux_port, llm_ports = ports.get(timeout=30)
+    miniflux_url = f'http://127.0.0.1:{miniflux_port}'
+
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.chdir(tmpdir)
+            Path('config.yml').write_text(yaml.safe_dump(build_config(args, miniflux_port, llm_ports)), encoding='utf8')
+            sys.path.insert(0, str(REPO_ROOT))
+
+            duration, latencies, llm_latencies, processed = SCENARIO_RUNNERS[args.scenario](args, miniflux_url)
+
+            from core.retry_queue import get_retry_queue
+
+            retry_queue = get_retry_queue()
+            retry_stats = retry_queue.stats() if retry_queue else {}
+            llm_stats = {}
+            for port in llm_ports:
+                for name, value in get_json(f'http://127.0.0.1:{port}/_benchmark/stats')['counters'].items():
+                    llm_stats[name] = llm_stats.get(name, 0) + value
+            os.chdir(REPO_ROOT)
+    finally:
+        stop.set()
+        mocks.join(10)
+
+    return {
+        'scenario': args.scenario,
+        'entries': args.entries,
+        'duration_s': round(duration, 3),
+        'entries_per_second': round(args.entries / duration, 2) if duration else None,
+        'processed': processed,
+        'latency_ms': latency_ms(latencies),
+        'llm_latency_ms': latency_ms(llm_latencies),
+        'llm': llm_stats,
+        'retry_queue': retry_stats,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_in_child(args, scenario, entries):
+    child_args = dict(vars(args), scenario=scenario, entries=entries)
+    completed = subprocess.run(
+        [sys.executable, __file__, '--child', json.dumps(child_args)],
+        cwd=REPO_ROOT,
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Percent change of entries/sec, p95 latency and peak RSS against a previous report."""
+    previous = {(result['scenario'], result['entries']): result for result in baseline['results']}
+    changes = []
+    for result in results:
+        before = previous.get((result['scenario'], result['entries']))
+        if not before:
+            continue
+
+        def change(key, sub=None):
+            old, new = before.get(key), result.get(key)
+            if sub:
+                old, new = (old or {}).get(sub), (new or {}).get(sub)
+            return round((new - old) / old * 100, 1) if old and new is not None else None
+
+        changes.append({
+            'scenario': result['scenario'],
+            'entries': result['entries'],
+            'baseline_commit': baseline.get('commit'),
+            'entries_per_second_pct': change('entries_per_second'),
+            'latency_p95_pct': change('latency_ms', 'p95'),
+            'peak_rss_pct': change('peak_rss_mb'),
+        })
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--entries', type=int, nargs='+', default=[1000], help='synthetic entries per run')
+    parser.add_argument('--provider', choices=('openai', 'gemini'), default='openai')
+    parser.add_argument('--engine', choices=('thread', 'async'), default='thread')
+    parser.add_argument('--routing', choices=('least_outstanding', 'latency'), default='least_outstanding')
+    parser.add_argument('--max-workers', type=int, default=4)
+    parser.add_argument('--max-concurrency', type=int, default=64)
+    parser.add_argument('--adaptive-concurrency', action='store_true', help='learn the LLM concurrency limit')
+    parser.add_argument('--rpm', type=int, default=1_000_000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--webhook-batch', type=int, default=100, help='entries per webhook request')
+    parser.add_argument('--timeout', type=float, default=3600, help='seconds to wait for queued work to finish')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='results file of an earlier run')
+    parser.add_argument('--max-regression', type=float, help='fail if entries/sec dropped by more percent than this')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    mock_servers.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(argparse.Namespace(**json.loads(args.child)))))
+        return
+
+    results = []
+    for entries in args.entries:
+        for scenario in args.scenario:
+            result = run_in_child(args, scenario, entries)
+            print(json.dumps(result), file=sys.stderr)
+            results.append(result)
+
+    options = {key: value for key, value in vars(args).items() if key not in ('child', 'output', 'compare')}
+    report = {
+        'commit': git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'options': options,
+        'results': results,
+    }
+    if args.compare:
+        report['comparison'] = compare(results, json.loads(Path(args.compare).read_text(encoding='utf8')))
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf8')
+    print(json.dumps(report, indent=2))
+
+    if args.max_regression is not None:
+        regressions = [
+            change for change in report.get('comparison', [])
+            if change['entries_per_second_pct'] is not None and change['entries_per_second_pct'] < -args.max_regression
+        ]
+        if regressions:
+            print(f'FAIL: entries/sec regressed by more than {args.max_regression}%', file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,2 @@
-from .config import Config
+from .config import Config, config
 from .logger import logger
@@ -1,39 +1,307 @@
-from yaml import safe_load
+import logging
+import os
+import threading
+import time
+
+from yaml import YAMLError, safe_load
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = 'config.yml'
+
 
 class Config:
-    def __init__(self):
-        with open('config.yml', encoding='utf8') as config_file:
-            self.c = safe_load(config_file)
+    def __init__(self, file_path=CONFIG_FILE):
+        with open(file_path, encoding='utf8') as config_file:
+            self.c = safe_load(config_file) or {}
         self.log_level = self.c.get('log_level', 'INFO')
 
         self.miniflux_base_url = self.get_config_value('miniflux', 'base_url', None)
         self.miniflux_api_key = self.get_config_value('miniflux', 'api_key', None)
         self.miniflux_webhook_secret = self.get_config_value('miniflux', 'webhook_secret', None)
         self.miniflux_schedule_interval = self.get_config_value('miniflux', 'schedule_interval', None)
+        self.miniflux_fetch_mode = self.get_config_value('miniflux', 'fetch_mode', 'full')
+        self.miniflux_fetch_state_file = self.get_config_value('miniflux', 'fetch_state_file', 'fetch_state.json')
+        self.miniflux_page_size = self.get_config_value('miniflux', 'page_size', 100)
+        self.miniflux_write_concurrency = self.get_config_value('miniflux', 'write_concurrency', 4)
+        self.miniflux_write_retries = self.get_config_value('miniflux', 'write_retries', 5)
+        self.miniflux_write_backoff = self.get_config_value('miniflux', 'write_backoff', 1.0)
 
-        self.llm_provider = self.get_config_value('llm', 'provider', 'openai')
+        self.llm_provider = self.get_config_value('llm', 'provider', 'openai') or 'openai'
         self.llm_base_url = self.get_config_value('llm', 'base_url', None)
         self.llm_api_key = self.get_config_value('llm', 'api_key', None)
         self.llm_model = self.get_config_value('llm', 'model', None)
         self.llm_max_length = self.get_config_value('llm', 'max_length', None)
+        self.llm_max_input_tokens = self.get_config_value('llm', 'max_input_tokens', None)
+        self.llm_content_format = self.get_config_value('llm', 'content_format', 'markdown')
         self.llm_timeout = self.get_config_value('llm', 'timeout', 60)
         self.llm_max_workers = self.get_config_value('llm', 'max_workers', 4)
         self.llm_RPM = self.get_config_value('llm', 'RPM', 1000)
+        self.llm_TPM = self.get_config_value('llm', 'TPM', None)
+        self.llm_rate_limit_retries = self.get_config_value('llm', 'rate_limit_retries', 2)
+        self.llm_engine = self.get_config_value('llm', 'engine', 'thread')
+        self.llm_max_concurrency = self.get_config_value('llm', 'max_concurrency', 64)
+        self.llm_stream = self.get_config_value('llm', 'stream', False)
+        self.llm_max_output_tokens = self.get_config_value('llm', 'max_output_tokens', None)
+        self.llm_max_stream_seconds = self.get_config_value('llm', 'max_stream_seconds', None)
+        self.llm_circuit_breaker_threshold = self.get_config_value('llm', 'circuit_breaker_threshold', 5)
+        self.llm_circuit_breaker_timeout = self.get_config_value('llm', 'circuit_breaker_timeout', 60)
+        self.llm_endpoints = self.get_config_value('llm', 'endpoints', None) or []
+        self.llm_routing = self.get_config_value('llm', 'routing', 'least_outstanding')
+        self.llm_health_check_interval = self.get_config_value('llm', 'health_check_interval', 30)
         self.llm_extra_params = self.get_config_value('llm', 'extra_params', {})
         if self.llm_extra_params is None:
             self.llm_extra_params = {}
         if not isinstance(self.llm_extra_params, dict):
             raise ValueError('llm.extra_params must be a mapping')
 
+        self.llm_cache_enabled = self.get_config_value('llm_cache', 'enabled', True)
+        self.llm_cache_backend = self.get_config_value('llm_cache', 'backend', 'sqlite')
+        self.llm_cache_file = self.get_config_value('llm_cache', 'file', 'llm_cache.db')
+        self.llm_cache_ttl = self.get_config_value('llm_cache', 'ttl', 7 * 24 * 3600)
+        self.llm_cache_max_entries = self.get_config_value('llm_cache', 'max_entries', 10000)
+
+        self.server_mode = self.get_config_value('server', 'mode', 'development')
+        self.server_host = self.get_config_value('server', 'host', '0.0.0.0')
+        self.server_port = self.get_config_value('server', 'port', 80)
+        self.server_workers = self.get_config_value('server', 'workers', 2)
+        self.server_threads = self.get_config_value('server', 'threads', 8)
+        self.server_keepalive = self.get_config_value('server', 'keepalive', 5)
+        self.server_timeout = self.get_config_value('server', 'timeout', 120)
+        self.server_graceful_timeout = self.get_config_value('server', 'graceful_timeout', 30)
+
+        self.metrics_enabled = self.get_config_value('metrics', 'enabled', False)
+
+        self.tracing_enabled = self.get_config_value('tracing', 'enabled', False)
+        self.tracing_exporter = self.get_config_value('tracing', 'exporter', 'file')
+        self.tracing_file = self.get_config_value('tracing', 'file', 'traces.jsonl')
+        self.tracing_endpoint = self.get_config_value('tracing', 'endpoint', None)
+        self.tracing_sample_rate = self.get_config_value('tracing', 'sample_rate', 1.0)
+        self.tracing_service_name = self.get_config_value('tracing', 'service_name', 'miniflux-ai')
+
+        self.adaptive_concurrency_enabled = self.get_config_value('adaptive_concurrency', 'enabled', False)
+        self.adaptive_concurrency_initial_limit = self.get_config_value(
+            'adaptive_concurrency', 'initial_limit', self.llm_max_workers
+        )
+        self.adaptive_concurrency_min_limit = self.get_config_value('adaptive_concurrency', 'min_limit', 1)
+        self.adaptive_concurrency_max_limit = self.get_config_value('adaptive_concurrency', 'max_limit', 64)
+        self.adaptive_concurrency_latency_tolerance = self.get_config_value(
+            'adaptive_concurrency', 'latency_tolerance', 2.0
+        )
+        self.adaptive_concurrency_backoff = self.get_config_value('adaptive_concurrency', 'backoff', 0.9)
+
+        self.webhook_queue_enabled = self.get_config_value('webhook_queue', 'enabled', False)
+        self.webhook_queue_file = self.get_config_value('webhook_queue', 'file', 'webhook_queue.db')
+        self.webhook_queue_max_size = self.get_config_value('webhook_queue', 'max_size', 10000)
+        self.webhook_queue_max_attempts = self.get_config_value('webhook_queue', 'max_attempts', 3)
+        # with adaptive concurrency the limiter, not the number of workers, bounds the LLM requests
+        self.webhook_queue_workers = self.get_config_value(
+            'webhook_queue',
+            'workers',
+            self.adaptive_concurrency_max_limit if self.adaptive_concurrency_enabled else self.llm_max_workers,
+        )
+
         self.ai_news_url = self.get_config_value('ai_news', 'url', None)
         self.ai_news_schedule = self.get_config_value('ai_news', 'schedule', None)
         self.ai_news_prompts = self.get_config_value('ai_news', 'prompts', None)
+        self.ai_news_map_reduce = self.get_config_value('ai_news', 'map_reduce', False)
+        self.ai_news_chunk_tokens = self.get_config_value('ai_news', 'chunk_tokens', 3000)
 
         self.feeds_status_enabled = self.get_config_value('feeds_status', 'enabled', False)
         self.feeds_status_url = self.get_config_value('feeds_status', 'url', self.ai_news_url)
         self.feeds_status_schedule = self.get_config_value('feeds_status', 'schedule', '09:00')
 
-        self.agents = self.c.get('agents', {})
+        self.priority_enabled = self.get_config_value('priority', 'enabled', False)
+        self.priority_feeds = self.get_config_value('priority', 'feeds', None) or {}
+        self.priority_categories = self.get_config_value('priority', 'categories', None) or {}
+        self.priority_freshness_hours = self.get_config_value('priority', 'freshness_hours', 24)
+        self.priority_length_tokens = self.get_config_value('priority', 'length_tokens', 4000)
+        self.priority_max_wait = self.get_config_value('priority', 'max_wait', 600)
+        self.priority_window = self.get_config_value('priority', 'window', 1000)
+
+        self.deferred_batch_file = self.get_config_value('deferred_batch', 'file', 'deferred_batch.db')
+        self.deferred_batch_interval = self.get_config_value('deferred_batch', 'interval', 10)
+        self.deferred_batch_max_requests = self.get_config_value('deferred_batch', 'max_requests', 50000)
+        self.deferred_batch_completion_window = self.get_config_value('deferred_batch', 'completion_window', '24h')
+        self.deferred_batch_max_attempts = self.get_config_value('deferred_batch', 'max_attempts', 3)
+
+        self.retry_queue_enabled = self.get_config_value('retry_queue', 'enabled', True)
+        self.retry_queue_file = self.get_config_value('retry_queue', 'file', 'retry_queue.db')
+        self.retry_queue_interval = self.get_config_value('retry_queue', 'interval', 60)
+        self.retry_queue_max_attempts = self.get_config_value('retry_queue', 'max_attempts', 8)
+        self.retry_queue_backoff = self.get_config_value('retry_queue', 'backoff', 30)
+        self.retry_queue_max_backoff = self.get_config_value('retry_queue', 'max_backoff', 3600)
+
+        self.entry_index_enabled = self.get_config_value('entry_index', 'enabled', True)
+        self.entry_index_file = self.get_config_value('entry_index', 'file', 'entry_index.db')
+        self.entry_index_retention_days = self.get_config_value('entry_index', 'retention_days', 30)
+
+        self.config_reload_interval = self.c.get('config_reload_interval', 10)
+
+        self.agents = self.c.get('agents') or {}
+
+        self.validate()
 
     def get_config_value(self, section, key, default=None):
-        return self.c.get(section, {}).get(key, default)
+        return (self.c.get(section) or {}).get(key, default)
+
+    def validate(self):
+        choices = {
+            'llm.provider': (self.llm_provider, ('openai', 'gemini')),
+            'llm.engine': (self.llm_engine, ('thread', 'async')),
+            'llm.routing': (self.llm_routing, ('least_outstanding', 'latency')),
+            'llm.content_format': (self.llm_content_format, ('markdown', 'text')),
+            'miniflux.fetch_mode': (self.miniflux_fetch_mode, ('full', 'incremental')),
+            'server.mode': (self.server_mode, ('development', 'gunicorn')),
+            'tracing.exporter': (self.tracing_exporter, ('file', 'otlp')),
+        }
+        for name, (value, allowed) in choices.items():
+            if value not in allowed:
+                raise ValueError(f'{name} must be one of {", ".join(allowed)}')
+
+        positive = {
+            'llm.max_workers': self.llm_max_workers,
+            'llm.max_concurrency': self.llm_max_concurrency,
+            'llm.RPM': self.llm_RPM,
+            'miniflux.page_size': self.miniflux_page_size,
+            'miniflux.write_concurrency': self.miniflux_write_concurrency,
+            'retry_queue.interval': self.retry_queue_interval,
+            'retry_queue.max_attempts': self.retry_queue_max_attempts,
+            'deferred_batch.max_attempts': self.deferred_batch_max_attempts,
+            'webhook_queue.max_attempts': self.webhook_queue_max_attempts,
+            'adaptive_concurrency.min_limit': self.adaptive_concurrency_min_limit,
+            'adaptive_concurrency.max_limit': self.adaptive_concurrency_max_limit,
+            'adaptive_concurrency.latency_tolerance': self.adaptive_concurrency_latency_tolerance,
+        }
+        for name, value in positive.items():
+            if not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f'{name} must be a positive number')
+
+        if not isinstance(self.tracing_sample_rate, (int, float)) or not 0 <= self.tracing_sample_rate <= 1:
+            raise ValueError('tracing.sample_rate must be between 0 and 1')
+
+        if not isinstance(self.llm_endpoints, list):
+            raise ValueError('llm.endpoints must be a list')
+        for index, endpoint in enumerate(self.llm_endpoints):
+            if not isinstance(endpoint, dict) or not endpoint.get('base_url'):
+                raise ValueError(f'llm.endpoints[{index}] must define base_url')
+            if endpoint.get('provider', self.llm_provider) not in ('openai', 'gemini'):
+                raise ValueError(f'llm.endpoints[{index}].provider must be one of openai, gemini')
+            for key in ('weight', 'max_concurrency'):
+                value = endpoint.get(key)
+                if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+                    raise ValueError(f'llm.endpoints[{index}].{key} must be a positive number')
+
+        backoff = self.adaptive_concurrency_backoff
+        if not isinstance(backoff, (int, float)) or not 0 < backoff < 1:
+            raise ValueError('adaptive_concurrency.backoff must be between 0 and 1')
+        if self.adaptive_concurrency_min_limit > self.adaptive_concurrency_max_limit:
+            raise ValueError('adaptive_concurrency.min_limit must not exceed max_limit')
+
+        for name, weights in (('priority.feeds', self.priority_feeds), ('priority.categories', self.priority_categories)):
+            if not isinstance(weights, dict):
+                raise ValueError(f'{name} must be a mapping')
+
+        if not isinstance(self.agents, dict):
+            raise ValueError('agents must be a mapping')
+        # deferred agents send their batch jobs to the first openai endpoint
+        endpoint_providers = [endpoint.get('provider', self.llm_provider) for endpoint in self.llm_endpoints]
+        for name, agent in self.agents.items():
+            if not isinstance(agent, dict) or 'title' not in agent or 'prompt' not in agent:
+                raise ValueError(f'agents.{name} must define title and prompt')
+            if agent.get('deferred') and 'openai' not in (endpoint_providers or [self.llm_provider]):
+                raise ValueError(f'agents.{name}.deferred needs an OpenAI-compatible batch API (an openai endpoint)')
+
+
+class SharedConfig:
+    """Process-wide config, loaded from ``config.yml`` on first use.
+
+    ``reload`` parses and validates the file into a new ``Config`` and only
+    then swaps it in, so readers see either the old or the new config and a
+    broken edit keeps the previous one. Work already in flight keeps the
+    values it has read.
+    """
+
+    def __init__(self, file_path=CONFIG_FILE):
+        self._file_path = file_path
+        self._current = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._watch_interval = None
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+    def current(self):
+        current = self._current
+        if current is None:
+            with self._lock:
+                if self._current is None:
+                    self._mtime = self._stat_mtime()
+                    self._current = Config(self._file_path)
+                current = self._current
+        return current
+
+    def _stat_mtime(self):
+        try:
+            return os.stat(self._file_path).st_mtime
+        except OSError:
+            return None
+
+    def on_reload(self, callback):
+        """Call ``callback()`` after every successful reload, e.g. to rebuild derived state."""
+        self._callbacks.append(callback)
+        return callback
+
+    def reload(self):
+        with self._lock:
+            mtime = self._stat_mtime()
+            try:
+                new_config = Config(self._file_path)
+            except (OSError, YAMLError, ValueError) as e:
+                logger.error(f'Failed to reload {self._file_path}, keeping the current config: {e}')
+                self._mtime = mtime
+                return False
+            self._mtime = mtime
+            self._current = new_config
+
+        for callback in self._callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f'Error applying reloaded config: {e}')
+        logger.warning(f'Reloaded {self._file_path}')
+        return True
+
+    def reload_if_changed(self):
+        self.current()
+        if self._stat_mtime() != self._mtime:
+            return self.reload()
+        return False
+
+    def watch(self, interval):
+        """Poll the config file every ``interval`` seconds and reload it when it changes."""
+        if not interval:
+            return
+        self._watch_interval = interval
+
+        def watcher():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    logger.error(f'Error watching {self._file_path}: {e}')
+
+        threading.Thread(target=watcher, name='config-watcher', daemon=True).start()
+
+    def _after_fork(self):
+        # a forked worker gets neither the lock state nor the watcher thread of its parent
+        self._lock = threading.Lock()
+        if self._watch_interval:
+            self.watch(self._watch_interval)
+
+
+config = SharedConfig()
+os.register_at_fork(after_in_child=config._after_fork)
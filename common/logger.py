@@ -1,6 +1,5 @@
 import logging
-from .config import Config
-config = Config()
+from .config import config
 
 logger = logging.getLogger(__name__)
 logger.setLevel(config.log_level)
@@ -8,3 +7,8 @@ formatter = logging.Formatter('%(asctime)s - %(filename)s - %(levelname)s - %(me
 console = logging.StreamHandler()
 console.setFormatter(formatter)
 logger.addHandler(console)
+
+
+@config.on_reload
+def _update_log_level():
+    logger.setLevel(config.log_level)
@@ -0,0 +1,110 @@
+import contextlib
+import contextvars
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+# Latency buckets in seconds, LLM calls take far longer than Miniflux API calls
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+MINIFLUX_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+WAIT_BUCKETS = (0, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+ENTRIES_FETCHED = Counter(
+    'miniflux_ai_entries_fetched_total', 'Unread entries received from Miniflux', ['source']
+)
+ENTRIES_FILTERED = Counter(
+    'miniflux_ai_entries_filtered_total', 'Entries skipped by the allow_list/deny_list of an agent', ['agent']
+)
+ENTRIES_PROCESSED = Counter(
+    'miniflux_ai_entries_processed_total', 'Entries handled by an agent, by outcome', ['agent', 'status']
+)
+LLM_REQUEST_SECONDS = Histogram(
+    'miniflux_ai_llm_request_seconds', 'LLM request latency', ['provider', 'model', 'agent'], buckets=LLM_BUCKETS
+)
+LLM_ERRORS = Counter(
+    'miniflux_ai_llm_errors_total', 'Failed LLM requests', ['provider', 'model', 'agent']
+)
+LLM_PROMPT_TOKENS = Counter(
+    'miniflux_ai_llm_prompt_tokens_total', 'Estimated prompt tokens sent to the LLM', ['provider', 'model', 'agent']
+)
+LLM_COMPLETION_TOKENS = Counter(
+    'miniflux_ai_llm_completion_tokens_total', 'Estimated completion tokens received from the LLM',
+    ['provider', 'model', 'agent'],
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    'miniflux_ai_llm_first_token_seconds', 'Time to the first token of streamed LLM responses',
+    ['provider', 'model', 'agent'], buckets=LLM_BUCKETS,
+)
+LLM_TRUNCATED_STREAMS = Counter(
+    'miniflux_ai_llm_truncated_streams_total', 'Streamed LLM responses cut off at the output budget',
+    ['provider', 'model', 'agent'],
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    'miniflux_ai_rate_limit_wait_seconds', 'Time LLM requests waited for the RPM/TPM limit', ['provider'],
+    buckets=WAIT_BUCKETS,
+)
+# every process learns its own limit, the sum is what the provider sees
+LLM_CONCURRENCY_LIMIT = Gauge(
+    'miniflux_ai_llm_concurrency_limit', 'Adaptive limit of concurrent LLM requests', ['endpoint'],
+    multiprocess_mode='livesum',
+)
+LLM_IN_FLIGHT = Gauge(
+    'miniflux_ai_llm_in_flight', 'LLM requests holding an adaptive concurrency slot', ['endpoint'],
+    multiprocess_mode='livesum',
+)
+LLM_ENDPOINT_OUTSTANDING = Gauge(
+    'miniflux_ai_llm_endpoint_outstanding', 'LLM requests in flight per endpoint of the pool', ['endpoint'],
+    multiprocess_mode='livesum',
+)
+LLM_ENDPOINT_HEALTHY = Gauge(
+    'miniflux_ai_llm_endpoint_healthy', 'Whether the endpoint passed its last health check', ['endpoint'],
+    multiprocess_mode='livemin',
+)
+MINIFLUX_REQUEST_SECONDS = Histogram(
+    'miniflux_ai_miniflux_request_seconds', 'Miniflux API latency', ['method', 'endpoint'], buckets=MINIFLUX_BUCKETS
+)
+MINIFLUX_ERRORS = Counter(
+    'miniflux_ai_miniflux_errors_total', 'Failed Miniflux API requests', ['method', 'endpoint', 'reason']
+)
+
+# Agent on whose behalf the current thread or task calls the LLM, used as a label
+current_agent = contextvars.ContextVar('current_agent', default='')
+
+
+@contextlib.contextmanager
+def agent_context(name):
+    token = current_agent.set(name)
+    try:
+        yield
+    finally:
+        current_agent.reset(token)
+
+
+def prepare_multiprocess_dir():
+    """Create an empty ``PROMETHEUS_MULTIPROC_DIR``; samples of a previous run would be merged otherwise."""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith('.db'):
+            os.remove(os.path.join(path, name))
+
+
+def render_metrics(*collectors):
+    """Return (body, content type) in the Prometheus text format.
+
+    With ``PROMETHEUS_MULTIPROC_DIR`` set, the samples written by every
+    gunicorn worker and the scheduler process are merged.
+    """
+    registry = REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    # collectors read shared state (e.g. SQLite queues) when scraped, so any process reports the same value
+    extra_registry = CollectorRegistry()
+    for collector in collectors:
+        extra_registry.register(collector)
+    return generate_latest(registry) + generate_latest(extra_registry), CONTENT_TYPE_LATEST
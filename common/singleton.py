@@ -0,0 +1,59 @@
+import functools
+import os
+import threading
+
+_singletons = []
+
+
+class ForkSafeSingleton:
+    """Shared instances built lazily by ``factory``, one per distinct argument tuple.
+
+    A forked server worker starts without the instances and the lock of its
+    parent: SQLite connections, HTTP connection pools, threads and locks held
+    by another thread must not cross a fork. ``reset`` drops the instances,
+    e.g. after a config reload, and hands each to ``close`` if given. A
+    ``None`` from the factory is returned but not kept.
+    """
+
+    def __init__(self, factory, close=None):
+        functools.update_wrapper(self, factory)
+        self.factory = factory
+        self.close = close
+        self.instances = {}
+        self.lock = threading.Lock()
+        _singletons.append(self)
+
+    def __call__(self, *args):
+        with self.lock:
+            instance = self.instances.get(args)
+            if instance is None:
+                instance = self.factory(*args)
+                if instance is not None:
+                    self.instances[args] = instance
+        return instance
+
+    def reset(self):
+        with self.lock:
+            instances, self.instances = self.instances, {}
+        if self.close:
+            for instance in instances.values():
+                self.close(instance)
+
+    def after_fork(self):
+        self.instances = {}
+        self.lock = threading.Lock()
+
+
+def fork_safe_singleton(factory=None, *, close=None):
+    """Decorator turning ``factory`` into a :class:`ForkSafeSingleton`, also usable as ``@fork_safe_singleton(close=...)``."""
+    if factory is None:
+        return functools.partial(fork_safe_singleton, close=close)
+    return ForkSafeSingleton(factory, close)
+
+
+def _reset_after_fork():
+    for singleton in _singletons:
+        singleton.after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,80 @@
+import contextlib
+import contextvars
+import os
+
+from common.config import config
+from common.logger import logger
+from common.singleton import fork_safe_singleton
+
+def build_exporter(exporter, file_path=None, endpoint=None):
+    """Span exporter for ``tracing.exporter``: one JSON span per line in a file, or an OTLP/HTTP collector."""
+    if exporter == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        # without an endpoint the OTEL_EXPORTER_OTLP_* environment variables apply
+        return OTLPSpanExporter(endpoint=endpoint) if endpoint else OTLPSpanExporter()
+
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    class FileSpanExporter(ConsoleSpanExporter):
+        def shutdown(self):
+            # ConsoleSpanExporter leaves its stream open, it usually is stdout
+            self.out.close()
+
+    return FileSpanExporter(
+        out=open(file_path, 'a', encoding='utf-8'),
+        formatter=lambda span: span.to_json(indent=None) + os.linesep,
+    )
+
+
+def build_tracer(exporter, file_path=None, endpoint=None, sample_rate=1.0, service_name='miniflux-ai'):
+    # the OpenTelemetry SDK is optional and only imported when tracing is enabled
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({'service.name': service_name}),
+        # spans of a sampled entry are all kept, so a trace is never cut in half
+        sampler=ParentBased(TraceIdRatioBased(sample_rate)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(build_exporter(exporter, file_path, endpoint)))
+    return provider.get_tracer('miniflux-ai')
+
+
+@fork_safe_singleton
+def get_tracer():
+    """Shared tracer built from the ``tracing`` config, or None when tracing is disabled."""
+    if not config.tracing_enabled:
+        return None
+    logger.info(f'Tracing enabled, exporting {config.tracing_sample_rate:.0%} of entries to {config.tracing_exporter}')
+    return build_tracer(
+        config.tracing_exporter,
+        config.tracing_file,
+        config.tracing_endpoint,
+        config.tracing_sample_rate,
+        config.tracing_service_name,
+    )
+
+
+@contextlib.contextmanager
+def span(name, attributes=None):
+    """Record the block as a span of the current trace; does nothing while tracing is disabled."""
+    tracer = get_tracer()
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def set_attributes(current, attributes):
+    if current is not None:
+        current.set_attributes(attributes)
+
+
+def bind_context(fn):
+    """Wrap ``fn`` to run in a copy of the caller's context, so spans started in a worker thread keep their parent."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from common.logger import logger
+
+AI_NEWS_ENTRIES_FILE = Path('entries.jsonl')
+LEGACY_ENTRIES_FILE = Path('entries.json')
+
+store_lock = threading.Lock()
+
+
+def append_entry(record, file_path=AI_NEWS_ENTRIES_FILE):
+    """Append one summary record as a JSON line."""
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    with store_lock:
+        with Path(file_path).open('a', encoding='utf-8') as file:
+            file.write(line)
+
+
+def iter_entries(file_path):
+    """Stream records from a JSON Lines file, skipping lines that cannot be parsed."""
+    path = Path(file_path)
+    if not path.exists():
+        return
+    with path.open('r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f'Skipping corrupted line {line_number} in {path}')
+
+
+def rotate_entries(file_path=AI_NEWS_ENTRIES_FILE):
+    """Move the current entries aside so new summaries start a fresh file.
+
+    Returns the rotated file, or None when there is nothing to rotate.
+    """
+    path = Path(file_path)
+    with store_lock:
+        if not path.exists() or path.stat().st_size == 0:
+            return None
+        rotated = path.with_name(f"{path.name}.{time.strftime('%Y%m%d%H%M%S')}")
+        try:
+            os.replace(path, rotated)
+        except OSError:
+            # the file may be a docker bind mount, which cannot be renamed
+            shutil.copyfile(path, rotated)
+            path.open('w').close()
+    return rotated
+
+
+def import_legacy_entries(legacy_path=LEGACY_ENTRIES_FILE, file_path=AI_NEWS_ENTRIES_FILE):
+    """Move records from the old entries.json list into the JSON Lines store."""
+    legacy = Path(legacy_path)
+    try:
+        with legacy.open('r', encoding='utf-8') as file:
+            records = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+
+    if not isinstance(records, list) or not records:
+        return 0
+
+    for record in records:
+        append_entry(record, file_path)
+    with legacy.open('w', encoding='utf-8') as file:
+        json.dump([], file)
+    logger.info(f'Imported {len(records)} entries from {legacy}')
+    return len(records)
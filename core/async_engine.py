@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+from common.config import config
+from common.logger import logger
+from common.metrics import agent_context
+from common.singleton import fork_safe_singleton
+from common.tracing import span
+from core.batching import get_batcher
+from core.get_ai_result import get_ai_result_async
+from core.miniflux_writer import get_miniflux_writer
+from core.preprocess import prepare_entry_content
+from core.priority import PrioritySemaphore, entry_priority
+from core.process_entries import (
+    defer_agents,
+    entry_span_attributes,
+    handle_agent_result,
+    mark_entry_processed,
+    queue_retry,
+    select_agents,
+)
+
+class AsyncEngine:
+    """Process entries as asyncio tasks on a dedicated event loop thread.
+
+    Every (entry, agent) LLM request shares one concurrency limit, so entries
+    from polling and from the webhook interleave instead of each holding a
+    worker thread while waiting on the provider.
+    """
+
+    def __init__(self, max_concurrency):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='async-engine', daemon=True)
+        self.thread.start()
+        self.semaphore = PrioritySemaphore(max_concurrency)
+
+    def submit_entry(self, entry):
+        """Schedule an entry on the engine loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(self.process_entry(entry, entry_priority(entry)), self.loop)
+
+    async def run_agent(self, agent, request, priority=0.0):
+        with span('agent', {'agent': agent[0]}):
+            # a batch is sent from its own thread, waiting for it must not hold an LLM slot
+            batcher = get_batcher(agent)
+            if batcher and batcher.accepts(request):
+                with span('batch.wait'):
+                    # submit looks the request up in the SQLite cache
+                    future = await asyncio.to_thread(batcher.submit, request)
+                    response_content = await asyncio.wrap_future(future)
+                if response_content is not None:
+                    return response_content
+            # the highest priority waiter gets the next free LLM slot
+            with span('concurrency.wait'):
+                await self.semaphore.acquire(priority)
+            try:
+                # each gathered agent runs in its own task, so the label does not leak to the others
+                with agent_context(agent[0]):
+                    return await get_ai_result_async(agent[1]["prompt"], request)
+            finally:
+                self.semaphore.release()
+
+    async def process_entry(self, entry, priority=0.0):
+        with span('process_entry', entry_span_attributes(entry)):
+            # the entry index and the retry and deferred queues are SQLite, keep them off the event loop
+            with span('select_agents'):
+                run_agents, filtered_agents = await asyncio.to_thread(select_agents, entry)
+                run_agents, handled_agents = await asyncio.to_thread(defer_agents, entry, run_agents)
+            # HTML parsing is CPU bound, keep it off the event loop
+            with span('preprocess'):
+                request = await asyncio.to_thread(prepare_entry_content, entry) if run_agents else ''
+            results = await asyncio.gather(
+                *(self.run_agent(agent, request, priority) for agent in run_agents),
+                return_exceptions=True,
+            )
+
+            llm_result = ''
+            failed_agents = []
+            for agent, response_content in zip(run_agents, results):
+                if isinstance(response_content, Exception):
+                    if await asyncio.to_thread(queue_retry, entry, agent, response_content):
+                        handled_agents.append(agent[0])
+                    else:
+                        failed_agents.append(agent[0])
+                    continue
+                handled_agents.append(agent[0])
+                llm_result = llm_result + await asyncio.to_thread(handle_agent_result, entry, agent, response_content)
+
+            content = entry['content']
+            if len(llm_result) > 0:
+                content = llm_result + entry['content']
+                # written by the shared Miniflux writer thread pool, which coalesces and retries updates
+                with span('miniflux.update_entry'):
+                    await asyncio.wrap_future(get_miniflux_writer().submit(entry['id'], content, llm_result))
+
+            with span('mark_processed'):
+                await asyncio.to_thread(mark_entry_processed, entry['id'], handled_agents, content, filtered_agents)
+            return failed_agents
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+@fork_safe_singleton
+def get_async_engine():
+    logger.info(f'Starting async engine with max_concurrency={config.llm_max_concurrency}')
+    return AsyncEngine(config.llm_max_concurrency)
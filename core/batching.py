@@ -0,0 +1,270 @@
+import concurrent.futures
+import json
+import re
+import threading
+import time
+
+from common.config import config
+from common.logger import logger
+from common.metrics import agent_context
+from common.singleton import fork_safe_singleton
+from core.concurrency_limiter import worker_count
+from core.get_ai_result import get_cache_key, get_cached_result, request_ai_result
+from core.llm_cache import get_llm_cache
+from core.rate_limiter import estimate_tokens
+
+# Entries up to this many estimated tokens are batched when the agent sets no batch_max_tokens
+DEFAULT_BATCH_MAX_TOKENS = 200
+# Seconds a partial batch waits for more entries
+DEFAULT_BATCH_WAIT = 2.0
+
+BATCH_INSTRUCTION = (
+    'The input is a JSON array of {count} items, each with an "id" and a "content". '
+    'Apply the instructions above to the content of each item independently. '
+    'Reply with only a JSON array of {count} objects in the same order, '
+    'each with the item "id" and your answer for that item as a string in "result".'
+)
+
+def build_batch_request(prompt, requests):
+    """Turn an agent prompt and entry texts into one prompt and JSON array request."""
+    if '${content}' in prompt:
+        prompt = prompt.replace('${content}', 'the content of each item')
+    batch_prompt = prompt.strip() + '\n\n' + BATCH_INSTRUCTION.format(count=len(requests))
+    items = [{'id': i, 'content': request} for i, request in enumerate(requests)]
+    return batch_prompt, json.dumps(items, ensure_ascii=False)
+
+
+def fits_input_budget(prompt, requests):
+    """True if the batch request stays within ``llm.max_input_tokens`` and ``llm.max_length``.
+
+    Batch requests are sent untruncated, a cut JSON array could not be parsed.
+    """
+    _, batch_request = build_batch_request(prompt, requests)
+    if config.llm_max_input_tokens and estimate_tokens(batch_request) > config.llm_max_input_tokens:
+        return False
+    return not (config.llm_max_length and len(batch_request) > config.llm_max_length)
+
+
+def parse_batch_response(response_content, count):
+    """Per-item results in request order, or None if the response is not a matching JSON array."""
+    text = re.sub(r'^\s*```(?:json)?\s*|\s*```\s*$', '', response_content or '')
+    try:
+        items = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(items, list) or len(items) != count:
+        return None
+
+    results = [None] * count
+    for position, item in enumerate(items):
+        if isinstance(item, dict):
+            index = item.get('id', position)
+            result = item.get('result')
+        else:
+            index = position
+            result = item
+        if not isinstance(index, int) or not 0 <= index < count or not isinstance(result, str):
+            return None
+        results[index] = result
+    if any(result is None for result in results):
+        return None
+    return results
+
+
+class BatchRunner:
+    """Send the batches of every agent from a fixed number of threads.
+
+    One thread flushes partial batches once their wait is over, so neither a
+    burst of full batches nor many waiting agents start threads without bound.
+    """
+
+    def __init__(self, max_workers):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='agent-batch')
+        self.condition = threading.Condition()
+        self.deadlines = {}
+        threading.Thread(target=self.flush_due, name='agent-batch-flush', daemon=True).start()
+
+    def run(self, batcher, batch):
+        self.executor.submit(batcher.run_batch, batch)
+
+    def schedule_flush(self, batcher, delay):
+        with self.condition:
+            self.deadlines.setdefault(batcher, time.monotonic() + delay)
+            self.condition.notify()
+
+    def cancel_flush(self, batcher):
+        with self.condition:
+            self.deadlines.pop(batcher, None)
+
+    def flush_due(self):
+        while True:
+            with self.condition:
+                now = time.monotonic()
+                due = [batcher for batcher, deadline in self.deadlines.items() if deadline <= now]
+                for batcher in due:
+                    del self.deadlines[batcher]
+                if not due:
+                    timeout = min(self.deadlines.values()) - now if self.deadlines else None
+                    self.condition.wait(timeout)
+                    continue
+            for batcher in due:
+                batcher.flush()
+
+
+@fork_safe_singleton
+def get_batch_runner():
+    """Runner shared by all agents, with as many threads as LLM requests may run at once."""
+    return BatchRunner(config.llm_max_concurrency if config.llm_engine == 'async' else worker_count())
+
+
+class AgentBatcher:
+    """Collect short entries for one agent and answer them with a single LLM request.
+
+    ``submit`` returns a future that resolves to the entry result, or to None
+    when the entry has to be sent on its own (the batch had a single entry or
+    the response could not be parsed). ``queue`` collects an entry before the
+    worker that needs its result exists, so batches fill from everything that
+    was fetched rather than from the entries the workers currently hold; the
+    worker's ``submit`` then picks up the queued future, and ``discard`` drops
+    it if no worker did. A batch is sent early when the next entry would push
+    it over the LLM input budget.
+    """
+
+    def __init__(self, prompt, size, max_tokens=DEFAULT_BATCH_MAX_TOKENS, wait=DEFAULT_BATCH_WAIT, name='',
+                 runner=None):
+        self.prompt = prompt
+        self.runner = runner or get_batch_runner()
+        self.name = name
+        self.size = size
+        self.max_tokens = max_tokens
+        self.wait = wait
+        self.lock = threading.Lock()
+        self.pending = []
+        # request -> future of an entry queued ahead of its worker
+        self.queued = {}
+        self.batches = 0
+        self.fallbacks = 0
+
+    def accepts(self, request):
+        return estimate_tokens(request) <= self.max_tokens
+
+    def queue(self, request):
+        with self.lock:
+            if request in self.queued:
+                return
+        future = self.submit(request)
+        with self.lock:
+            self.queued.setdefault(request, future)
+
+    def discard(self, request):
+        """Forget a queued entry whose worker did not ask for the result."""
+        with self.lock:
+            self.queued.pop(request, None)
+
+    def submit(self, request):
+        with self.lock:
+            future = self.queued.pop(request, None)
+        if future is not None:
+            return future
+
+        future = concurrent.futures.Future()
+        llm_cache = get_llm_cache()
+        cached = get_cached_result(llm_cache, self.prompt, request) if llm_cache is not None else None
+        if cached is not None:
+            future.set_result(cached)
+            return future
+
+        batches = []
+        with self.lock:
+            if self.pending and not fits_input_budget(self.prompt, [pending[0] for pending in self.pending] + [request]):
+                batches.append(self.take_pending())
+            self.pending.append((request, future))
+            if len(self.pending) >= self.size:
+                batches.append(self.take_pending())
+            else:
+                self.runner.schedule_flush(self, self.wait)
+        for batch in batches:
+            # never run the request on the caller, which may be the async engine loop
+            self.runner.run(self, batch)
+        return future
+
+    def take_pending(self):
+        batch, self.pending = self.pending, []
+        self.runner.cancel_flush(self)
+        return batch
+
+    def flush(self):
+        with self.lock:
+            batch = self.take_pending()
+        if batch:
+            self.runner.run(self, batch)
+
+    def run_batch(self, batch):
+        """Answer the batch; every future is resolved, with None for entries to send on their own."""
+        results = endpoint = error = None
+        try:
+            results, endpoint = self.answer([request for request, _ in batch])
+        except Exception as e:
+            error = e
+        finally:
+            for position, (_, future) in enumerate(batch):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[position] if results else None)
+        if results and endpoint:
+            self.cache_results(batch, results, endpoint)
+
+    def answer(self, requests):
+        """Per-entry results and the endpoint that wrote them, or (None, None) to send the entries one by one."""
+        if len(requests) == 1:
+            return None, None
+        batch_prompt, batch_request = build_batch_request(self.prompt, requests)
+        with agent_context(self.name):
+            response_content, endpoint = request_ai_result(batch_prompt, batch_request, truncate=False)
+
+        results = parse_batch_response(response_content, len(requests))
+        if results is None:
+            self.fallbacks += 1
+            logger.warning(f'Could not parse batch response for {len(requests)} entries, sending them one by one')
+            return None, None
+        self.batches += 1
+        logger.debug(f'Answered {len(requests)} entries with one batch request')
+        return results, endpoint
+
+    def cache_results(self, batch, results, endpoint):
+        # a later single request for the same entry is served from the cache
+        llm_cache = get_llm_cache()
+        if llm_cache is None:
+            return
+        try:
+            for (request, _), result in zip(batch, results):
+                llm_cache.set(get_cache_key(self.prompt, request, endpoint), result)
+        except Exception as e:
+            logger.warning(f'Could not cache batch results: {e}')
+
+
+def get_batcher(agent):
+    """Shared batcher for an agent with ``batch_size`` above 1, otherwise None."""
+    name, agent_config = agent
+    size = agent_config.get('batch_size') or 1
+    if size <= 1:
+        return None
+    return get_agent_batcher(
+        name,
+        agent_config['prompt'],
+        size,
+        agent_config.get('batch_max_tokens') or DEFAULT_BATCH_MAX_TOKENS,
+        agent_config.get('batch_wait') or DEFAULT_BATCH_WAIT,
+    )
+
+
+@fork_safe_singleton
+def get_agent_batcher(name, prompt, size, max_tokens, wait):
+    return AgentBatcher(prompt, size, max_tokens, wait, name)
+
+
+@config.on_reload
+def _reset_batchers():
+    # batches already collected finish with the batcher that holds them
+    get_agent_batcher.reset()
@@ -0,0 +1,105 @@
+import threading
+import time
+
+from common.config import config
+from common.logger import logger
+from common.singleton import fork_safe_singleton
+
+@config.on_reload
+def _reset_circuit_breakers():
+    # picks up new thresholds; an open circuit closes again and is re-learned
+    get_circuit_breaker.reset()
+
+
+def is_transient(error):
+    """True if ``error`` may not happen again: a 429 or 5xx answer, a timeout or a connection error.
+
+    Errors such as a 400 for a too long request say nothing about the health
+    of the provider, they neither open the circuit nor move to another endpoint.
+    """
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    names = [cls.__name__.lower() for cls in type(error).__mro__]
+    return any('timeout' in name or 'connect' in name for name in names)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, name, retry_at):
+        self.name = name
+        self.retry_at = retry_at
+        super().__init__(f'circuit for {name} is open, next attempt in {max(0.0, retry_at - time.time()):.0f}s')
+
+
+class CircuitBreaker:
+    """Stop calling a provider after ``failure_threshold`` consecutive transient failures.
+
+    The open circuit rejects calls for ``reset_timeout`` seconds, then lets a
+    single trial call through (half open): its success closes the circuit,
+    its failure opens it again. A ``failure_threshold`` of 0 disables it.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+
+    @property
+    def retry_at(self):
+        return self.opened_at + self.reset_timeout
+
+    def before_call(self):
+        """Raise ``CircuitOpenError`` unless a call may go through now."""
+        if not self.failure_threshold:
+            return
+        with self.lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.time() >= self.retry_at:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self.trial_running:
+                self.trial_running = True
+                return
+            raise CircuitOpenError(self.name, self.retry_at)
+
+    def record_success(self):
+        with self.lock:
+            if self.state != 'closed':
+                logger.info(f'Circuit for {self.name} closed, calls resume')
+            self.state = 'closed'
+            self.failures = 0
+            self.trial_running = False
+
+    def record_failure(self):
+        if not self.failure_threshold:
+            return
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(
+                        f'Circuit for {self.name} opened after {self.failures} failures, '
+                        f'pausing calls for {self.reset_timeout}s'
+                    )
+                self.state = 'open'
+                self.opened_at = time.time()
+
+
+@fork_safe_singleton
+def get_circuit_breaker(name):
+    """Shared breaker for a provider, created from the ``llm.circuit_breaker_*`` config."""
+    return CircuitBreaker(
+        name,
+        config.llm_circuit_breaker_threshold,
+        config.llm_circuit_breaker_timeout,
+    )
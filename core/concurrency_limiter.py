@@ -0,0 +1,203 @@
+import asyncio
+import collections
+import contextlib
+import threading
+import time
+
+from common.config import config
+from common.logger import logger
+from common.metrics import LLM_CONCURRENCY_LIMIT, LLM_IN_FLIGHT
+from common.singleton import fork_safe_singleton
+from core.rate_limiter import get_retry_after
+
+# Requests averaged by the short and long latency estimates
+SHORT_WINDOW = 10
+LONG_WINDOW = 100
+
+@config.on_reload
+def _reset_concurrency_limiters():
+    # picks up new bounds; the limit is learned again from the initial limit
+    get_concurrency_limiter.reset()
+
+
+def is_overload(error):
+    """True if ``error`` means the provider is overloaded: a 429, a 503 or a timeout."""
+    if get_retry_after(error) is not None:
+        return True
+    if (getattr(error, 'status_code', None) or getattr(error, 'code', None)) == 503:
+        return True
+    return isinstance(error, TimeoutError) or 'timeout' in type(error).__name__.lower()
+
+
+def moving_average(average, sample, window):
+    return sample if average is None else average + (sample - average) / window
+
+
+class ConcurrencyLimiter:
+    """Limit the LLM requests in flight to a limit learned with AIMD.
+
+    Every successful request raises the limit by ``1 / limit`` while the
+    limit is actually used and latency stays flat, about one more slot per
+    round trip. The limit is multiplied by
+    ``backoff`` when the provider answers 429/503, a request times out, or
+    the recent latency exceeds ``latency_tolerance`` times the long-term
+    latency, at most once per round trip. Waiting callers are admitted in
+    arrival order.
+    """
+
+    def __init__(self, name, initial_limit=4, min_limit=1, max_limit=64, latency_tolerance=2.0, backoff=0.9):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.limit = min(max(initial_limit, min_limit), max_limit)
+        self.in_flight = 0
+        self.waiters = collections.deque()
+        self.short_latency = None
+        self.long_latency = None
+        self.decreased_at = 0.0
+        self.report()
+
+    @property
+    def slots(self):
+        # the limit grows in fractions, a slot opens once it passes the next whole number
+        return int(self.limit)
+
+    def report(self):
+        LLM_CONCURRENCY_LIMIT.labels(self.name).set(self.slots)
+        LLM_IN_FLIGHT.labels(self.name).set(self.in_flight)
+
+    def admit_waiters(self):
+        # a woken waiter already owns its slot, so a newcomer cannot take it first
+        while self.waiters and self.in_flight < self.slots:
+            self.in_flight += 1
+            self.waiters.popleft()()
+
+    def acquire(self):
+        with self.lock:
+            if not self.waiters and self.in_flight < self.slots:
+                self.in_flight += 1
+                self.report()
+                return
+            admitted = threading.Event()
+            self.waiters.append(admitted.set)
+        admitted.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if not self.waiters and self.in_flight < self.slots:
+                self.in_flight += 1
+                self.report()
+                return
+            admitted = loop.create_future()
+            self.waiters.append(lambda: loop.call_soon_threadsafe(self.hand_over, admitted))
+        await admitted
+
+    def hand_over(self, admitted):
+        if admitted.cancelled():
+            # the waiting task was cancelled, pass its slot on
+            self.release()
+        else:
+            admitted.set_result(None)
+
+    def release(self, latency=None, overloaded=False):
+        """Free a slot; ``latency`` of a successful request or ``overloaded`` adjust the limit."""
+        with self.lock:
+            if overloaded:
+                self.decrease('provider overloaded')
+            elif latency is not None:
+                self.short_latency = moving_average(self.short_latency, latency, SHORT_WINDOW)
+                self.long_latency = moving_average(self.long_latency, latency, LONG_WINDOW)
+                if self.short_latency > self.long_latency * self.latency_tolerance:
+                    self.decrease('latency rising')
+                elif self.in_flight * 2 >= self.slots and self.limit < self.max_limit:
+                    # only grow a limit that is in use, idle capacity says nothing about the backend
+                    self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+            self.in_flight -= 1
+            self.admit_waiters()
+            self.report()
+
+    def decrease(self, reason):
+        now = time.monotonic()
+        # the requests already in flight were sent at the old limit, back off once per round trip
+        if now - self.decreased_at < (self.short_latency or 0):
+            return
+        limit = max(self.min_limit, int(self.limit * self.backoff))
+        if limit < self.slots:
+            logger.info(f'LLM concurrency for {self.name} lowered to {limit} ({reason})')
+        self.limit = limit
+        self.decreased_at = now
+
+    @contextlib.contextmanager
+    def slot(self):
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.release(overloaded=is_overload(e))
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.release(time.monotonic() - started)
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self):
+        await self.acquire_async()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.release(overloaded=is_overload(e))
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.release(time.monotonic() - started)
+
+
+@fork_safe_singleton
+def get_concurrency_limiter(name):
+    """Shared limiter for an LLM endpoint, or None unless ``adaptive_concurrency.enabled``."""
+    if not config.adaptive_concurrency_enabled:
+        return None
+    return ConcurrencyLimiter(
+        name,
+        config.adaptive_concurrency_initial_limit,
+        config.adaptive_concurrency_min_limit,
+        config.adaptive_concurrency_max_limit,
+        config.adaptive_concurrency_latency_tolerance,
+        config.adaptive_concurrency_backoff,
+    )
+
+
+@contextlib.contextmanager
+def limit_concurrency(name):
+    """Hold one of the adaptive concurrency slots of ``name`` for the block."""
+    limiter = get_concurrency_limiter(name)
+    if limiter is None:
+        yield
+        return
+    with limiter.slot():
+        yield
+
+
+@contextlib.asynccontextmanager
+async def limit_concurrency_async(name):
+    limiter = get_concurrency_limiter(name)
+    if limiter is None:
+        yield
+        return
+    async with limiter.slot_async():
+        yield
+
+
+def worker_count():
+    """Threads to start for LLM work: the limiter decides how many of them call the LLM at once."""
+    if config.adaptive_concurrency_enabled:
+        return config.adaptive_concurrency_max_limit
+    return config.llm_max_workers
@@ -0,0 +1,296 @@
+import json
+import sqlite3
+import threading
+import time
+
+from common.config import config
+from common.logger import logger
+from common.singleton import fork_safe_singleton
+from core.llm_pool import get_llm_pool
+from core.llm_providers import build_openai_messages
+
+DEFERRED_BATCH_FILE = 'deferred_batch.db'
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+# Provider batch states after which no more results will arrive
+FINISHED_JOB_STATES = ('completed', 'failed', 'expired', 'cancelled')
+
+def make_custom_id(entry_id, agent_name):
+    return f'{entry_id}:{agent_name}'
+
+
+def parse_custom_id(custom_id):
+    entry_id, agent_name = custom_id.split(':', 1)
+    return int(entry_id), agent_name
+
+
+class DeferredStore:
+    """Local record of deferred (entry, agent) requests and the provider batch jobs they were sent in.
+
+    Requests move from ``pending`` to ``submitted`` with the job that carries
+    them, then to ``done``. A request that fails inside a job, or whose result
+    cannot be applied, goes back to ``pending`` for the next job until it
+    failed ``max_attempts`` times, then it is kept as ``failed``. Jobs that
+    are still running at shutdown are polled again after restart, on the
+    endpoint they were submitted to.
+    """
+
+    def __init__(self, file_path=DEFERRED_BATCH_FILE, max_attempts=3):
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(file_path), check_same_thread=False)
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS deferred_requests ('
+                'custom_id TEXT PRIMARY KEY, '
+                'body TEXT NOT NULL, '
+                "status TEXT NOT NULL DEFAULT 'pending', "
+                'batch_id TEXT, '
+                'attempts INTEGER NOT NULL DEFAULT 0, '
+                'created_at REAL NOT NULL)'
+            )
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(deferred_requests)')}
+            if 'attempts' not in columns:
+                # files created before failed requests were retried
+                self.conn.execute('ALTER TABLE deferred_requests ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS batch_jobs ('
+                'batch_id TEXT PRIMARY KEY, '
+                'input_file_id TEXT NOT NULL, '
+                'status TEXT NOT NULL, '
+                'request_count INTEGER NOT NULL, '
+                'created_at REAL NOT NULL, '
+                'updated_at REAL NOT NULL, '
+                'endpoint TEXT)'
+            )
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(batch_jobs)')}
+            if 'endpoint' not in columns:
+                # jobs created before batch jobs were routed through the pool
+                self.conn.execute('ALTER TABLE batch_jobs ADD COLUMN endpoint TEXT')
+            self.conn.commit()
+
+    def add(self, custom_id, body):
+        """Record a request; returns False if the same request is already waiting or was applied before.
+
+        A request whose body changed, e.g. because the entry content changed,
+        replaces the old one unless that one is already in a running job.
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT INTO deferred_requests (custom_id, body, created_at) VALUES (?, ?, ?) '
+                "ON CONFLICT (custom_id) DO UPDATE SET body = excluded.body, status = 'pending', "
+                'batch_id = NULL, attempts = 0, created_at = excluded.created_at '
+                "WHERE status != 'submitted' AND body != excluded.body",
+                (custom_id, json.dumps(body, ensure_ascii=False), time.time()),
+            )
+            self.conn.commit()
+        return cursor.rowcount > 0
+
+    def pending_requests(self, limit):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT custom_id, body FROM deferred_requests WHERE status = 'pending' ORDER BY created_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [(custom_id, json.loads(body)) for custom_id, body in rows]
+
+    def add_job(self, batch_id, input_file_id, status, custom_ids, endpoint=None):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO batch_jobs (batch_id, input_file_id, status, request_count, created_at, updated_at, '
+                'endpoint) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (batch_id, input_file_id, status, len(custom_ids), now, now, endpoint),
+            )
+            self.conn.executemany(
+                "UPDATE deferred_requests SET status = 'submitted', batch_id = ? WHERE custom_id = ?",
+                [(batch_id, custom_id) for custom_id in custom_ids],
+            )
+            self.conn.commit()
+
+    def open_jobs(self, endpoint=None, unassigned=False):
+        """Ids of unfinished jobs, only those of ``endpoint`` if given (and jobs without one if ``unassigned``)."""
+        query = f"SELECT batch_id FROM batch_jobs WHERE status NOT IN ({','.join('?' * len(FINISHED_JOB_STATES))})"
+        params = list(FINISHED_JOB_STATES)
+        if endpoint is not None:
+            query += ' AND (endpoint = ? OR (? AND endpoint IS NULL))'
+            params += [endpoint, unassigned]
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [row[0] for row in rows]
+
+    def finish_job(self, batch_id, status):
+        """Close the job; requests it did not answer go back to ``pending`` to be sent again."""
+        with self.lock:
+            self.conn.execute(
+                'UPDATE batch_jobs SET status = ?, updated_at = ? WHERE batch_id = ?',
+                (status, time.time(), batch_id),
+            )
+            cursor = self.conn.execute(
+                "UPDATE deferred_requests SET status = 'pending', batch_id = NULL "
+                "WHERE batch_id = ? AND status = 'submitted'",
+                (batch_id,),
+            )
+            self.conn.commit()
+        return cursor.rowcount
+
+    def set_request_status(self, custom_id, status):
+        with self.lock:
+            self.conn.execute('UPDATE deferred_requests SET status = ? WHERE custom_id = ?', (status, custom_id))
+            self.conn.commit()
+
+    def fail_request(self, custom_id):
+        """Count a failed attempt; returns True if the request goes back to ``pending``."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE deferred_requests SET attempts = attempts + 1, batch_id = NULL, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE custom_id = ?",
+                (self.max_attempts, custom_id),
+            )
+            row = self.conn.execute('SELECT status FROM deferred_requests WHERE custom_id = ?', (custom_id,)).fetchone()
+            self.conn.commit()
+        return row is not None and row[0] == 'pending'
+
+    def stats(self):
+        with self.lock:
+            requests = dict(self.conn.execute(
+                'SELECT status, COUNT(*) FROM deferred_requests GROUP BY status'
+            ).fetchall())
+            jobs = dict(self.conn.execute('SELECT status, COUNT(*) FROM batch_jobs GROUP BY status').fetchall())
+        return {'requests': requests, 'jobs': jobs}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+@fork_safe_singleton
+def get_deferred_store():
+    return DeferredStore(config.deferred_batch_file, config.deferred_batch_max_attempts)
+
+
+def get_batch_endpoints():
+    """The OpenAI-compatible endpoints of the pool, which can receive batch files and jobs."""
+    endpoints = [endpoint for endpoint in get_llm_pool().endpoints if endpoint.provider_name == 'openai']
+    if not endpoints:
+        raise RuntimeError('Deferred agents need an OpenAI-compatible LLM endpoint')
+    return endpoints
+
+
+def is_deferred(agent):
+    return bool(agent[1].get('deferred'))
+
+
+def defer_agent(entry, agent, request):
+    """Queue an agent request for the next provider batch job instead of calling the LLM now."""
+    # the model is filled in by submit_deferred_requests, once the endpoint of the job is known
+    body = {
+        'messages': build_openai_messages(agent[1]['prompt'], request),
+        **config.llm_extra_params,
+    }
+    if get_deferred_store().add(make_custom_id(entry['id'], agent[0]), body):
+        logger.debug(f"Deferred agent {agent[0]} for entry {entry['id']} to the next batch job")
+
+
+def submit_deferred_requests(endpoint, store):
+    """Upload pending requests to ``endpoint`` as one JSONL batch job; returns the batch id or None."""
+    pending = store.pending_requests(config.deferred_batch_max_requests)
+    if not pending:
+        return None
+
+    lines = [
+        json.dumps(
+            {'custom_id': custom_id, 'method': 'POST', 'url': BATCH_ENDPOINT, 'body': {**body, 'model': endpoint.model}},
+            ensure_ascii=False,
+        )
+        for custom_id, body in pending
+    ]
+    client = endpoint.get_provider().client
+    input_file = client.files.create(
+        file=('miniflux-ai-batch.jsonl', ('\n'.join(lines) + '\n').encode('utf-8')),
+        purpose='batch',
+    )
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=config.deferred_batch_completion_window,
+    )
+    store.add_job(batch.id, input_file.id, batch.status, [custom_id for custom_id, _ in pending], endpoint.name)
+    logger.info(f'Submitted batch job {batch.id} with {len(pending)} deferred requests to {endpoint.name}')
+    return batch.id
+
+
+def iter_batch_results(client, file_id):
+    """Yield (custom_id, response content or None) from a batch output or error file."""
+    if not file_id:
+        return
+    for line in client.files.content(file_id).text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        response = result.get('response') or {}
+        content = None
+        if response.get('status_code') == 200:
+            content = response['body']['choices'][0]['message']['content']
+        yield result['custom_id'], content
+
+
+def apply_deferred_result(miniflux_client, custom_id, response_content):
+    # imported here, process_entries itself hands deferred agents to this module
+    from core.process_entries import apply_agent_result
+
+    entry_id, agent_name = parse_custom_id(custom_id)
+    agent = config.agents.get(agent_name)
+    if agent is None:
+        logger.warning(f'Agent {agent_name} was removed, dropping deferred result for entry {entry_id}')
+        return
+
+    apply_agent_result(miniflux_client, entry_id, (agent_name, agent), response_content)
+
+
+def poll_deferred_jobs(endpoint, store, miniflux_client, unassigned=False):
+    """Apply the results of the batch jobs of ``endpoint`` that finished through ``update_entry``."""
+    client = endpoint.get_provider().client
+    for batch_id in store.open_jobs(endpoint.name, unassigned):
+        batch = client.batches.retrieve(batch_id)
+        if batch.status not in FINISHED_JOB_STATES:
+            logger.debug(f'Batch job {batch_id} is {batch.status}')
+            continue
+
+        applied = 0
+        retried = 0
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            for custom_id, response_content in iter_batch_results(client, file_id):
+                if response_content is None:
+                    logger.error(f'Deferred request {custom_id} failed in batch job {batch_id}')
+                    retried += store.fail_request(custom_id)
+                    continue
+                try:
+                    apply_deferred_result(miniflux_client, custom_id, response_content)
+                except Exception as e:
+                    logger.error(f'Error applying deferred result {custom_id}: {e}')
+                    retried += store.fail_request(custom_id)
+                    continue
+                store.set_request_status(custom_id, 'done')
+                applied += 1
+
+        requeued = store.finish_job(batch_id, batch.status) + retried
+        logger.info(f'Batch job {batch_id} {batch.status}: applied {applied} results, {requeued} requests requeued')
+
+
+def run_deferred_batches(miniflux_client):
+    """Scheduled job: apply finished batch jobs, then submit the requests collected since the last run."""
+    store = get_deferred_store()
+    endpoints = get_batch_endpoints()
+    for position, endpoint in enumerate(endpoints):
+        try:
+            # jobs from before the pool routed them went to the first openai endpoint
+            poll_deferred_jobs(endpoint, store, miniflux_client, unassigned=position == 0)
+        except Exception as e:
+            logger.error(f'Error polling batch jobs on {endpoint.name}: {e}')
+
+    # the pool picks a healthy endpoint whose circuit is closed and fails over on transient errors
+    pool = get_llm_pool()
+    exclude = {endpoint.name for endpoint in pool.endpoints} - {endpoint.name for endpoint in endpoints}
+    pool.request(lambda endpoint: submit_deferred_requests(endpoint, store), exclude)
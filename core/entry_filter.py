@@ -1,4 +1,7 @@
 import fnmatch
+import hashlib
+import json
+import re
 
 # Built-in deny list for internal feeds that should never be processed by any agent
 BUILTIN_DENY_LIST = [
@@ -6,36 +9,97 @@ BUILTIN_DENY_LIST = [
     'https://feeds-status.miniflux',
 ]
 
-def filter_entry(config, agent, entry):
-    start_with_list = [name[1]['title'] for name in config.agents.items()]
-    style_block = [name[1]['style_block'] for name in config.agents.items()]
-    [start_with_list.append('<blockquote>') for i in style_block if i]
+# Memoized site_url decisions are dropped once this many sites were seen
+SITE_CACHE_SIZE = 10000
 
-    # Todo Compatible with whitelist/blacklist parameter, to be removed
-    allow_list = agent[1].get('allow_list') if agent[1].get('allow_list') is not None else agent[1].get('whitelist')
-    deny_list = agent[1]['deny_list'] if agent[1].get('deny_list') is not None else agent[1].get('blacklist')
 
-    # Always block internal URLs regardless of agent config
-    if any(fnmatch.fnmatch(entry['feed']['site_url'], pattern) for pattern in BUILTIN_DENY_LIST):
-        return False
+def compile_patterns(patterns):
+    """Merge glob patterns into a single regex; None stays None and [] never matches."""
+    if patterns is None:
+        return None
+    if not patterns:
+        return re.compile(r'(?!)')
+    return re.compile('|'.join(f'(?:{fnmatch.translate(pattern)})' for pattern in patterns))
+
+
+BUILTIN_DENY_RE = compile_patterns(BUILTIN_DENY_LIST)
+
+
+def build_start_with(agents):
+    """Prefixes that mark content as already processed by one of the agents."""
+    start_with_list = [agent['title'] for agent in agents.values()]
+    if any(agent.get('style_block') for agent in agents.values()):
+        start_with_list.append('<blockquote>')
+    return tuple(start_with_list)
+
+
+def filter_key(agents):
+    """Digest of the agent settings behind ``match_agents``; a recorded filter decision expires when it changes."""
+    settings = {
+        name: [agent.get(key) for key in ('allow_list', 'deny_list', 'whitelist', 'blacklist', 'title', 'style_block')]
+        for name, agent in agents.items()
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class AgentRule:
+    def __init__(self, name, agent):
+        self.name = name
+        # Todo Compatible with whitelist/blacklist parameter, to be removed
+        allow_list = agent.get('allow_list') if agent.get('allow_list') is not None else agent.get('whitelist')
+        deny_list = agent.get('deny_list') if agent.get('deny_list') is not None else agent.get('blacklist')
+        self.allow_re = compile_patterns(allow_list)
+        self.deny_re = compile_patterns(deny_list)
 
-    # filter, if not content starts with start flag
-    if not entry['content'].startswith(tuple(start_with_list)):
+    def allows_site(self, site_url):
+        # Always block internal URLs regardless of agent config
+        if BUILTIN_DENY_RE.match(site_url):
+            return False
 
         # filter, if in allow_list
-        if allow_list is not None:
-            if any(fnmatch.fnmatch(entry['feed']['site_url'], pattern) for pattern in allow_list):
-                return True
+        if self.allow_re is not None:
+            return bool(self.allow_re.match(site_url))
 
         # filter, if not in deny_list
-        elif deny_list is not None:
-            if any(fnmatch.fnmatch(entry['feed']['site_url'], pattern) for pattern in deny_list):
-                return False
-            else:
-                return True
+        if self.deny_re is not None:
+            return not self.deny_re.match(site_url)
 
         # filter, if allow_list and deny_list are both None
-        elif allow_list is None and deny_list is None:
-            return True
+        return True
 
-    return False
+
+class AgentFilter:
+    """Filter for all configured agents, compiled once per config.
+
+    Site decisions are memoized per ``site_url`` so most entries cost one
+    dict lookup and one ``startswith`` check.
+    """
+
+    def __init__(self, agents):
+        self.key = filter_key(agents)
+        self.start_with = build_start_with(agents)
+        self.rules = [AgentRule(name, agent) for name, agent in agents.items()]
+        self.site_cache = {}
+
+    def site_agents(self, site_url):
+        agents = self.site_cache.get(site_url)
+        if agents is None:
+            if len(self.site_cache) >= SITE_CACHE_SIZE:
+                self.site_cache.clear()
+            agents = frozenset(rule.name for rule in self.rules if rule.allows_site(site_url))
+            self.site_cache[site_url] = agents
+        return agents
+
+    def match_agents(self, entry):
+        """Names of every agent that should process the entry, in config order."""
+        # filter, if not content starts with start flag
+        if entry['content'].startswith(self.start_with):
+            return []
+        site_agents = self.site_agents(entry['feed']['site_url'])
+        return [rule.name for rule in self.rules if rule.name in site_agents]
+
+
+def filter_entry(config, agent, entry):
+    if entry['content'].startswith(build_start_with(config.agents)):
+        return False
+    return AgentRule(agent[0], agent[1]).allows_site(entry['feed']['site_url'])
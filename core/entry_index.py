@@ -0,0 +1,112 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+from common.config import config
+from common.singleton import fork_safe_singleton
+
+ENTRY_INDEX_FILE = 'entry_index.db'
+
+def content_hash(content):
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+class EntryIndex:
+    """Durable record of the (entry, agent) pairs that were already handled.
+
+    Each row stores the hash of the entry content as it was left in Miniflux,
+    so an entry is only handed to an agent again when its content changes.
+    Agents that skipped an entry because of their allow/deny lists are kept
+    apart with the key of the filter settings, so the entry is looked at
+    again once those settings change.
+    """
+
+    def __init__(self, file_path=ENTRY_INDEX_FILE):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(file_path), check_same_thread=False)
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS processed ('
+                'entry_id INTEGER NOT NULL, '
+                'agent TEXT NOT NULL, '
+                'content_hash TEXT NOT NULL, '
+                'processed_at REAL NOT NULL, '
+                'PRIMARY KEY (entry_id, agent))'
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS processed_at_idx ON processed (processed_at)')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS filtered ('
+                'entry_id INTEGER NOT NULL, '
+                'agent TEXT NOT NULL, '
+                'content_hash TEXT NOT NULL, '
+                'filter_key TEXT NOT NULL, '
+                'filtered_at REAL NOT NULL, '
+                'PRIMARY KEY (entry_id, agent))'
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS filtered_at_idx ON filtered (filtered_at)')
+            self.conn.commit()
+
+    def pending_agents(self, entry, agent_names, filter_key=None):
+        """Return the agents in ``agent_names`` that have not handled this entry content yet.
+
+        An agent that filtered the entry out counts as done only while the
+        filter settings still have ``filter_key``.
+        """
+        digest = content_hash(entry['content'])
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT agent FROM processed WHERE entry_id = ? AND content_hash = ? '
+                'UNION SELECT agent FROM filtered WHERE entry_id = ? AND content_hash = ? AND filter_key = ?',
+                (entry['id'], digest, entry['id'], digest, filter_key),
+            ).fetchall()
+        done = {row[0] for row in rows}
+        return [name for name in agent_names if name not in done]
+
+    def mark_processed(self, entry_id, agent_names, content):
+        if not agent_names:
+            return
+        digest = content_hash(content)
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO processed (entry_id, agent, content_hash, processed_at) VALUES (?, ?, ?, ?)',
+                [(entry_id, name, digest, now) for name in agent_names],
+            )
+            self.conn.commit()
+
+    def mark_filtered(self, entry_id, agent_names, content, filter_key):
+        """Record agents that skipped the entry under the filter settings with ``filter_key``."""
+        if not agent_names:
+            return
+        digest = content_hash(content)
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO filtered (entry_id, agent, content_hash, filter_key, filtered_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(entry_id, name, digest, filter_key, now) for name in agent_names],
+            )
+            self.conn.commit()
+
+    def prune(self, retention_days):
+        """Drop rows older than ``retention_days``; returns the number of removed rows."""
+        cutoff = time.time() - retention_days * 86400
+        with self.lock:
+            removed = self.conn.execute('DELETE FROM processed WHERE processed_at < ?', (cutoff,)).rowcount
+            removed += self.conn.execute('DELETE FROM filtered WHERE filtered_at < ?', (cutoff,)).rowcount
+            self.conn.commit()
+        return removed
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+@fork_safe_singleton
+def get_entry_index():
+    """Shared index built from config, or None when the index is disabled."""
+    if not config.entry_index_enabled:
+        return None
+    return EntryIndex(config.entry_index_file)
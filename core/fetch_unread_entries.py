@@ -1,27 +1,178 @@
 import concurrent.futures
+import json
 import time
 import traceback
+from pathlib import Path
 
 from common.logger import logger
-from core.process_entries import process_entry
+from common.metrics import ENTRIES_FETCHED
+from common.tracing import span
+from core.async_engine import get_async_engine
+from core.concurrency_limiter import worker_count
+from core.entry_index import get_entry_index
+from core.priority import PriorityExecutor, entry_priority
+from core.process_entries import pending_agents, process_entry, queue_batch_candidates
+
+FETCH_STATE_FILE = Path('fetch_state.json')
+
+
+def load_fetch_cursor(file_path=FETCH_STATE_FILE):
+    path = Path(file_path)
+    try:
+        with path.open('r', encoding='utf-8') as file:
+            state = json.load(file)
+    except FileNotFoundError:
+        return 0
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f'Failed to read fetch state file {path}: {e}')
+        return 0
+
+    if not isinstance(state, dict):
+        return 0
+    try:
+        return int(state.get('after_entry_id') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def save_fetch_cursor(after_entry_id, file_path=FETCH_STATE_FILE):
+    path = Path(file_path)
+    with path.open('w', encoding='utf-8') as file:
+        json.dump({'after_entry_id': after_entry_id}, file, indent=2)
+
+
+def iter_unread_pages(miniflux_client, after_entry_id=0, page_size=100):
+    """Yield pages of unread entries with an id greater than ``after_entry_id``, oldest first."""
+    while True:
+        with span('miniflux.get_entries', {'after_entry_id': after_entry_id}):
+            page = miniflux_client.get_entries(
+                status=['unread'],
+                after_entry_id=after_entry_id,
+                order='id',
+                direction='asc',
+                limit=page_size,
+            )['entries']
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after_entry_id = max(entry['id'] for entry in page)
+
+
+def filter_pending_entries(config, entries):
+    """Drop entries every agent has already handled.
+
+    The Miniflux API has no id-only listing, so the index is consulted once a
+    page of entries has been downloaded; in ``full`` fetch mode every unread
+    entry is still fetched on each poll. ``incremental`` mode avoids that.
+    """
+    if not get_entry_index():
+        return entries
+    return [entry for entry in entries if pending_agents(entry)]
+
+
+def collect_failed_entries(futures, entry_ids):
+    """Ids of the entries whose future raised or reported agents that still need a run."""
+    failed = set()
+    for future in futures:
+        try:
+            failed_agents = future.result()
+        except Exception:
+            logger.error(traceback.format_exc())
+            failed_agents = True
+        if failed_agents:
+            failed.add(entry_ids[future])
+    return failed
+
+
+def next_fetch_cursor(cursor, failed_entry_ids):
+    """Stop the cursor below the lowest failed entry, so the next poll fetches it again."""
+    if not failed_entry_ids:
+        return cursor
+    return min(cursor, min(failed_entry_ids) - 1)
+
+
+def queue_batches_first(submit):
+    """Wrap a thread pool ``submit`` so batch candidates are queued before a worker takes the entry."""
+    def submit_entry(entry):
+        queued = queue_batch_candidates(entry)
+        future = submit(entry)
+        # drop what the worker did not pick up, e.g. when the entry failed before its agents ran
+        future.add_done_callback(lambda _: [batcher.discard(request) for batcher, request in queued])
+        return future
+
+    return submit_entry
 
 
 def fetch_unread_entries(config, miniflux_client):
-    entries = miniflux_client.get_entries(status=['unread'], limit=10000)
-    start_time = time.time()
-    logger.info('Get unread entries: ' + str(len(entries['entries']))) if len(entries['entries']) > 0 else logger.info('No new entries')
+    # a larger window lets fresh entries from later pages overtake the backlog
+    max_pending = config.priority_window if config.priority_enabled else config.miniflux_page_size * 2
 
-    if not entries['entries']:
+    if config.llm_engine == 'async':
+        submit_unread_entries(config, miniflux_client, get_async_engine().submit_entry, max_pending)
         return
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=config.llm_max_workers) as executor:
-        futures = [executor.submit(process_entry, miniflux_client, entry) for entry in entries['entries']]
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                data = future.result()
-            except Exception as e:
-                logger.error(traceback.format_exc())
-                logger.error('generated an exception: %s' % e)
+    if config.priority_enabled:
+        with PriorityExecutor(worker_count()) as executor:
+            submit_unread_entries(
+                config,
+                miniflux_client,
+                queue_batches_first(lambda entry: executor.submit(entry_priority(entry), process_entry, entry)),
+                max_pending,
+            )
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=worker_count()) as executor:
+        submit_unread_entries(
+            config,
+            miniflux_client,
+            queue_batches_first(lambda entry: executor.submit(process_entry, entry)),
+            max_pending,
+        )
+
+
+def submit_unread_entries(config, miniflux_client, submit, max_pending=None):
+    """Page through unread entries, hand pending ones to ``submit`` and wait for them to finish.
+
+    At most ``max_pending`` entries (two pages by default) are in flight, so memory stays bounded on large backlogs.
+    """
+    start_time = time.time()
+    incremental = config.miniflux_fetch_mode == 'incremental'
+    cursor = load_fetch_cursor(config.miniflux_fetch_state_file) if incremental else 0
+    unread_count = 0
+    submitted_count = 0
+    max_pending = max_pending or config.miniflux_page_size * 2
+
+    futures = set()
+    entry_ids = {}
+    failed_entry_ids = set()
+    fetched_cursor = cursor
+    for page in iter_unread_pages(miniflux_client, cursor, config.miniflux_page_size):
+        unread_count += len(page)
+        ENTRIES_FETCHED.labels('poll').inc(len(page))
+        fetched_cursor = max(fetched_cursor, max(entry['id'] for entry in page))
+        pending_entries = filter_pending_entries(config, page)
+        logger.debug(f'Fetched page of {len(page)} unread entries, {len(pending_entries)} pending')
+
+        for entry in pending_entries:
+            future = submit(entry)
+            entry_ids[future] = entry['id']
+            futures.add(future)
+        submitted_count += len(pending_entries)
+
+        while len(futures) > max_pending:
+            done, futures = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            failed_entry_ids |= collect_failed_entries(done, entry_ids)
+
+    logger.info('Get unread entries: ' + str(submitted_count)) if submitted_count > 0 else logger.info('No new entries')
+    logger.debug(f'Skipped already processed entries: {unread_count - submitted_count}')
+    failed_entry_ids |= collect_failed_entries(concurrent.futures.as_completed(futures), entry_ids)
+
+    if incremental:
+        if failed_entry_ids:
+            logger.warning(f'{len(failed_entry_ids)} entries failed, they are fetched again on the next poll')
+        save_fetch_cursor(next_fetch_cursor(fetched_cursor, failed_entry_ids), config.miniflux_fetch_state_file)
 
-    if len(entries['entries']) > 0 and time.time() - start_time >= 3:
+    if submitted_count > 0 and time.time() - start_time >= 3:
         logger.info('Done')
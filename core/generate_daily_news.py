@@ -1,34 +1,106 @@
+import concurrent.futures
 import json
 import time
 
 from common import logger
-from common.config import Config
-from core.get_ai_result import get_ai_result
+from common.config import config
+from common.metrics import agent_context
+from core.ai_news_store import import_legacy_entries, iter_entries, rotate_entries
+from core.concurrency_limiter import worker_count
+from core.get_ai_result import get_ai_result, truncate_request
+from core.rate_limiter import estimate_tokens
+
+
+def pack_chunks(texts, max_tokens, min_items=1, header='', max_chars=None):
+    """Greedily pack texts into newline-joined chunks of about ``max_tokens`` (and ``max_chars``) each.
+
+    A chunk always takes at least ``min_items`` texts, so repeated packing
+    of oversized texts still converges.
+    """
+    chunks = []
+    chunk, size, chars = [], 0, len(header)
+    for text in texts:
+        tokens = estimate_tokens(text)
+        over_chars = max_chars and chars + len(text) + len(chunk) > max_chars
+        if len(chunk) >= min_items and (size + tokens > max_tokens or over_chars):
+            chunks.append(header + '\n'.join(chunk))
+            chunk, size, chars = [], 0, len(header)
+        chunk.append(text)
+        size += tokens
+        chars += len(text)
+    if chunk:
+        chunks.append(header + '\n'.join(chunk))
+    return chunks
+
+
+def chunk_budget(chunk_tokens):
+    """Token and character budget of a chunk, within ``llm.max_input_tokens`` and ``llm.max_length`` so no chunk is cut."""
+    max_tokens = min(chunk_tokens, config.llm_max_input_tokens or chunk_tokens)
+    return max_tokens, config.llm_max_length
+
+
+def chunk_entries(entries, max_tokens, max_chars=None):
+    """Group summaries by category and split every group into token-bounded chunks."""
+    categories = {}
+    for entry in entries:
+        categories.setdefault(entry.get('category') or 'Other', []).append(entry['content'])
+
+    chunks = []
+    for category, contents in categories.items():
+        chunks.extend(pack_chunks(contents, max_tokens, header=f'## {category}\n', max_chars=max_chars))
+    return chunks
+
+
+def get_ai_news_result(prompt, request):
+    with agent_context('ai_news'):
+        return get_ai_result(prompt, request)
+
+
+def map_reduce_summary(prompt, entries, chunk_tokens):
+    """Summarize chunks in parallel, then merge partial results until one block remains."""
+    max_tokens, max_chars = chunk_budget(chunk_tokens)
+    chunks = chunk_entries(entries, max_tokens, max_chars)
+    if not chunks:
+        return ''
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=worker_count()) as executor:
+        level = 0
+        while True:
+            logger.debug(f'Daily news map-reduce level {level}: {len(chunks)} chunks')
+            for chunk in chunks:
+                if truncate_request(chunk) != chunk:
+                    logger.warning(f'Daily news chunk of {estimate_tokens(chunk)} tokens is cut at the LLM input limit')
+            results = list(executor.map(lambda chunk: get_ai_news_result(prompt, chunk), chunks))
+            if len(results) == 1:
+                return results[0]
+            chunks = pack_chunks(results, max_tokens, min_items=2, max_chars=max_chars)
+            level += 1
 
-config = Config()
 
 def generate_daily_news(miniflux_client):
     logger.info('Generating daily news')
-    # fetch entries.json
-    try:
-        with open('entries.json', 'r') as f:
-            entries = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        logger.warning('entries.json not found or corrupted, skipping daily news generation')
-        return []
-
-    if not entries:
+    import_legacy_entries()
+    # move the collected summaries aside, new ones go to a fresh file meanwhile
+    entries_file = rotate_entries()
+    if not entries_file:
         logger.info('No entries to generate daily news')
         return []
 
     try:
-        contents = '\n'.join([i['content'] for i in entries])
         # greeting
-        greeting = get_ai_result(config.ai_news_prompts['greeting'], time.strftime('%B %d, %Y at %I:%M %p'))
+        greeting = get_ai_news_result(config.ai_news_prompts['greeting'], time.strftime('%B %d, %Y at %I:%M %p'))
         # summary_block
-        summary_block = get_ai_result(config.ai_news_prompts['summary_block'], contents)
+        if config.ai_news_map_reduce:
+            summary_block = map_reduce_summary(
+                config.ai_news_prompts['summary_block'],
+                iter_entries(entries_file),
+                config.ai_news_chunk_tokens,
+            )
+        else:
+            contents = '\n'.join(i['content'] for i in iter_entries(entries_file))
+            summary_block = get_ai_news_result(config.ai_news_prompts['summary_block'], contents)
         # summary
-        summary = get_ai_result(config.ai_news_prompts['summary'], summary_block)
+        summary = get_ai_news_result(config.ai_news_prompts['summary'], summary_block)
 
         response_content = greeting + '\n\n### 🌐Summary\n' + summary + '\n\n### 📝News\n' + summary_block
 
@@ -50,8 +122,7 @@ def generate_daily_news(miniflux_client):
     
     finally:
         try:
-            with open('entries.json', 'w') as f:
-                json.dump([], f, indent=4, ensure_ascii=False)
-            logger.info('Cleared entries.json')
+            entries_file.unlink()
+            logger.info(f'Cleared {entries_file}')
         except Exception as e:
-            logger.error(f'Failed to clear entries.json: {e}')
\ No newline at end of file
+            logger.error(f'Failed to clear {entries_file}: {e}')
\ No newline at end of file
@@ -1,76 +1,171 @@
-from markdownify import markdownify as md
+import asyncio
+import time
 
-from openai import OpenAI
-from google import genai
-from google.genai import types
-from common.config import Config
+from common.config import config
 from common.logger import logger
+from common.metrics import (
+    LLM_COMPLETION_TOKENS,
+    LLM_ERRORS,
+    LLM_PROMPT_TOKENS,
+    LLM_REQUEST_SECONDS,
+    RATE_LIMIT_WAIT_SECONDS,
+    current_agent,
+)
+from common.tracing import set_attributes, span
+from core.llm_cache import get_llm_cache, make_cache_key
+from core.llm_pool import get_llm_pool
+from core.preprocess import truncate_text
+from core.rate_limiter import estimate_tokens, get_rate_limiter, get_retry_after
 
-config = Config()
 
-if not config.llm_provider or config.llm_provider == "openai":
-    llm_client = OpenAI(base_url=config.llm_base_url, api_key=config.llm_api_key)
-elif config.llm_provider == "gemini":
-    llm_client = genai.Client(
-        http_options=types.HttpOptions(base_url=config.llm_base_url),
-        api_key=config.llm_api_key,
+def truncate_request(request: str):
+    return truncate_text(request, config.llm_max_input_tokens, config.llm_max_length)
+
+
+def output_budget():
+    """The streaming output limits, part of the cache key so raising them drops responses cut at the old ones."""
+    if config.llm_stream and (config.llm_max_output_tokens or config.llm_max_stream_seconds):
+        return [config.llm_max_output_tokens, config.llm_max_stream_seconds]
+    return None
+
+
+def get_cache_key(prompt: str, request: str, endpoint):
+    """Cache key of a response written by the provider and model of ``endpoint``."""
+    return make_cache_key(
+        endpoint.provider_name, endpoint.model, config.llm_extra_params, prompt, request, output_budget()
     )
 
 
-def get_ai_result(prompt: str, request: str):
-    if config.llm_max_length and len(request) > config.llm_max_length:
-        request = request[: config.llm_max_length]
-
-    if config.llm_provider == "gemini":
-        try:
-            if "${content}" in prompt:
-                instruction = ["You are a helpful assistant."]
-                contents = prompt.replace("${content}", md(request))
-            else:
-                instruction = [prompt]
-                contents = "The following is the input content:\n---\n " + md(request)
-
-            response = llm_client.models.generate_content(
-                model=config.llm_model,
-                contents=contents,
-                config=types.GenerateContentConfig(
-                    system_instruction=instruction,
-                    **config.llm_extra_params,
-                ),
-            )
-            return response.text
-        except Exception as e:
-            logger.error(f"Error in get_ai_result (Gemini): {e}")
-            raise
-    else:
-        if "${content}" in prompt:
-            messages = [
-                {"role": "system", "content": "You are a helpful assistant."},
-                {
-                    "role": "user",
-                    "content": prompt.replace("${content}", md(request)),
-                },
-            ]
-        else:
-            messages = [
-                {"role": "system", "content": prompt},
-                {
-                    "role": "user",
-                    "content": "The following is the input content:\n---\n "
-                    + md(request),
-                },
-            ]
-
-        try:
-            completion = llm_client.chat.completions.create(
-                model=config.llm_model,
-                messages=messages,
-                timeout=config.llm_timeout,
-                **config.llm_extra_params,
-            )
-
-            response_content = completion.choices[0].message.content
-            return response_content
-        except Exception as e:
-            logger.error(f"Error in get_ai_result (OpenAI): {e}")
-            raise
+def get_cached_result(llm_cache, prompt: str, request: str):
+    """A cached response from any provider and model of the endpoint pool, or None."""
+    keys = {}
+    for endpoint in get_llm_pool().endpoints:
+        keys.setdefault((endpoint.provider_name, endpoint.model), get_cache_key(prompt, request, endpoint))
+    for cache_key in keys.values():
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    return None
+
+
+def start_request(current, prompt: str, request: str, truncate: bool):
+    """Truncate the request and look it up in the cache; returns (request, LLM cache, cached response)."""
+    if truncate:
+        request = truncate_request(request)
+    llm_cache = get_llm_cache()
+    cached = get_cached_result(llm_cache, prompt, request) if llm_cache is not None else None
+    if cached is not None:
+        logger.debug("LLM cache hit")
+        set_attributes(current, {'llm.cache_hit': True})
+    return request, llm_cache, cached
+
+
+def finish_request(llm_cache, prompt: str, request: str, endpoint, response_content):
+    # keyed by the endpoint that answered, a fallback model never passes for the primary one
+    if llm_cache is not None:
+        llm_cache.set(get_cache_key(prompt, request, endpoint), response_content)
+
+
+def should_retry(rate_limiter, error, attempt):
+    """Pause for the Retry-After of a rate limited request; False if ``error`` is final."""
+    retry_after = get_retry_after(error)
+    if retry_after is None or attempt == config.llm_rate_limit_retries:
+        return False
+    rate_limiter.pause(retry_after)
+    return True
+
+
+def get_ai_result(prompt: str, request: str, truncate: bool = True):
+    return request_ai_result(prompt, request, truncate)[0]
+
+
+def request_ai_result(prompt: str, request: str, truncate: bool = True):
+    """Return the response and the endpoint that wrote it (None when it came from the cache)."""
+    with span('get_ai_result', {'agent': current_agent.get()}) as current:
+        request, llm_cache, cached = start_request(current, prompt, request, truncate)
+        if cached is not None:
+            return cached, None
+
+        rate_limiter = get_rate_limiter()
+        prompt_tokens = estimate_tokens(prompt) + estimate_tokens(request)
+        for attempt in range(config.llm_rate_limit_retries + 1):
+            with span('rate_limit.wait'):
+                waited = rate_limiter.acquire(prompt_tokens)
+            RATE_LIMIT_WAIT_SECONDS.labels(config.llm_provider).observe(waited)
+            # the pool skips endpoints whose circuit is open and fails over to the next one
+            try:
+                endpoint, response_content = get_llm_pool().request(
+                    lambda endpoint: (endpoint, request_llm(prompt, request, endpoint))
+                )
+                break
+            except Exception as e:
+                if not should_retry(rate_limiter, e, attempt):
+                    raise
+
+        rate_limiter.charge(estimate_tokens(response_content))
+        finish_request(llm_cache, prompt, request, endpoint, response_content)
+        return response_content, endpoint
+
+
+async def get_ai_result_async(prompt: str, request: str):
+    with span('get_ai_result', {'agent': current_agent.get()}) as current:
+        # the cache may be SQLite, look it up off the event loop
+        request, llm_cache, cached = await asyncio.to_thread(start_request, current, prompt, request, True)
+        if cached is not None:
+            return cached
+
+        async def send(endpoint):
+            return endpoint, await request_llm_async(prompt, request, endpoint)
+
+        rate_limiter = get_rate_limiter()
+        prompt_tokens = estimate_tokens(prompt) + estimate_tokens(request)
+        for attempt in range(config.llm_rate_limit_retries + 1):
+            with span('rate_limit.wait'):
+                waited = await rate_limiter.acquire_async(prompt_tokens)
+            RATE_LIMIT_WAIT_SECONDS.labels(config.llm_provider).observe(waited)
+            try:
+                endpoint, response_content = await get_llm_pool().request_async(send)
+                break
+            except Exception as e:
+                if not should_retry(rate_limiter, e, attempt):
+                    raise
+
+        rate_limiter.charge(estimate_tokens(response_content))
+        await asyncio.to_thread(finish_request, llm_cache, prompt, request, endpoint, response_content)
+        return response_content
+
+
+def llm_labels(endpoint):
+    return endpoint.provider_name, endpoint.model or '', current_agent.get()
+
+
+def observe_llm_request(labels, started, prompt, request, response_content):
+    LLM_REQUEST_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+    LLM_PROMPT_TOKENS.labels(*labels).inc(estimate_tokens(prompt) + estimate_tokens(request))
+    LLM_COMPLETION_TOKENS.labels(*labels).inc(estimate_tokens(response_content))
+
+
+def request_llm(prompt: str, request: str, endpoint):
+    labels = llm_labels(endpoint)
+    started = time.perf_counter()
+    try:
+        with span('llm.request', {'llm.provider': labels[0], 'llm.model': labels[1], 'llm.endpoint': endpoint.name}):
+            response_content = endpoint.get_provider().request(prompt, request)
+    except Exception:
+        LLM_ERRORS.labels(*labels).inc()
+        raise
+    observe_llm_request(labels, started, prompt, request, response_content)
+    return response_content
+
+
+async def request_llm_async(prompt: str, request: str, endpoint):
+    labels = llm_labels(endpoint)
+    started = time.perf_counter()
+    try:
+        with span('llm.request', {'llm.provider': labels[0], 'llm.model': labels[1], 'llm.endpoint': endpoint.name}):
+            response_content = await endpoint.get_provider().request_async(prompt, request)
+    except Exception:
+        LLM_ERRORS.labels(*labels).inc()
+        raise
+    observe_llm_request(labels, started, prompt, request, response_content)
+    return response_content
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from common.config import config
+from common.logger import logger
+from common.singleton import fork_safe_singleton
+
+LLM_CACHE_FILE = 'llm_cache.db'
+
+def normalize_content(content):
+    return ' '.join((content or '').split())
+
+
+def make_cache_key(provider, model, extra_params, prompt, content, output_budget=None):
+    parts = [provider or 'openai', model, extra_params or {}, prompt, normalize_content(content)]
+    if output_budget:
+        # a response cut at a smaller budget must not be served once the budget is raised
+        parts.append(output_budget)
+    payload = json.dumps(
+        parts,
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Base class for LLM response caches; subclasses implement ``_get``, ``_set`` and ``__len__``."""
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self._get(key, time.time())
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if value is None:
+            return
+        with self.lock:
+            self._set(key, value, time.time())
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self),
+            }
+
+    def _expired(self, created_at, now):
+        return bool(self.ttl) and now - created_at > self.ttl
+
+
+class MemoryLLMCache(LLMCache):
+    def __init__(self, ttl=None, max_entries=None):
+        super().__init__(ttl, max_entries)
+        self.items = OrderedDict()
+
+    def __len__(self):
+        return len(self.items)
+
+    def _get(self, key, now):
+        item = self.items.get(key)
+        if item is None:
+            return None
+        value, created_at = item
+        if self._expired(created_at, now):
+            del self.items[key]
+            return None
+        self.items.move_to_end(key)
+        return value
+
+    def _set(self, key, value, now):
+        self.items[key] = (value, now)
+        self.items.move_to_end(key)
+        while self.max_entries and len(self.items) > self.max_entries:
+            self.items.popitem(last=False)
+            self.evictions += 1
+
+
+class SQLiteLLMCache(LLMCache):
+    def __init__(self, file_path=LLM_CACHE_FILE, ttl=None, max_entries=None):
+        super().__init__(ttl, max_entries)
+        self.conn = sqlite3.connect(str(file_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS llm_cache ('
+            'key TEXT PRIMARY KEY, '
+            'value TEXT NOT NULL, '
+            'created_at REAL NOT NULL, '
+            'accessed_at REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS llm_cache_accessed_at_idx ON llm_cache (accessed_at)')
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+
+    def _get(self, key, now):
+        row = self.conn.execute('SELECT value, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if self._expired(created_at, now):
+            self.conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            self.conn.commit()
+            return None
+        self.conn.execute('UPDATE llm_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        self.conn.commit()
+        return value
+
+    def _set(self, key, value, now):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, value, now, now),
+        )
+        if self.ttl:
+            self.conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl,))
+        if self.max_entries:
+            overflow = len(self) - self.max_entries
+            if overflow > 0:
+                self.conn.execute(
+                    'DELETE FROM llm_cache WHERE key IN '
+                    '(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)',
+                    (overflow,),
+                )
+                self.evictions += overflow
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+LLM_CACHE_BACKENDS = {
+    'memory': lambda: MemoryLLMCache(config.llm_cache_ttl, config.llm_cache_max_entries),
+    'sqlite': lambda: SQLiteLLMCache(config.llm_cache_file, config.llm_cache_ttl, config.llm_cache_max_entries),
+}
+
+
+@fork_safe_singleton
+def get_llm_cache():
+    """Shared cache built from config, or None when caching is disabled."""
+    if not config.llm_cache_enabled:
+        return None
+    if config.llm_cache_backend not in LLM_CACHE_BACKENDS:
+        raise ValueError(f'Unknown llm_cache.backend: {config.llm_cache_backend}')
+    logger.debug(f'Using {config.llm_cache_backend} LLM cache')
+    return LLM_CACHE_BACKENDS[config.llm_cache_backend]()
@@ -0,0 +1,277 @@
+import asyncio
+import contextlib
+import threading
+import time
+from urllib.parse import urlparse
+
+from common.config import config
+from common.logger import logger
+from common.metrics import LLM_ENDPOINT_HEALTHY, LLM_ENDPOINT_OUTSTANDING
+from common.singleton import fork_safe_singleton
+from core.circuit_breaker import CircuitOpenError, get_circuit_breaker, is_transient
+from core.concurrency_limiter import limit_concurrency, limit_concurrency_async
+from core.llm_providers import LLM_PROVIDERS
+
+# Requests averaged by an endpoint's latency estimate
+LATENCY_WINDOW = 10
+
+@config.on_reload
+def _reset_llm_pool():
+    # picks up new endpoints; requests in flight finish on the old pool
+    get_llm_pool.reset()
+
+
+class Endpoint:
+    """One inference server of the pool; its provider client is built on the first request."""
+
+    def __init__(self, name, provider_name='openai', base_url=None, api_key=None, model=None,
+                 weight=1, max_concurrency=None):
+        self.name = name
+        self.provider_name = provider_name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.provider = None
+        self.provider_lock = threading.Lock()
+        self.outstanding = 0
+        self.latency = None
+        self.healthy = True
+
+    def get_provider(self):
+        with self.provider_lock:
+            if self.provider is None:
+                self.provider = LLM_PROVIDERS[self.provider_name](self.base_url, self.api_key, self.model)
+        return self.provider
+
+    @property
+    def full(self):
+        return self.max_concurrency is not None and self.outstanding >= self.max_concurrency
+
+
+def build_endpoints():
+    """Endpoints from ``llm.endpoints``, or the single ``llm.base_url`` endpoint named after the provider."""
+    if not config.llm_endpoints:
+        return [Endpoint(config.llm_provider, config.llm_provider, config.llm_base_url, config.llm_api_key,
+                         config.llm_model)]
+
+    endpoints = []
+    names = set()
+    for index, options in enumerate(config.llm_endpoints):
+        name = options.get('name') or urlparse(options['base_url']).netloc or options['base_url']
+        if name in names:
+            name = f'{name}#{index}'
+        names.add(name)
+        endpoints.append(Endpoint(
+            name,
+            options.get('provider', config.llm_provider),
+            options['base_url'],
+            options.get('api_key', config.llm_api_key),
+            options.get('model', config.llm_model),
+            options.get('weight', 1),
+            options.get('max_concurrency'),
+        ))
+    return endpoints
+
+
+class LLMPool:
+    """Route LLM requests over several endpoints and fail over between them.
+
+    ``least_outstanding`` routing picks the endpoint with the fewest requests
+    in flight per unit of ``weight``; ``latency`` routing multiplies that
+    load by the endpoint's recent latency, so slower servers get less
+    traffic. A failed request moves on to the next endpoint until each one
+    was tried once. Endpoints whose circuit breaker is open, that are at
+    ``max_concurrency`` or that failed their last health check are skipped;
+    if every endpoint failed its health check they are all tried anyway.
+    """
+
+    def __init__(self, endpoints, routing='least_outstanding'):
+        self.endpoints = endpoints
+        self.routing = routing
+        self.condition = threading.Condition()
+        # (loop, event) of the coroutines waiting in acquire_async for a free endpoint
+        self.async_waiters = []
+        self.closed = threading.Event()
+        for endpoint in endpoints:
+            self.report(endpoint)
+
+    def notify(self):
+        """Wake every caller waiting for an endpoint; the condition must be held."""
+        self.condition.notify_all()
+        waiters, self.async_waiters = self.async_waiters, []
+        for loop, freed in waiters:
+            # the loop of a waiter that gave up may be closed already
+            with contextlib.suppress(RuntimeError):
+                loop.call_soon_threadsafe(freed.set)
+
+    def report(self, endpoint):
+        LLM_ENDPOINT_OUTSTANDING.labels(endpoint.name).set(endpoint.outstanding)
+        LLM_ENDPOINT_HEALTHY.labels(endpoint.name).set(int(endpoint.healthy))
+
+    def score(self, endpoint):
+        load = (endpoint.outstanding + 1) / endpoint.weight
+        if self.routing == 'latency':
+            # an endpoint without measurements yet is tried first
+            return load * (endpoint.latency or 0.0)
+        return load
+
+    def try_acquire(self, tried):
+        """Reserve the best endpoint not in ``tried``; None while all usable endpoints are full.
+
+        Raises ``CircuitOpenError`` for the endpoint that reopens first when
+        every remaining endpoint has an open circuit.
+        """
+        with self.condition:
+            remaining = [endpoint for endpoint in self.endpoints if endpoint.name not in tried]
+            healthy = [endpoint for endpoint in remaining if endpoint.healthy] or remaining
+            rejected = []
+            for endpoint in sorted((e for e in healthy if not e.full), key=self.score):
+                try:
+                    get_circuit_breaker(endpoint.name).before_call()
+                except CircuitOpenError as e:
+                    rejected.append(e)
+                    continue
+                endpoint.outstanding += 1
+                self.report(endpoint)
+                return endpoint
+            if any(endpoint.full for endpoint in healthy):
+                return None
+            if not rejected:
+                raise RuntimeError('No LLM endpoint left to try')
+            raise min(rejected, key=lambda e: e.retry_at)
+
+    def acquire(self, tried):
+        with self.condition:
+            while True:
+                endpoint = self.try_acquire(tried)
+                if endpoint is not None:
+                    return endpoint
+                self.condition.wait()
+
+    async def acquire_async(self, tried):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                endpoint = self.try_acquire(tried)
+                if endpoint is not None:
+                    return endpoint
+                # a threading.Condition cannot be awaited, release sets the event on this loop instead
+                freed = asyncio.Event()
+                self.async_waiters.append((loop, freed))
+            await freed.wait()
+
+    def release(self, endpoint, latency=None, error=None):
+        """Free the slot taken by ``acquire``; pass the ``latency`` of a success or the ``error`` of a failure."""
+        breaker = get_circuit_breaker(endpoint.name)
+        if error is not None and is_transient(error):
+            breaker.record_failure()
+        else:
+            # the endpoint answered, even if it rejected the request
+            breaker.record_success()
+        with self.condition:
+            endpoint.outstanding -= 1
+            if latency is not None:
+                if endpoint.latency is None:
+                    endpoint.latency = latency
+                else:
+                    endpoint.latency += (latency - endpoint.latency) / LATENCY_WINDOW
+            self.report(endpoint)
+            self.notify()
+
+    def failover(self, endpoint, error, tried):
+        """Return True if the request should be sent to another endpoint after ``error``.
+
+        A request the endpoint rejected would be rejected by the others too.
+        """
+        if len(tried) >= len(self.endpoints) or not is_transient(error):
+            return False
+        logger.warning(f'LLM endpoint {endpoint.name} failed ({error}), trying another endpoint')
+        return True
+
+    def request(self, send, exclude=()):
+        """Return ``send(endpoint)`` from the first endpoint that answers, never one named in ``exclude``."""
+        tried = set(exclude)
+        while True:
+            try:
+                endpoint = self.acquire(tried)
+            except CircuitOpenError:
+                if tried:
+                    raise last_error
+                raise
+            tried.add(endpoint.name)
+            started = time.monotonic()
+            try:
+                with limit_concurrency(endpoint.name):
+                    result = send(endpoint)
+            except Exception as e:
+                self.release(endpoint, error=e)
+                if not self.failover(endpoint, e, tried):
+                    raise
+                last_error = e
+                continue
+            self.release(endpoint, time.monotonic() - started)
+            return result
+
+    async def request_async(self, send, exclude=()):
+        tried = set(exclude)
+        while True:
+            try:
+                endpoint = await self.acquire_async(tried)
+            except CircuitOpenError:
+                if tried:
+                    raise last_error
+                raise
+            tried.add(endpoint.name)
+            started = time.monotonic()
+            try:
+                async with limit_concurrency_async(endpoint.name):
+                    result = await send(endpoint)
+            except Exception as e:
+                self.release(endpoint, error=e)
+                if not self.failover(endpoint, e, tried):
+                    raise
+                last_error = e
+                continue
+            self.release(endpoint, time.monotonic() - started)
+            return result
+
+    def check_health(self):
+        for endpoint in self.endpoints:
+            try:
+                endpoint.get_provider().health_check()
+                healthy = True
+            except Exception as e:
+                healthy = False
+                if endpoint.healthy:
+                    logger.warning(f'LLM endpoint {endpoint.name} failed its health check: {e}')
+            if healthy and not endpoint.healthy:
+                logger.info(f'LLM endpoint {endpoint.name} is healthy again')
+            with self.condition:
+                endpoint.healthy = healthy
+                self.report(endpoint)
+                self.notify()
+
+    def run_health_checks(self, interval):
+        while not self.closed.wait(interval):
+            self.check_health()
+
+    def close(self):
+        self.closed.set()
+
+
+@fork_safe_singleton(close=LLMPool.close)
+def get_llm_pool():
+    """Pool of the configured endpoints; health checks start with it when several endpoints are set."""
+    llm_pool = LLMPool(build_endpoints(), config.llm_routing)
+    if len(llm_pool.endpoints) > 1:
+        logger.info(f'Routing LLM requests over {len(llm_pool.endpoints)} endpoints ({config.llm_routing})')
+        if config.llm_health_check_interval:
+            threading.Thread(
+                target=llm_pool.run_health_checks,
+                args=(config.llm_health_check_interval,),
+                name='llm-health-check',
+                daemon=True,
+            ).start()
+    return llm_pool
@@ -0,0 +1,284 @@
+import time
+
+from common.config import config
+from common.logger import logger
+from common.metrics import LLM_FIRST_TOKEN_SECONDS, LLM_TRUNCATED_STREAMS, current_agent
+
+
+def build_gemini_request(prompt: str, request: str):
+    if "${content}" in prompt:
+        instruction = ["You are a helpful assistant."]
+        contents = prompt.replace("${content}", request)
+    else:
+        instruction = [prompt]
+        contents = "The following is the input content:\n---\n " + request
+    return instruction, contents
+
+
+def build_openai_messages(prompt: str, request: str):
+    if "${content}" in prompt:
+        return [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {
+                "role": "user",
+                "content": prompt.replace("${content}", request),
+            },
+        ]
+    return [
+        {"role": "system", "content": prompt},
+        {
+            "role": "user",
+            "content": "The following is the input content:\n---\n " + request,
+        },
+    ]
+
+
+class OutputBudget:
+    """Running estimate of a streamed output, cut off at ``max_tokens`` estimated tokens or ``max_seconds``."""
+
+    def __init__(self, max_tokens=None, max_seconds=None):
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.started_at = time.monotonic()
+        self.first_token_seconds = None
+        self.ascii_count = 0
+        self.other_count = 0
+        self.parts = []
+
+    def add(self, text):
+        """Append a streamed chunk; returns False once the budget is used up."""
+        if not text:
+            return True
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.monotonic() - self.started_at
+        self.parts.append(text)
+        ascii_count = sum(1 for char in text if ord(char) < 128)
+        self.ascii_count += ascii_count
+        self.other_count += len(text) - ascii_count
+        # same estimate as rate_limiter.estimate_tokens, kept incrementally
+        if self.max_tokens and self.ascii_count // 4 + self.other_count >= self.max_tokens:
+            return False
+        if self.max_seconds and time.monotonic() - self.started_at >= self.max_seconds:
+            return False
+        return True
+
+    def text(self, truncated):
+        return ''.join(self.parts) + (' …' if truncated else '')
+
+
+def finish_stream(budget, truncated, labels):
+    labels = (*labels, current_agent.get())
+    if budget.first_token_seconds is not None:
+        LLM_FIRST_TOKEN_SECONDS.labels(*labels).observe(budget.first_token_seconds)
+    if truncated:
+        LLM_TRUNCATED_STREAMS.labels(*labels).inc()
+    elapsed = time.monotonic() - budget.started_at
+    logger.debug(f'LLM stream: first token after {budget.first_token_seconds or 0:.2f}s, finished after {elapsed:.2f}s')
+    if truncated:
+        logger.warning(f'LLM stream cut off at the output budget after {elapsed:.1f}s')
+    return budget.text(truncated)
+
+
+def collect_stream(chunks, labels):
+    """Join a stream of text chunks, closing it early when the output budget runs out.
+
+    ``labels`` are the provider and model the time to first token and truncations are recorded for.
+    """
+    budget = OutputBudget(config.llm_max_output_tokens, config.llm_max_stream_seconds)
+    truncated = False
+    try:
+        for text in chunks:
+            if not budget.add(text):
+                truncated = True
+                break
+    finally:
+        chunks.close()
+    return finish_stream(budget, truncated, labels)
+
+
+async def collect_stream_async(chunks, labels):
+    budget = OutputBudget(config.llm_max_output_tokens, config.llm_max_stream_seconds)
+    truncated = False
+    try:
+        async for text in chunks:
+            if not budget.add(text):
+                truncated = True
+                break
+    finally:
+        await chunks.aclose()
+    return finish_stream(budget, truncated, labels)
+
+
+class OpenAIProvider:
+    """OpenAI-compatible chat completions; the SDK is imported when the provider is built."""
+
+    def __init__(self, base_url, api_key, model=None):
+        from openai import AsyncOpenAI, OpenAI
+
+        self.client = OpenAI(base_url=base_url, api_key=api_key)
+        self.async_client_class = AsyncOpenAI
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model or config.llm_model
+        self.async_client = None
+
+    def get_async_client(self):
+        # created on first use so it binds to the event loop that awaits it
+        if self.async_client is None:
+            self.async_client = self.async_client_class(base_url=self.base_url, api_key=self.api_key)
+        return self.async_client
+
+    def health_check(self):
+        self.client.models.list(timeout=config.llm_timeout)
+
+    def stream(self, messages):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            timeout=config.llm_timeout,
+            stream=True,
+            **config.llm_extra_params,
+        )
+        try:
+            for chunk in response:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # closing the response stops a generation that ran over the budget
+            response.close()
+
+    async def stream_async(self, messages):
+        response = await self.get_async_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            timeout=config.llm_timeout,
+            stream=True,
+            **config.llm_extra_params,
+        )
+        try:
+            async for chunk in response:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+    def request(self, prompt: str, request: str):
+        messages = build_openai_messages(prompt, request)
+        try:
+            if config.llm_stream:
+                return collect_stream(self.stream(messages), ('openai', self.model))
+            completion = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                timeout=config.llm_timeout,
+                **config.llm_extra_params,
+            )
+
+            response_content = completion.choices[0].message.content
+            return response_content
+        except Exception as e:
+            logger.error(f"Error in get_ai_result (OpenAI): {e}")
+            raise
+
+    async def request_async(self, prompt: str, request: str):
+        messages = build_openai_messages(prompt, request)
+        try:
+            if config.llm_stream:
+                return await collect_stream_async(self.stream_async(messages), ('openai', self.model))
+            completion = await self.get_async_client().chat.completions.create(
+                model=self.model,
+                messages=messages,
+                timeout=config.llm_timeout,
+                **config.llm_extra_params,
+            )
+
+            response_content = completion.choices[0].message.content
+            return response_content
+        except Exception as e:
+            logger.error(f"Error in get_ai_result (OpenAI): {e}")
+            raise
+
+
+class GeminiProvider:
+    """Google Gemini through google-genai; the SDK is imported when the provider is built."""
+
+    def __init__(self, base_url, api_key, model=None):
+        from google import genai
+        from google.genai import types
+
+        self.types = types
+        self.client = genai.Client(
+            http_options=types.HttpOptions(base_url=base_url),
+            api_key=api_key,
+        )
+        self.model = model or config.llm_model
+
+    def health_check(self):
+        self.client.models.get(model=self.model)
+
+    def generate_config(self, instruction):
+        return self.types.GenerateContentConfig(
+            system_instruction=instruction,
+            **config.llm_extra_params,
+        )
+
+    def stream(self, instruction, contents):
+        response = self.client.models.generate_content_stream(
+            model=self.model,
+            contents=contents,
+            config=self.generate_config(instruction),
+        )
+        try:
+            for chunk in response:
+                yield chunk.text
+        finally:
+            response.close()
+
+    async def stream_async(self, instruction, contents):
+        response = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=contents,
+            config=self.generate_config(instruction),
+        )
+        try:
+            async for chunk in response:
+                yield chunk.text
+        finally:
+            await response.aclose()
+
+    def request(self, prompt: str, request: str):
+        instruction, contents = build_gemini_request(prompt, request)
+        try:
+            if config.llm_stream:
+                return collect_stream(self.stream(instruction, contents), ('gemini', self.model))
+            response = self.client.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=self.generate_config(instruction),
+            )
+            return response.text
+        except Exception as e:
+            logger.error(f"Error in get_ai_result (Gemini): {e}")
+            raise
+
+    async def request_async(self, prompt: str, request: str):
+        instruction, contents = build_gemini_request(prompt, request)
+        try:
+            if config.llm_stream:
+                return await collect_stream_async(self.stream_async(instruction, contents), ('gemini', self.model))
+            response = await self.client.aio.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=self.generate_config(instruction),
+            )
+            return response.text
+        except Exception as e:
+            logger.error(f"Error in get_ai_result (Gemini): {e}")
+            raise
+
+
+LLM_PROVIDERS = {
+    'openai': OpenAIProvider,
+    'gemini': GeminiProvider,
+}
+
@@ -0,0 +1,228 @@
+import concurrent.futures
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import miniflux
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.config import config
+from common.logger import logger
+from common.metrics import MINIFLUX_ERRORS, MINIFLUX_REQUEST_SECONDS
+from common.singleton import fork_safe_singleton
+from core.concurrency_limiter import worker_count
+
+def endpoint_label(url):
+    """API path with ids replaced, e.g. ``/v1/entries/:id``, so the metric labels stay bounded."""
+    return re.sub(r'/\d+(?=/|$)', '/:id', urlparse(url).path)
+
+
+class InstrumentedSession(requests.Session):
+    """requests session that records the latency and errors of every Miniflux API call."""
+
+    def request(self, method, url, *args, **kwargs):
+        labels = (method.upper(), endpoint_label(url))
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException as e:
+            MINIFLUX_ERRORS.labels(*labels, type(e).__name__).inc()
+            raise
+        finally:
+            MINIFLUX_REQUEST_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+        if response.status_code >= 400:
+            MINIFLUX_ERRORS.labels(*labels, str(response.status_code)).inc()
+        return response
+
+
+def build_miniflux_session(pool_size):
+    """requests session that keeps up to ``pool_size`` connections to Miniflux alive."""
+    session = InstrumentedSession()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+@fork_safe_singleton
+def get_miniflux_client():
+    """The Miniflux client shared by polling, the webhook and the write-back stage."""
+    return miniflux.Client(
+        config.miniflux_base_url,
+        api_key=config.miniflux_api_key,
+        session=build_miniflux_session(config.miniflux_write_concurrency + worker_count()),
+    )
+
+
+def is_retryable(error):
+    if isinstance(error, requests.RequestException):
+        return True
+    status_code = getattr(error, 'status_code', None)
+    return isinstance(error, miniflux.ClientError) and (status_code == 429 or status_code >= 500)
+
+
+class WriteConflict(Exception):
+    """Raised for an update built on other content than the one already queued for the entry."""
+
+    def __init__(self, entry_id):
+        self.entry_id = entry_id
+        super().__init__(f'update of entry {entry_id} conflicts with a queued update')
+
+
+def merge_update(queued_content, content, prefix):
+    """Content carrying both the queued update and ``content``, or None if they cannot be combined."""
+    if content.startswith(queued_content):
+        # built on top of the queued update
+        return content
+    base = content[len(prefix):] if content.startswith(prefix) else None
+    if base and queued_content.endswith(base):
+        # built on the same entry as the queued update, keep both results
+        return prefix + queued_content
+    return None
+
+
+class MinifluxWriter:
+    """Write processed content back to Miniflux from a fixed number of threads.
+
+    An update queued for an entry that is not written yet is merged with the
+    queued one: it replaces it when built on top of it, and is rebased onto it
+    when both prepend a result to the same entry. Any other update conflicts
+    and fails with WriteConflict. Failed writes are retried with exponential
+    backoff; before a retry the entry is read back and the write is skipped
+    if the content already starts with the AI prefix.
+    """
+
+    def __init__(self, miniflux_client, concurrency=4, retries=5, backoff=1.0, max_backoff=60.0):
+        self.miniflux_client = miniflux_client
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.condition = threading.Condition()
+        self.pending = OrderedDict()
+        # entry id -> content being written
+        self.in_flight = {}
+        self.closed = False
+        self.written = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.retried = 0
+        self.failed = 0
+        self.threads = [
+            threading.Thread(target=self.worker, name=f'miniflux-writer-{i}', daemon=True) for i in range(concurrency)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, entry_id, content, prefix):
+        """Queue ``content`` for the entry; the future resolves to 'written' or 'skipped'.
+
+        The future fails with WriteConflict when the update cannot be merged
+        with the one already queued or being written for the entry.
+        """
+        future = concurrent.futures.Future()
+        with self.condition:
+            futures = [future]
+            queued_content = self.pending[entry_id][0] if entry_id in self.pending else self.in_flight.get(entry_id)
+            if queued_content is not None:
+                content = merge_update(queued_content, content, prefix)
+                if content is None:
+                    logger.warning(f'Rejected an update of entry {entry_id} that conflicts with a queued one')
+                    future.set_exception(WriteConflict(entry_id))
+                    return future
+            if entry_id in self.pending:
+                self.coalesced += 1
+                _, _, futures = self.pending.pop(entry_id)
+                futures.append(future)
+            self.pending[entry_id] = (content, prefix, futures)
+            self.condition.notify()
+        return future
+
+    def next_update(self):
+        with self.condition:
+            while True:
+                # an entry is never written by two threads at once
+                entry_id = next((entry_id for entry_id in self.pending if entry_id not in self.in_flight), None)
+                if entry_id is not None:
+                    update = self.pending.pop(entry_id)
+                    self.in_flight[entry_id] = update[0]
+                    return entry_id, update
+                if self.closed:
+                    return None, None
+                self.condition.wait()
+
+    def worker(self):
+        while True:
+            entry_id, update = self.next_update()
+            if entry_id is None:
+                return
+            content, prefix, futures = update
+            try:
+                result = self.write(entry_id, content, prefix)
+            except Exception as e:
+                with self.condition:
+                    self.failed += 1
+                logger.error(f'Failed to write entry {entry_id} back to Miniflux: {e}')
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future in futures:
+                    future.set_result(result)
+            finally:
+                with self.condition:
+                    self.in_flight.pop(entry_id, None)
+                    self.condition.notify_all()
+
+    def write(self, entry_id, content, prefix):
+        for attempt in range(self.retries + 1):
+            try:
+                # the previous attempt may have been applied even though it failed on our side
+                if attempt and self.miniflux_client.get_entry(entry_id)['content'].startswith(prefix):
+                    with self.condition:
+                        self.skipped += 1
+                    return 'skipped'
+                self.miniflux_client.update_entry(entry_id, content=content)
+                with self.condition:
+                    self.written += 1
+                return 'written'
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.retries:
+                    raise
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                with self.condition:
+                    self.retried += 1
+                logger.warning(f'Writing entry {entry_id} to Miniflux failed ({e}), retrying in {delay:.1f}s')
+                time.sleep(delay)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'pending': len(self.pending),
+                'in_flight': len(self.in_flight),
+                'written': self.written,
+                'coalesced': self.coalesced,
+                'skipped': self.skipped,
+                'retried': self.retried,
+                'failed': self.failed,
+            }
+
+    def close(self):
+        """Finish the queued writes and stop the threads."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+
+@fork_safe_singleton
+def get_miniflux_writer():
+    return MinifluxWriter(
+        get_miniflux_client(),
+        config.miniflux_write_concurrency,
+        config.miniflux_write_retries,
+        config.miniflux_write_backoff,
+    )
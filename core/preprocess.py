@@ -0,0 +1,108 @@
+import functools
+import re
+
+from bs4 import BeautifulSoup
+from markdownify import MarkdownConverter
+
+from common.config import config
+from core.rate_limiter import estimate_tokens
+
+# Converted entries kept in memory, so every agent and a re-delivered entry reuse the same text
+PREPROCESS_CACHE_SIZE = 256
+
+# Tags that never carry article text worth sending to the LLM
+BOILERPLATE_TAGS = [
+    'script', 'style', 'noscript', 'template', 'iframe', 'object', 'embed', 'svg', 'canvas',
+    'form', 'input', 'button', 'select', 'nav', 'aside', 'footer', 'img', 'picture', 'video', 'audio',
+]
+
+# Tags that end a line in plain text output
+BLOCK_TAGS = [
+    'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'blockquote', 'pre', 'section', 'article', 'header', 'table', 'ul', 'ol', 'dl', 'dt', 'dd', 'figcaption',
+]
+
+# Lines feed generators append to every entry
+BOILERPLATE_LINE_RE = re.compile(
+    r'^\W*(?:'
+    r'the post .+ appeared first on .+'
+    r'|(?:continue|keep) reading.*'
+    r'|read (?:more|the (?:full|rest of the) (?:article|story|post)).*'
+    r'|(?:share|like) this(?: article| post| story)?:?'
+    r'|related (?:posts|articles|stories):?'
+    r'|advertisement'
+    r')\W*$',
+    re.IGNORECASE,
+)
+
+# Split after sentence punctuation followed by whitespace, after CJK punctuation, and at line breaks
+SENTENCE_RE = re.compile(r'(?<=[.!?])(?=\s)|(?<=[。！？；\n])')
+
+
+def strip_boilerplate(html):
+    soup = BeautifulSoup(html or '', 'html.parser')
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    return soup
+
+
+def to_text(soup, content_format):
+    if content_format == 'text':
+        for tag in soup(BLOCK_TAGS):
+            tag.insert_before('\n')
+            tag.append('\n')
+        text = soup.get_text()
+    else:
+        text = MarkdownConverter(heading_style='ATX', bullets='-').convert_soup(soup)
+
+    # keep indentation for nested lists and code, squeeze the gaps left by removed tags
+    lines = [re.sub(r'(?<=\S)[ \t]{2,}', ' ', line.rstrip()) for line in text.splitlines()]
+    lines = [line for line in lines if not BOILERPLATE_LINE_RE.match(line.strip())]
+    if content_format == 'text':
+        lines = [line for line in lines if line]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def truncate_text(text, max_tokens=None, max_chars=None):
+    """Cut ``text`` at the last sentence boundary within ``max_tokens`` estimated tokens and ``max_chars`` characters."""
+    over_tokens = max_tokens and estimate_tokens(text) > max_tokens
+    over_chars = max_chars and len(text) > max_chars
+    if not over_tokens and not over_chars:
+        return text
+
+    kept = []
+    tokens = 0
+    chars = 0
+    for sentence in SENTENCE_RE.split(text):
+        tokens += estimate_tokens(sentence)
+        chars += len(sentence)
+        if (max_tokens and tokens > max_tokens) or (max_chars and chars > max_chars):
+            break
+        kept.append(sentence)
+
+    if kept:
+        return ''.join(kept).rstrip()
+
+    # a single sentence is over the budget, cut it proportionally
+    limit = len(text)
+    if over_tokens:
+        limit = min(limit, len(text) * max_tokens // estimate_tokens(text))
+    if over_chars:
+        limit = min(limit, max_chars)
+    return text[:limit].rstrip()
+
+
+@functools.lru_cache(maxsize=PREPROCESS_CACHE_SIZE)
+def preprocess_content(html, content_format='markdown', max_tokens=None, max_chars=None):
+    """Convert entry HTML to compact markdown or plain text that fits the prompt budget."""
+    return truncate_text(to_text(strip_boilerplate(html), content_format), max_tokens, max_chars)
+
+
+def prepare_entry_content(entry):
+    """Preprocessed entry content shared by every agent that runs on the entry."""
+    return preprocess_content(
+        entry['content'],
+        config.llm_content_format,
+        config.llm_max_input_tokens,
+        config.llm_max_length,
+    )
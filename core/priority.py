@@ -0,0 +1,183 @@
+import asyncio
+import concurrent.futures
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime
+
+from common.config import config
+from core.rate_limiter import estimate_tokens
+
+_prioritizer = None
+
+
+def parse_entry_time(entry):
+    """Publication time of an entry as a unix timestamp, or None if Miniflux sent none."""
+    value = entry.get('published_at') or entry.get('created_at')
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class EntryPrioritizer:
+    """Score entries so fresh, short entries from important feeds are processed first.
+
+    ``score = weight * freshness * brevity`` where the weight comes from the
+    ``priority.feeds`` or ``priority.categories`` config, freshness halves
+    every ``freshness_hours`` and brevity halves every ``length_tokens``.
+
+    Waiting raises the priority linearly (``aging_rate`` per second), so an
+    entry that waited ``max_wait`` seconds outranks any newly queued entry.
+    Since every queued entry ages at the same rate, the order is fixed at
+    enqueue time by ``key = score - aging_rate * enqueued_at``.
+    """
+
+    def __init__(self, feeds=None, categories=None, freshness_hours=24, length_tokens=4000, max_wait=600):
+        self.feeds = {str(key): float(weight) for key, weight in (feeds or {}).items()}
+        self.categories = {str(key): float(weight) for key, weight in (categories or {}).items()}
+        self.freshness_hours = freshness_hours
+        self.length_tokens = length_tokens
+        max_weight = max([1.0, *self.feeds.values(), *self.categories.values()])
+        self.aging_rate = max_weight / max_wait if max_wait else 0.0
+
+    def weight(self, entry):
+        feed = entry.get('feed') or {}
+        for key in (feed.get('id'), feed.get('title'), feed.get('site_url'), feed.get('feed_url')):
+            if key is not None and str(key) in self.feeds:
+                return self.feeds[str(key)]
+        category = (feed.get('category') or {}).get('title')
+        return self.categories.get(str(category), 1.0)
+
+    def score(self, entry, now=None):
+        now = time.time() if now is None else now
+        published = parse_entry_time(entry)
+        age_hours = max(0.0, (now - published) / 3600) if published else 0.0
+        freshness = 0.5 ** (age_hours / self.freshness_hours) if self.freshness_hours else 1.0
+        tokens = estimate_tokens(entry.get('content'))
+        brevity = 0.5 ** (tokens / self.length_tokens) if self.length_tokens else 1.0
+        return self.weight(entry) * freshness * brevity
+
+    def key(self, entry, enqueued_at=None):
+        """Sort key, higher first, that already accounts for aging while the entry waits."""
+        enqueued_at = time.time() if enqueued_at is None else enqueued_at
+        return self.score(entry, enqueued_at) - self.aging_rate * enqueued_at
+
+
+class PriorityExecutor:
+    """Thread pool that runs the submitted task with the highest priority first.
+
+    Used like ``ThreadPoolExecutor``, with ``submit(priority, fn, *args)``.
+    """
+
+    def __init__(self, max_workers, name='priority-worker'):
+        self.condition = threading.Condition()
+        self.heap = []
+        self.counter = itertools.count()
+        self.shutting_down = False
+        self.threads = [
+            threading.Thread(target=self.worker, name=f'{name}-{i}', daemon=True) for i in range(max_workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, priority, fn, *args):
+        future = concurrent.futures.Future()
+        with self.condition:
+            if self.shutting_down:
+                raise RuntimeError('cannot submit after shutdown')
+            # ties run in submission order
+            heapq.heappush(self.heap, (-priority, next(self.counter), future, fn, args))
+            self.condition.notify()
+        return future
+
+    def worker(self):
+        while True:
+            with self.condition:
+                while not self.heap and not self.shutting_down:
+                    self.condition.wait()
+                if not self.heap:
+                    return
+                _, _, future, fn, args = heapq.heappop(self.heap)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait=True):
+        with self.condition:
+            self.shutting_down = True
+            self.condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown(wait=True)
+
+
+class PrioritySemaphore:
+    """asyncio semaphore that wakes the waiter with the highest priority first."""
+
+    def __init__(self, value):
+        self.value = value
+        self.waiters = []
+        self.counter = itertools.count()
+
+    async def acquire(self, priority=0.0):
+        if self.value > 0 and not self.waiters:
+            self.value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (-priority, next(self.counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # the slot was handed over just before the cancellation, pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.value += 1
+
+
+def get_prioritizer():
+    """Prioritizer built from the ``priority`` config, or None when priority scheduling is off."""
+    global _prioritizer
+    if not config.priority_enabled:
+        return None
+    if _prioritizer is None:
+        _prioritizer = EntryPrioritizer(
+            config.priority_feeds,
+            config.priority_categories,
+            config.priority_freshness_hours,
+            config.priority_length_tokens,
+            config.priority_max_wait,
+        )
+    return _prioritizer
+
+
+def entry_priority(entry):
+    """Priority key for an entry; 0 for every entry (first in, first out) when priority scheduling is off."""
+    prioritizer = get_prioritizer()
+    return prioritizer.key(entry) if prioritizer else 0.0
+
+
+@config.on_reload
+def _reset_prioritizer():
+    global _prioritizer
+    _prioritizer = None
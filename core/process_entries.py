@@ -1,62 +1,227 @@
-import json
+import concurrent.futures
 import markdown
-from ratelimit import limits, sleep_and_retry
-import threading
 
-from common.config import Config
+from common.config import config
 from common.logger import logger
-from core.entry_filter import filter_entry
+from common.metrics import ENTRIES_FILTERED, ENTRIES_PROCESSED, agent_context
+from common.tracing import bind_context, span
+from core.ai_news_store import append_entry
+from core.batching import get_batcher
+from core.deferred_batch import defer_agent, is_deferred
+from core.entry_filter import AgentFilter
+from core.entry_index import get_entry_index
 from core.get_ai_result import get_ai_result
+from core.miniflux_writer import get_miniflux_writer
+from core.preprocess import prepare_entry_content
+from core.retry_queue import get_retry_queue, is_retryable
 
-config = Config()
-file_lock = threading.Lock()
+agent_filter = AgentFilter(config.agents)
 
-@sleep_and_retry
-@limits(calls=config.llm_RPM, period=60)
-def process_entry(miniflux_client, entry):
-    #Todo change to queue
-    llm_result = ''
+
+@config.on_reload
+def _rebuild_agent_filter():
+    global agent_filter
+    agent_filter = AgentFilter(config.agents)
+
+
+def pending_agents(entry):
+    """Names of the agents that have not handled this entry content under the current filter settings."""
+    entry_index = get_entry_index()
+    if not entry_index:
+        return list(config.agents)
+    return entry_index.pending_agents(entry, config.agents, agent_filter.key)
+
+
+def select_agents(entry):
+    """Return (agents to run, agents that filtered the entry out) for this entry."""
+    pending = pending_agents(entry)
+    # filter, if AI is not generating, and in allow_list, or not in deny_list
+    matched_agents = agent_filter.match_agents(entry)
+    run_agents = []
+    filtered_agents = []
 
     for agent in config.agents.items():
-        # filter, if AI is not generating, and in allow_list, or not in deny_list
-        if filter_entry(config, agent, entry):
-
-            try:
-                response_content = get_ai_result(agent[1]["prompt"], entry["content"])
-            except Exception as e:
-                logger.error(
-                    f"Error processing entry {entry['id']} with agent {agent[0]}: {e}"
-                )
+        # skip agents that already handled this entry content
+        if agent[0] not in pending:
+            continue
+
+        if agent[0] in matched_agents:
+            run_agents.append(agent)
+        else:
+            filtered_agents.append(agent[0])
+            ENTRIES_FILTERED.labels(agent[0]).inc()
+
+    return run_agents, filtered_agents
+
+
+def save_ai_summary(entry, response_content):
+    entry_list = {
+        'datetime': entry['created_at'],
+        'category': entry['feed']['category']['title'],
+        'title': entry['title'],
+        'content': response_content,
+        'url': entry['url']
+    }
+    append_entry(entry_list)
+
+
+def format_agent_result(agent, response_content):
+    if agent[1]['style_block']:
+        return ('<blockquote>\n  <p><strong>'
+                + agent[1]['title'] + '</strong> '
+                + response_content.replace('\n', '').replace('\r', '')
+                + '\n</p>\n</blockquote><br/>')
+    return f"{agent[1]['title']}{markdown.markdown(response_content)}<hr><br />"
+
+
+def handle_agent_result(entry, agent, response_content):
+    log_content = (response_content or "")[:20] + '...' if len(response_content or "") > 20 else response_content
+    logger.info(f"agents:{agent[0]} feed_id:{entry['id']} result:{log_content}")
+    ENTRIES_PROCESSED.labels(agent[0], 'success').inc()
+
+    # save for ai_summary
+    if agent[0] == 'summary':
+        save_ai_summary(entry, response_content)
+
+    return format_agent_result(agent, response_content)
+
+
+def mark_entry_processed(entry_id, handled_agents, content, filtered_agents=()):
+    entry_index = get_entry_index()
+    if entry_index:
+        entry_index.mark_processed(entry_id, handled_agents, content)
+        entry_index.mark_filtered(entry_id, filtered_agents, content, agent_filter.key)
+
+
+def apply_agent_result(miniflux_client, entry_id, agent, response_content):
+    """Prepend a result produced outside ``process_entry`` (deferred batch, retry) to the stored entry."""
+    entry = miniflux_client.get_entry(entry_id)
+    content = entry['content']
+    # the entry may have been updated by a previous run that stopped before recording it
+    prefix = format_agent_result(agent, response_content)
+    if not content.startswith(prefix):
+        content = handle_agent_result(entry, agent, response_content) + content
+        get_miniflux_writer().submit(entry_id, content, prefix).result()
+    mark_entry_processed(entry_id, [agent[0]], content)
+
+
+def queue_retry(entry, agent, error):
+    """Hand a failed agent to the retry queue; returns True when it was queued."""
+    logger.error(f"Error processing entry {entry['id']} with agent {agent[0]}: {error}")
+    ENTRIES_PROCESSED.labels(agent[0], 'error').inc()
+    retry_queue = get_retry_queue()
+    if not retry_queue:
+        return False
+    # a rejected request would fail the same way again, keep it for inspection only
+    retry_queue.add(entry['id'], agent[0], prepare_entry_content(entry), error, getattr(error, 'retry_at', None),
+                    dead=not is_retryable(error))
+    return True
+
+
+def defer_agents(entry, agents):
+    """Queue deferred agents for the next provider batch job; returns (agents to run now, deferred agent names)."""
+    deferred_agents = [agent for agent in agents if is_deferred(agent)]
+    if not deferred_agents:
+        return agents, []
+    request = prepare_entry_content(entry)
+    for agent in deferred_agents:
+        defer_agent(entry, agent, request)
+        ENTRIES_PROCESSED.labels(agent[0], 'deferred').inc()
+    return [agent for agent in agents if not is_deferred(agent)], [agent[0] for agent in deferred_agents]
+
+
+def queue_batch_candidates(entry):
+    """Hand a short entry to the batchers of its agents before a worker picks it up.
+
+    The worker later finds its answer in the batch instead of waiting for
+    other workers to fill one, so batches are not capped by the thread count.
+    Returns the (batcher, request) pairs to ``discard`` once the entry is done.
+    """
+    pending = pending_agents(entry)
+    matched_agents = agent_filter.match_agents(entry)
+    batchers = [
+        get_batcher(agent) for agent in config.agents.items()
+        if agent[0] in pending and agent[0] in matched_agents and not is_deferred(agent)
+    ]
+    batchers = [batcher for batcher in batchers if batcher]
+    if not batchers:
+        return []
+    request = prepare_entry_content(entry)
+    queued = []
+    for batcher in batchers:
+        if batcher.accepts(request):
+            batcher.queue(request)
+            queued.append((batcher, request))
+    return queued
+
+
+def run_agent(agent, request):
+    try:
+        with span('agent', {'agent': agent[0]}):
+            batcher = get_batcher(agent)
+            if batcher and batcher.accepts(request):
+                with span('batch.wait'):
+                    response_content = batcher.submit(request).result()
+                if response_content is not None:
+                    return response_content
+            with agent_context(agent[0]):
+                return get_ai_result(agent[1]["prompt"], request)
+    except Exception as e:
+        return e
+
+
+def run_agents(entry, agents):
+    """Run the agents on the entry in parallel; results (or raised exceptions) keep the agent order."""
+    if not agents:
+        return []
+    # converted once, every agent gets the same text
+    with span('preprocess'):
+        request = prepare_entry_content(entry)
+    if len(agents) == 1:
+        return [run_agent(agents[0], request)]
+
+    # each agent thread continues the trace of the entry
+    calls = [bind_context(run_agent) for _ in agents]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(agents)) as executor:
+        return list(executor.map(lambda call, agent: call(agent, request), calls, agents))
+
+
+def entry_span_attributes(entry):
+    return {'entry.id': entry['id'], 'feed.id': (entry.get('feed') or {}).get('id') or 0}
+
+
+def process_entry(entry):
+    """Run the agents of an entry and write their results back.
+
+    Returns the names of the agents that failed and could not be handed to the
+    retry queue, so the caller can fetch the entry again later.
+    """
+    with span('process_entry', entry_span_attributes(entry)):
+        llm_result = ''
+        failed_agents = []
+        with span('select_agents'):
+            agents, filtered_agents = select_agents(entry)
+            agents, handled_agents = defer_agents(entry, agents)
+        run_agents_results = run_agents(entry, agents)
+
+        for agent, response_content in zip(agents, run_agents_results):
+            if isinstance(response_content, Exception):
+                # a queued agent counts as handled, the retry queue owns it from now on
+                if queue_retry(entry, agent, response_content):
+                    handled_agents.append(agent[0])
+                else:
+                    failed_agents.append(agent[0])
                 continue
-            log_content = (response_content or "")[:20] + '...' if len(response_content or "") > 20 else response_content
-            logger.info(f"agents:{agent[0]} feed_id:{entry['id']} result:{log_content}")
-
-            # save for ai_summary
-            if agent[0] == 'summary':
-                entry_list = {
-                    'datetime': entry['created_at'],
-                    'category': entry['feed']['category']['title'],
-                    'title': entry['title'],
-                    'content': response_content,
-                    'url': entry['url']
-                }
-                with file_lock:
-                    try:
-                        with open('entries.json', 'r') as file:
-                            data = json.load(file)
-                    except (FileNotFoundError, json.JSONDecodeError):
-                        data = []
-                    data.append(entry_list)
-                    with open('entries.json', 'w') as file:
-                        json.dump(data, file, indent=4, ensure_ascii=False)
-
-            if agent[1]['style_block']:
-                llm_result = (llm_result + '<blockquote>\n  <p><strong>'
-                              + agent[1]['title'] + '</strong> '
-                              + response_content.replace('\n', '').replace('\r', '')
-                              + '\n</p>\n</blockquote><br/>')
-            else:
-                llm_result = llm_result + f"{agent[1]['title']}{markdown.markdown(response_content)}<hr><br />"
-
-    if len(llm_result) > 0:
-        dict_result = miniflux_client.update_entry(entry['id'], content= llm_result + entry['content'])
+            handled_agents.append(agent[0])
+            llm_result = llm_result + handle_agent_result(entry, agent, response_content)
+
+        content = entry['content']
+        if len(llm_result) > 0:
+            content = llm_result + entry['content']
+            # retried and coalesced by the shared writer, raises once the retries are used up
+            with span('miniflux.update_entry'):
+                get_miniflux_writer().submit(entry['id'], content, llm_result).result()
+
+        with span('mark_processed'):
+            mark_entry_processed(entry['id'], handled_agents, content, filtered_agents)
+        return failed_agents
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+from common.config import config
+from common.logger import logger
+from common.singleton import fork_safe_singleton
+
+# Back-off used after a 429 response that carries no Retry-After header
+DEFAULT_RETRY_AFTER = 5
+
+@config.on_reload
+def _reset_rate_limiter():
+    # picks up new RPM/TPM limits; callers holding the old limiter finish with it
+    get_rate_limiter.reset()
+
+
+def estimate_tokens(text):
+    """Rough token estimate: ~4 ASCII characters per token, one token per other character."""
+    if not text:
+        return 0
+    ascii_count = sum(1 for char in text if ord(char) < 128)
+    return ascii_count // 4 + (len(text) - ascii_count) + 1
+
+
+class TokenBucket:
+    """Bucket refilled continuously at ``capacity`` per minute.
+
+    Reservations may drive the level negative, which turns the bucket into a
+    FIFO queue: every caller is told exactly how long to wait for its share.
+    """
+
+    def __init__(self, capacity, now=None):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / 60
+        self.level = self.capacity
+        self.updated_at = time.monotonic() if now is None else now
+
+    def reserve(self, amount, now):
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        # a single request bigger than the bucket would otherwise never be admitted
+        self.level -= min(amount, self.capacity)
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.rate
+
+
+class RateLimiter:
+    """Shared requests-per-minute and tokens-per-minute limit for LLM requests.
+
+    The prompt is reserved before sending and the completion is charged once
+    the response arrives, so later callers wait for the tokens it used.
+    """
+
+    def __init__(self, rpm, tpm=None):
+        self.lock = threading.Lock()
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self.waited_seconds = 0.0
+
+    def reserve(self, tokens=0):
+        """Reserve one request and ``tokens`` tokens; returns the seconds to wait before sending."""
+        with self.lock:
+            now = time.monotonic()
+            delay = self.requests.reserve(1, now)
+            if self.tokens:
+                delay = max(delay, self.tokens.reserve(tokens, now))
+            delay = max(delay, self.paused_until - now)
+            self.waited_seconds += delay
+        return delay
+
+    def charge(self, tokens):
+        """Take the completion ``tokens`` of an answered request out of the TPM budget."""
+        if not self.tokens or not tokens:
+            return
+        with self.lock:
+            self.tokens.reserve(tokens, time.monotonic())
+
+    def acquire(self, tokens=0):
+        # the thread engine has no event loop to park on: the worker thread sleeps
+        # out its turn, so a throttled entry keeps its llm.max_workers slot meanwhile.
+        # Use llm.engine: async to wait without holding a thread.
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, tokens=0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def pause(self, seconds):
+        """Hold back every caller for ``seconds``, e.g. after the provider answered 429."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        logger.warning(f'LLM rate limited by provider, pausing requests for {seconds:.1f}s')
+
+
+def get_retry_after(error):
+    """Return the back-off for a provider 429 error, or None if ``error`` is not a rate limit."""
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if status != 429:
+        return None
+
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return max(float(headers.get('retry-after')), 0.0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+@fork_safe_singleton
+def get_rate_limiter():
+    return RateLimiter(config.llm_RPM, config.llm_TPM)
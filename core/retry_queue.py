@@ -0,0 +1,211 @@
+import concurrent.futures
+import random
+import sqlite3
+import threading
+import time
+
+from common.config import config
+from common.logger import logger
+from common.metrics import agent_context
+from common.singleton import fork_safe_singleton
+from core.circuit_breaker import CircuitOpenError, is_transient
+from core.concurrency_limiter import worker_count
+from core.get_ai_result import get_ai_result
+
+RETRY_QUEUE_FILE = 'retry_queue.db'
+
+class RetryQueue:
+    """Durable queue of failed (entry, agent) LLM calls.
+
+    Each row keeps the prepared request, so a retry only runs the agent that
+    failed. Attempts are spread with jittered exponential backoff; after
+    ``max_attempts``, or after an error that retrying cannot fix, the row is
+    kept in the ``dead`` state for inspection.
+    """
+
+    def __init__(self, file_path=RETRY_QUEUE_FILE, max_attempts=8, backoff=30.0, max_backoff=3600.0):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(file_path), check_same_thread=False)
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS retries ('
+                'entry_id INTEGER NOT NULL, '
+                'agent TEXT NOT NULL, '
+                'request TEXT NOT NULL, '
+                'attempts INTEGER NOT NULL, '
+                "status TEXT NOT NULL DEFAULT 'pending', "
+                'next_attempt_at REAL NOT NULL, '
+                'last_error TEXT, '
+                'updated_at REAL NOT NULL, '
+                'PRIMARY KEY (entry_id, agent))'
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS retries_due_idx ON retries (status, next_attempt_at)')
+            self.conn.commit()
+
+    def delay(self, attempts):
+        """Backoff before the next attempt, jittered so failed entries do not retry in lockstep."""
+        return min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+    def add(self, entry_id, agent_name, request, error, retry_at=None, dead=False):
+        """Queue a failed call, or dead-letter it right away if ``dead``.
+
+        A failure of a new run restarts the attempts of an existing row.
+        """
+        now = time.time()
+        next_attempt_at = retry_at if retry_at is not None else now + self.delay(1)
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO retries '
+                '(entry_id, agent, request, attempts, status, next_attempt_at, last_error, updated_at) '
+                'VALUES (?, ?, ?, 1, ?, ?, ?, ?)',
+                (entry_id, agent_name, request, 'dead' if dead else 'pending', next_attempt_at, str(error), now),
+            )
+            self.conn.commit()
+
+    def due(self, limit=100, now=None):
+        """Return up to ``limit`` (entry_id, agent, request) rows whose next attempt is due."""
+        now = time.time() if now is None else now
+        with self.lock:
+            return self.conn.execute(
+                "SELECT entry_id, agent, request FROM retries WHERE status = 'pending' AND next_attempt_at <= ? "
+                'ORDER BY next_attempt_at LIMIT ?',
+                (now, limit),
+            ).fetchall()
+
+    def fail(self, entry_id, agent_name, error, dead=False):
+        """Count a failed retry; returns True when the row was moved to the dead-letter state."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT attempts FROM retries WHERE entry_id = ? AND agent = ?', (entry_id, agent_name)
+            ).fetchone()
+            if row is None:
+                return False
+            attempts = row[0] + 1
+            dead = dead or attempts >= self.max_attempts
+            self.conn.execute(
+                'UPDATE retries SET attempts = ?, status = ?, next_attempt_at = ?, last_error = ?, updated_at = ? '
+                'WHERE entry_id = ? AND agent = ?',
+                (attempts, 'dead' if dead else 'pending', now + self.delay(attempts), str(error), now,
+                 entry_id, agent_name),
+            )
+            self.conn.commit()
+        return dead
+
+    def postpone(self, entry_id, agent_name, retry_at):
+        """Move the next attempt without counting one, e.g. while the provider circuit is open."""
+        with self.lock:
+            self.conn.execute(
+                'UPDATE retries SET next_attempt_at = ? WHERE entry_id = ? AND agent = ?',
+                (retry_at, entry_id, agent_name),
+            )
+            self.conn.commit()
+
+    def done(self, entry_id, agent_name):
+        with self.lock:
+            self.conn.execute('DELETE FROM retries WHERE entry_id = ? AND agent = ?', (entry_id, agent_name))
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.conn.execute('SELECT status, COUNT(*) FROM retries GROUP BY status').fetchall())
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+@fork_safe_singleton
+def get_retry_queue():
+    """Shared queue built from config, or None when the retry queue is disabled."""
+    if not config.retry_queue_enabled:
+        return None
+    return RetryQueue(
+        config.retry_queue_file,
+        config.retry_queue_max_attempts,
+        config.retry_queue_backoff,
+        config.retry_queue_max_backoff,
+    )
+
+
+def is_retryable(error):
+    """True if sending the call again may succeed; a 400 or a too long request fails the same way every time."""
+    return isinstance(error, CircuitOpenError) or is_transient(error)
+
+
+class RetryWorkers:
+    """Bounded thread pool for due retries, so the schedule thread only hands them over.
+
+    A retry that is still running is not submitted again when the next run
+    finds its row due.
+    """
+
+    def __init__(self, max_workers):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='retry')
+        self.lock = threading.Lock()
+        self.running = set()
+
+    def submit(self, key, fn, *args):
+        """Run ``fn(*args)`` unless the retry ``key`` is already running; returns True if it was submitted."""
+        with self.lock:
+            if key in self.running:
+                return False
+            self.running.add(key)
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self.finish(key))
+        return True
+
+    def finish(self, key):
+        with self.lock:
+            self.running.discard(key)
+
+
+@fork_safe_singleton
+def get_retry_workers():
+    return RetryWorkers(worker_count())
+
+
+def retry_agent(miniflux_client, retry_queue, entry_id, agent_name, request):
+    # imported here, process_entries itself hands failed agents to this module
+    from core.process_entries import apply_agent_result
+
+    agent = config.agents.get(agent_name)
+    if agent is None:
+        logger.warning(f'Agent {agent_name} was removed, dropping retry for entry {entry_id}')
+        retry_queue.done(entry_id, agent_name)
+        return
+    agent = (agent_name, agent)
+
+    try:
+        with agent_context(agent_name):
+            response_content = get_ai_result(agent[1]['prompt'], request)
+        apply_agent_result(miniflux_client, entry_id, agent, response_content)
+    except CircuitOpenError as e:
+        retry_queue.postpone(entry_id, agent_name, e.retry_at)
+    except Exception as e:
+        if retry_queue.fail(entry_id, agent_name, e, dead=not is_retryable(e)):
+            logger.error(f'Giving up on entry {entry_id} with agent {agent_name}: {e}')
+        else:
+            logger.warning(f'Retry of entry {entry_id} with agent {agent_name} failed: {e}')
+    else:
+        retry_queue.done(entry_id, agent_name)
+        logger.info(f'Retried entry {entry_id} with agent {agent_name}')
+
+
+def run_retries(miniflux_client, limit=100):
+    """Hand the failed (entry, agent) calls that are due to the retry workers; scheduled from ``main``."""
+    retry_queue = get_retry_queue()
+    if not retry_queue:
+        return
+    retry_workers = get_retry_workers()
+    submitted = sum(
+        retry_workers.submit((entry_id, agent_name), retry_agent, miniflux_client, retry_queue, entry_id, agent_name,
+                             request)
+        for entry_id, agent_name, request in retry_queue.due(limit)
+    )
+    if submitted:
+        logger.info(f'Retrying {submitted} failed agent calls')
@@ -0,0 +1,183 @@
+import json
+import sqlite3
+import threading
+import time
+
+from common.logger import logger
+
+WORK_QUEUE_FILE = 'webhook_queue.db'
+
+
+class WorkQueue:
+    """Bounded, persistent queue of entries keyed by entry id.
+
+    Entries are handed out by descending ``priority``, then first in, first out.
+    An entry that is already waiting or being processed is not queued twice.
+    Entries claimed by a worker that died are handed out again once the
+    process that drains the queue calls ``requeue_claimed`` on startup. An
+    entry whose processing failed is handed out again after ``backoff``
+    seconds, doubling, until it failed ``max_attempts`` times; then it is
+    kept as ``failed`` until the webhook sends it again.
+    """
+
+    def __init__(self, file_path=WORK_QUEUE_FILE, max_size=10000, max_attempts=3, backoff=30.0):
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.condition = threading.Condition()
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.conn = sqlite3.connect(str(file_path), check_same_thread=False, isolation_level=None)
+        with self.condition:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA busy_timeout=5000')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS work_queue ('
+                'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'entry_id INTEGER NOT NULL UNIQUE, '
+                'payload TEXT NOT NULL, '
+                "status TEXT NOT NULL DEFAULT 'pending', "
+                'priority REAL NOT NULL DEFAULT 0, '
+                'enqueued_at REAL NOT NULL)'
+            )
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(work_queue)')}
+            if 'priority' not in columns:
+                # queue files created before priority scheduling
+                self.conn.execute('ALTER TABLE work_queue ADD COLUMN priority REAL NOT NULL DEFAULT 0')
+            if 'attempts' not in columns:
+                # queue files created before failed entries were kept
+                self.conn.execute('ALTER TABLE work_queue ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+                self.conn.execute('ALTER TABLE work_queue ADD COLUMN available_at REAL NOT NULL DEFAULT 0')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS work_queue_order_idx ON work_queue (status, priority DESC, seq)')
+
+    def requeue_claimed(self):
+        """Hand out entries claimed before a crash again; returns their number.
+
+        Only the process that runs the workers may call this: for every other
+        process that opens the file, claimed entries are still being processed.
+        """
+        with self.condition:
+            cursor = self.conn.execute("UPDATE work_queue SET status = 'pending' WHERE status = 'processing'")
+            if cursor.rowcount:
+                self.condition.notify_all()
+            return cursor.rowcount
+
+    def put(self, entry, priority=0.0):
+        """Queue an entry; returns 'queued', 'duplicate' or 'full'."""
+        with self.condition:
+            if self.depth() >= self.max_size:
+                self.rejected += 1
+                return 'full'
+            # an entry kept as failed is queued again with fresh attempts
+            cursor = self.conn.execute(
+                'INSERT INTO work_queue (entry_id, payload, priority, enqueued_at) VALUES (?, ?, ?, ?) '
+                "ON CONFLICT (entry_id) DO UPDATE SET payload = excluded.payload, status = 'pending', "
+                'priority = excluded.priority, enqueued_at = excluded.enqueued_at, attempts = 0, available_at = 0 '
+                "WHERE status = 'failed'",
+                (entry['id'], json.dumps(entry, ensure_ascii=False), priority, time.time()),
+            )
+            if cursor.rowcount == 0:
+                self.deduplicated += 1
+                return 'duplicate'
+            self.enqueued += 1
+            self.condition.notify()
+        return 'queued'
+
+    def get(self, timeout=1.0):
+        """Claim the next pending entry, waiting up to ``timeout`` seconds; None if the queue stayed empty."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                row = self.conn.execute(
+                    "UPDATE work_queue SET status = 'processing' WHERE seq = "
+                    "(SELECT seq FROM work_queue WHERE status = 'pending' AND available_at <= ? "
+                    'ORDER BY priority DESC, seq LIMIT 1) '
+                    'RETURNING payload',
+                    (time.time(),),
+                ).fetchone()
+                if row:
+                    return json.loads(row[0])
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def done(self, entry_id):
+        with self.condition:
+            self.conn.execute('DELETE FROM work_queue WHERE entry_id = ?', (entry_id,))
+            self.completed += 1
+
+    def fail(self, entry_id):
+        """Count a failed attempt; returns True if the entry will be handed out again."""
+        with self.condition:
+            row = self.conn.execute(
+                "UPDATE work_queue SET attempts = attempts + 1, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END, "
+                'available_at = ? * (1 << attempts) + ? WHERE entry_id = ? RETURNING status',
+                (self.max_attempts, self.backoff, time.time(), entry_id),
+            ).fetchone()
+            self.failed += 1
+        return row is not None and row[0] == 'pending'
+
+    def depth(self):
+        return self.conn.execute("SELECT COUNT(*) FROM work_queue WHERE status = 'pending'").fetchone()[0]
+
+    def stats(self):
+        with self.condition:
+            pending, processing, failed = self.conn.execute(
+                "SELECT COALESCE(SUM(status = 'pending'), 0), COALESCE(SUM(status = 'processing'), 0), "
+                "COALESCE(SUM(status = 'failed'), 0) FROM work_queue"
+            ).fetchone()
+            oldest = self.conn.execute(
+                "SELECT MIN(enqueued_at) FROM work_queue WHERE status = 'pending'"
+            ).fetchone()[0]
+            return {
+                'depth': pending,
+                'in_flight': processing,
+                'failed_entries': failed,
+                'max_size': self.max_size,
+                'oldest_age_seconds': round(time.time() - oldest, 3) if oldest else 0,
+                'enqueued': self.enqueued,
+                'deduplicated': self.deduplicated,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+
+    def close(self):
+        with self.condition:
+            self.conn.close()
+
+
+def start_queue_workers(work_queue, process, workers, name='queue-worker', stop_event=None):
+    """Start daemon threads that call ``process(entry)`` for every queued entry until ``stop_event`` is set.
+
+    An entry counts as failed when ``process`` raises or returns something
+    truthy, such as the names of the agents that still need a run.
+    """
+    stop_event = stop_event or threading.Event()
+
+    def worker():
+        while not stop_event.is_set():
+            entry = work_queue.get()
+            if entry is None:
+                continue
+            try:
+                failed = process(entry)
+            except Exception as e:
+                logger.error(f"Error processing queued entry {entry.get('id')}: {e}")
+                failed = True
+            if not failed:
+                work_queue.done(entry['id'])
+            elif work_queue.fail(entry['id']):
+                logger.warning(f"Queued entry {entry.get('id')} failed, it will be processed again")
+            else:
+                logger.error(f"Giving up on queued entry {entry.get('id')} after {work_queue.max_attempts} attempts")
+
+    threads = [threading.Thread(target=worker, name=f'{name}-{i}', daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
@@ -1,26 +1,41 @@
 import concurrent.futures
+import threading
 import time
 import traceback
 
-import miniflux
 import schedule
 
-from common import Config, logger
+from common import config, logger
+from common.metrics import prepare_multiprocess_dir
 from services.feeds_status_service import ensure_miniflux_feed, generate_feeds_status, resolve_feeds_status_url
 from myapp import app
+from myapp.ai_summary import start_webhook_workers
+from myapp.server import run_server
 from core import fetch_unread_entries, generate_daily_news
+from core.deferred_batch import is_deferred, run_deferred_batches
+from core.entry_index import get_entry_index
+from core.miniflux_writer import get_miniflux_client
+from core.retry_queue import get_retry_queue, run_retries
 
-config = Config()
-miniflux_client = miniflux.Client(config.miniflux_base_url, api_key=config.miniflux_api_key)
-while True:
-    try:
-        alive = miniflux_client.me()
-        logger.info('Successfully connected to Miniflux!')
-        break
-    except Exception as e:
-        logger.error('Cannot connect to Miniflux: %s' % e)
-        # logger.error(e.args[0].content)
-        time.sleep(3)
+miniflux_client = get_miniflux_client()
+miniflux_connected = threading.Event()
+
+
+def connect_miniflux():
+    """Retry until Miniflux answers; runs in the background while the API server already accepts webhooks."""
+    while True:
+        try:
+            alive = miniflux_client.me()
+            logger.info('Successfully connected to Miniflux!')
+            break
+        except Exception as e:
+            logger.error('Cannot connect to Miniflux: %s' % e)
+            # logger.error(e.args[0].content)
+            time.sleep(3)
+    miniflux_connected.set()
+    # webhook entries received meanwhile wait in the queue until Miniflux is reachable
+    if config.miniflux_webhook_secret:
+        start_webhook_workers()
 
 
 def resolve_ai_news_url():
@@ -29,6 +44,8 @@ def resolve_ai_news_url():
     return config.ai_news_url.rstrip('/') + '/rss/ai-news'
 
 def my_schedule():
+    miniflux_connected.wait()
+
     if config.miniflux_schedule_interval:
         interval = config.miniflux_schedule_interval
     else:
@@ -36,6 +53,17 @@ def my_schedule():
     schedule.every(interval).minutes.do(fetch_unread_entries, config, miniflux_client)
     schedule.run_all()
 
+    entry_index = get_entry_index()
+    if entry_index:
+        schedule.every().day.do(entry_index.prune, config.entry_index_retention_days)
+
+    if get_retry_queue():
+        schedule.every(config.retry_queue_interval).seconds.do(run_retries, miniflux_client)
+
+    if any(is_deferred(agent) for agent in config.agents.items()):
+        schedule.every(config.deferred_batch_interval).minutes.do(run_deferred_batches, miniflux_client)
+        logger.info(f"Successfully added the deferred batch schedule: every {config.deferred_batch_interval} minutes")
+
     if config.ai_news_schedule:
         ensure_miniflux_feed(miniflux_client, resolve_ai_news_url(), 'ai_news')
         for ai_schedule in config.ai_news_schedule:
@@ -62,10 +90,26 @@ def my_schedule():
 
 def my_flask():
     logger.info('Starting API')
-    app.run(host='0.0.0.0', port=80)
+    run_server(app)
 
 if __name__ == '__main__':
-    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-        if config.ai_news_schedule or config.miniflux_webhook_secret or config.feeds_status_enabled:
-            executor.submit(my_flask)
-        executor.submit(my_schedule)
+    prepare_multiprocess_dir()
+    # storage, server and engine settings are read once and still need a restart
+    config.watch(config.config_reload_interval)
+    threading.Thread(target=connect_miniflux, name='miniflux-connect', daemon=True).start()
+
+    serve_api = (
+        config.ai_news_schedule
+        or config.miniflux_webhook_secret
+        or config.feeds_status_enabled
+        or config.metrics_enabled
+    )
+    if serve_api and config.server_mode == 'gunicorn':
+        # gunicorn has to own the main thread to handle signals and shut down gracefully
+        threading.Thread(target=my_schedule, name='schedule', daemon=True).start()
+        my_flask()
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            if serve_api:
+                executor.submit(my_flask)
+            executor.submit(my_schedule)
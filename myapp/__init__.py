@@ -1,4 +1,4 @@
 from flask import Flask
 app = Flask(__name__)
 
-from myapp import ai_news, ai_summary, feeds_status
+from myapp import ai_news, ai_summary, feeds_status, metrics
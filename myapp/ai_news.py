@@ -6,10 +6,8 @@ import markdown
 from feedgen.feed import FeedGenerator
 
 from common import logger
-from common.config import Config
 from myapp import app
 
-config = Config()
 
 @app.route('/rss/ai-news', methods=['GET'])
 def miniflux_ai_news():
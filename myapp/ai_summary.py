@@ -5,13 +5,75 @@ import concurrent.futures
 from common.logger import logger
 import traceback
 
-import miniflux
-from common.config import Config
+from common.config import config
+from common.metrics import ENTRIES_FETCHED
+from common.singleton import fork_safe_singleton
 from core import process_entry
+from core.async_engine import get_async_engine
+from core.concurrency_limiter import worker_count
+from core.priority import entry_priority
+from core.work_queue import WorkQueue, start_queue_workers
 from myapp import app
 
-config = Config()
-miniflux_client = miniflux.Client(config.miniflux_base_url, api_key=config.miniflux_api_key)
+@fork_safe_singleton
+def get_webhook_queue():
+    return WorkQueue(config.webhook_queue_file, config.webhook_queue_max_size, config.webhook_queue_max_attempts)
+
+
+def process_webhook_entry(entry):
+    """Process a queued entry; returns the agents that failed and were not handed to the retry queue."""
+    if config.llm_engine == 'async':
+        return get_async_engine().submit_entry(entry).result()
+    return process_entry(entry)
+
+
+def start_webhook_workers():
+    """Start the workers that drain the webhook queue, including entries left from a previous run."""
+    if not config.webhook_queue_enabled:
+        return
+    work_queue = get_webhook_queue()
+    # gunicorn workers open the same file to enqueue, only the draining process recovers claimed entries
+    requeued = work_queue.requeue_claimed()
+    if requeued:
+        logger.info(f'Requeued {requeued} webhook entries claimed before the last shutdown')
+    start_queue_workers(work_queue, process_webhook_entry, config.webhook_queue_workers, name='webhook-worker')
+    logger.info(f'Started {config.webhook_queue_workers} webhook workers, {work_queue.depth()} entries queued')
+
+
+def wait_for_entries(futures):
+    for future in concurrent.futures.as_completed(futures):
+        try:
+            data = future.result()
+        except Exception as e:
+            logger.error(traceback.format_exc())
+            logger.error('generated an exception: %s' % e)
+            return False
+    return True
+
+
+def enqueue_entries(entries):
+    work_queue = get_webhook_queue()
+    results = [work_queue.put(i, entry_priority(i)) for i in entries]
+    counts = {result: results.count(result) for result in ('queued', 'duplicate', 'full')}
+    if counts['full']:
+        logger.warning(f"Webhook queue is full, rejected {counts['full']} entries, they are left for polling")
+
+    status_code = 503 if counts['full'] and not counts['queued'] else 202
+    return jsonify({
+        'status': 'accepted' if status_code == 202 else 'busy',
+        'queued': counts['queued'],
+        'duplicate': counts['duplicate'],
+        'rejected': counts['full'],
+        'depth': work_queue.depth(),
+    }), status_code
+
+
+@app.route('/api/miniflux-ai/queue', methods=['GET'])
+def miniflux_ai_queue():
+    if not config.webhook_queue_enabled:
+        abort(404)
+    return jsonify(get_webhook_queue().stats())
+
 
 @app.route('/api/miniflux-ai', methods=['POST'])
 def miniflux_ai():
@@ -29,6 +91,8 @@ def miniflux_ai():
           content:
             application/json:
               status: string
+        202:
+          description: Entries were queued for processing
     """
     webhook_secret = config.miniflux_webhook_secret
 
@@ -40,19 +104,23 @@ def miniflux_ai():
             abort(403)  # 返回403 Forbidden
         entries = request.json
         logger.info('Get unread entries via webhook: ' + str(len(entries['entries'])))
+        ENTRIES_FETCHED.labels('webhook').inc(len(entries['entries']))
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=config.llm_max_workers) as executor:
-            futures = []
-            for i in entries['entries']:
-                i['feed'] = entries['feed']
-                futures.append(executor.submit(process_entry, miniflux_client, i))
-            
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    data = future.result()
-                except Exception as e:
-                    logger.error(traceback.format_exc())
-                    logger.error('generated an exception: %s' % e)
+        for i in entries['entries']:
+            i['feed'] = entries['feed']
+
+        if config.webhook_queue_enabled:
+            return enqueue_entries(entries['entries'])
+
+        if config.llm_engine == 'async':
+            engine = get_async_engine()
+            futures = [engine.submit_entry(i) for i in entries['entries']]
+            if not wait_for_entries(futures):
+                return 500
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=worker_count()) as executor:
+                futures = [executor.submit(process_entry, i) for i in entries['entries']]
+                if not wait_for_entries(futures):
                     return 500
 
         return jsonify({'status': 'ok'})
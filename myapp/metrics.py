@@ -0,0 +1,69 @@
+import threading
+import time
+
+from flask import Response, abort
+from prometheus_client.core import GaugeMetricFamily
+
+from common.config import config
+from common.metrics import render_metrics
+from core.deferred_batch import get_deferred_store, is_deferred
+from core.retry_queue import get_retry_queue
+from myapp import app
+from myapp.ai_summary import get_webhook_queue
+
+
+# Seconds a queue depth read from SQLite is served to scrapes before it is counted again
+QUEUE_DEPTH_MAX_AGE = 15
+
+
+class QueueCollector:
+    """Depth of the durable queues, counted in their SQLite files at most every ``max_age`` seconds.
+
+    The queues are shared by the scheduler and every server worker, so only
+    their files know the depth; scrapes in between are answered from the
+    last count instead of scanning the tables again.
+    """
+
+    def __init__(self, max_age=QUEUE_DEPTH_MAX_AGE):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.depths = {}
+        self.counted_at = None
+
+    def count(self):
+        depths = {}
+        if config.webhook_queue_enabled:
+            depths['webhook'] = get_webhook_queue().stats()['depth']
+        retry_queue = get_retry_queue()
+        if retry_queue:
+            stats = retry_queue.stats()
+            depths['retry'] = stats.get('pending', 0)
+            depths['dead_letter'] = stats.get('dead', 0)
+        if any(is_deferred(agent) for agent in config.agents.items()):
+            requests = get_deferred_store().stats()['requests']
+            depths['deferred'] = requests.get('pending', 0) + requests.get('submitted', 0)
+        return depths
+
+    def collect(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.counted_at is None or now - self.counted_at >= self.max_age:
+                self.depths = self.count()
+                self.counted_at = now
+            depths = self.depths
+        depth = GaugeMetricFamily('miniflux_ai_queue_depth', 'Entries or LLM calls waiting in a queue', labels=['queue'])
+        for queue, value in depths.items():
+            depth.add_metric([queue], value)
+        yield depth
+
+
+queue_collector = QueueCollector()
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics of the processing pipeline"""
+    if not config.metrics_enabled:
+        abort(404)
+    body, content_type = render_metrics(queue_collector)
+    return Response(body, content_type=content_type)
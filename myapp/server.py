@@ -0,0 +1,61 @@
+import os
+
+from gunicorn.app.base import BaseApplication
+
+from common.config import config
+from common.logger import logger
+
+
+class GunicornApplication(BaseApplication):
+    def __init__(self, application, options):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def mark_worker_dead(server, worker):
+    """gunicorn ``child_exit`` hook: stop reporting the live gauges of an exited worker."""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def gunicorn_options():
+    options = {
+        'bind': f'{config.server_host}:{config.server_port}',
+        'workers': config.server_workers,
+        'worker_class': 'gthread',
+        'threads': config.server_threads,
+        'keepalive': config.server_keepalive,
+        'timeout': config.server_timeout,
+        'graceful_timeout': config.server_graceful_timeout,
+        'accesslog': None,
+        'errorlog': '-',
+        'loglevel': config.log_level.lower(),
+    }
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # livesum/livemin gauges keep the samples of a dead worker until its files are removed
+        options['child_exit'] = mark_worker_dead
+    return options
+
+
+def run_server(app):
+    """Serve the Flask app with the server selected by ``server.mode``.
+
+    gunicorn installs its own signal handlers, so it must be called from the main thread.
+    """
+    if config.server_mode == 'gunicorn':
+        logger.info(
+            f'Starting gunicorn on {config.server_host}:{config.server_port} '
+            f'with {config.server_workers} workers x {config.server_threads} threads'
+        )
+        GunicornApplication(app, gunicorn_options()).run()
+    else:
+        app.run(host=config.server_host, port=config.server_port)
@@ -0,0 +1,71 @@
+import unittest
+from types import SimpleNamespace
+
+from core.entry_filter import AgentFilter, filter_entry
+
+AGENTS = {
+    "summary": {
+        "title": "֎ AI summary:",
+        "style_block": True,
+        "deny_list": ["https://blocked.example/*"],
+        "allow_list": None,
+    },
+    "translate": {
+        "title": "🌐AI translate: ",
+        "style_block": False,
+        "deny_list": None,
+        "allow_list": ["https://9to5mac.com/", "https://home.kpmg/*"],
+    },
+    "legacy": {
+        "title": "legacy:",
+        "style_block": False,
+        "whitelist": ["https://legacy.example/*"],
+    },
+}
+
+
+def make_entry(site_url, content="<p>body</p>"):
+    return {"content": content, "feed": {"site_url": site_url}}
+
+
+class AgentFilterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.agent_filter = AgentFilter(AGENTS)
+
+    def test_match_agents_applies_allow_and_deny_lists(self):
+        self.assertEqual(self.agent_filter.match_agents(make_entry("https://home.kpmg/cn/zh/home/insights.html")), ["summary", "translate"])
+        self.assertEqual(self.agent_filter.match_agents(make_entry("https://blocked.example/feed")), [])
+        self.assertEqual(self.agent_filter.match_agents(make_entry("https://other.example/")), ["summary"])
+        self.assertEqual(self.agent_filter.match_agents(make_entry("https://legacy.example/a")), ["summary", "legacy"])
+
+    def test_processed_content_matches_no_agent(self):
+        self.assertEqual(self.agent_filter.match_agents(make_entry("https://9to5mac.com/", "<blockquote>done")), [])
+        self.assertEqual(self.agent_filter.match_agents(make_entry("https://9to5mac.com/", "🌐AI translate: done")), [])
+
+    def test_builtin_deny_list_blocks_internal_feeds(self):
+        self.assertEqual(self.agent_filter.match_agents(make_entry("https://ai-news.miniflux")), [])
+        self.assertEqual(self.agent_filter.match_agents(make_entry("https://feeds-status.miniflux")), [])
+
+    def test_empty_allow_list_matches_nothing(self):
+        agent_filter = AgentFilter({"test": {"title": "t", "allow_list": []}})
+
+        self.assertEqual(agent_filter.match_agents(make_entry("https://example.com/")), [])
+
+    def test_site_decisions_are_memoized(self):
+        self.agent_filter.match_agents(make_entry("https://9to5mac.com/"))
+
+        self.assertIn("https://9to5mac.com/", self.agent_filter.site_cache)
+
+    def test_filter_entry_agrees_with_compiled_filter(self):
+        config = SimpleNamespace(agents=AGENTS)
+        sites = ["https://9to5mac.com/", "https://blocked.example/x", "https://other.example/", "https://ai-news.miniflux"]
+
+        for site_url in sites:
+            entry = make_entry(site_url)
+            expected = self.agent_filter.match_agents(entry)
+            actual = [name for name, agent in AGENTS.items() if filter_entry(config, (name, agent), entry)]
+            self.assertEqual(actual, expected, site_url)
+
+
+if __name__ == "__main__":
+    unittest.main()
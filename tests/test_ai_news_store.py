@@ -0,0 +1,53 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from core.ai_news_store import append_entry, import_legacy_entries, iter_entries, rotate_entries
+
+
+class AINewsStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.entries_file = Path(self.tmpdir.name) / "entries.jsonl"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_append_and_iter_entries(self):
+        append_entry({"title": "first", "content": "摘要"}, self.entries_file)
+        append_entry({"title": "second", "content": "summary"}, self.entries_file)
+
+        entries = list(iter_entries(self.entries_file))
+
+        self.assertEqual([entry["title"] for entry in entries], ["first", "second"])
+        self.assertEqual(entries[0]["content"], "摘要")
+
+    def test_iter_entries_skips_corrupted_lines(self):
+        self.entries_file.write_text('{"title": "ok"}\n{"title": \n\n', encoding="utf-8")
+
+        self.assertEqual(list(iter_entries(self.entries_file)), [{"title": "ok"}])
+
+    def test_rotate_moves_entries_aside_and_starts_fresh_file(self):
+        append_entry({"title": "old"}, self.entries_file)
+
+        rotated = rotate_entries(self.entries_file)
+        append_entry({"title": "new"}, self.entries_file)
+
+        self.assertEqual(list(iter_entries(rotated)), [{"title": "old"}])
+        self.assertEqual(list(iter_entries(self.entries_file)), [{"title": "new"}])
+
+    def test_rotate_without_entries_returns_none(self):
+        self.assertIsNone(rotate_entries(self.entries_file))
+
+    def test_import_legacy_entries(self):
+        legacy_file = Path(self.tmpdir.name) / "entries.json"
+        legacy_file.write_text(json.dumps([{"title": "legacy"}]), encoding="utf-8")
+
+        self.assertEqual(import_legacy_entries(legacy_file, self.entries_file), 1)
+        self.assertEqual(list(iter_entries(self.entries_file)), [{"title": "legacy"}])
+        self.assertEqual(json.loads(legacy_file.read_text(encoding="utf-8")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import concurrent.futures
+import sys
+import threading
+import unittest
+from unittest import mock
+
+from core.async_engine import AsyncEngine
+
+async_engine_module = sys.modules["core.async_engine"]
+
+
+class FakeMinifluxWriter:
+    def __init__(self):
+        self.updates = []
+
+    def submit(self, entry_id, content, prefix):
+        self.updates.append((entry_id, content))
+        future = concurrent.futures.Future()
+        future.set_result("written")
+        return future
+
+
+class AsyncEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = AsyncEngine(max_concurrency=8)
+        self.writer = FakeMinifluxWriter()
+
+    def tearDown(self):
+        self.engine.close()
+
+    def test_agents_run_concurrently_and_keep_configured_order(self):
+        agents = [
+            ("summary", {"title": "S:", "prompt": "slow", "style_block": True}),
+            ("translate", {"title": "T:", "prompt": "fast", "style_block": True}),
+        ]
+        in_flight = []
+
+        async def fake_get_ai_result_async(prompt, request):
+            in_flight.append(prompt)
+            await asyncio.sleep(0.05 if prompt == "slow" else 0.01)
+            return prompt + "-result"
+
+        entry = {"id": 7, "content": "<p>body</p>"}
+        with mock.patch.object(async_engine_module, "select_agents", return_value=(agents, [])), \
+                mock.patch.object(async_engine_module, "get_ai_result_async", fake_get_ai_result_async), \
+                mock.patch.object(async_engine_module, "handle_agent_result", lambda entry, agent, result: agent[1]["title"] + result), \
+                mock.patch.object(async_engine_module, "get_miniflux_writer", lambda: self.writer), \
+                mock.patch.object(async_engine_module, "mark_entry_processed") as mark_entry_processed:
+            self.engine.submit_entry(entry).result(timeout=5)
+
+        self.assertEqual(self.writer.updates, [(7, "S:slow-resultT:fast-result<p>body</p>")])
+        mark_entry_processed.assert_called_once_with(7, ["summary", "translate"], "S:slow-resultT:fast-result<p>body</p>", [])
+
+    def test_index_lookups_run_off_the_event_loop(self):
+        threads = []
+
+        def fake_select_agents(entry):
+            threads.append(threading.current_thread())
+            return [], ["summary"]
+
+        entry = {"id": 7, "content": "<p>body</p>"}
+        with mock.patch.object(async_engine_module, "select_agents", fake_select_agents), \
+                mock.patch.object(async_engine_module, "mark_entry_processed",
+                                  lambda *args: threads.append(threading.current_thread())):
+            self.engine.submit_entry(entry).result(timeout=5)
+
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(self.engine.thread, threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import json
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from core.batching import AgentBatcher, BatchRunner, build_batch_request, parse_batch_response
+from core.llm_pool import Endpoint
+from core.process_entries import run_agents
+
+batching_module = sys.modules["core.batching"]
+process_entries_module = sys.modules["core.process_entries"]
+
+
+def fake_batch_llm(calls, endpoint=None):
+    def fake_request_ai_result(prompt, request, truncate=True):
+        # a truncated batch request could not be parsed
+        assert not truncate
+        calls.append((prompt, request))
+        items = json.loads(request)
+        return json.dumps([{"id": item["id"], "result": item["content"].upper()} for item in items]), endpoint
+
+    return fake_request_ai_result
+
+
+class BatchRequestTestCase(unittest.TestCase):
+    def test_build_batch_request_replaces_content_placeholder(self):
+        prompt, request = build_batch_request("${content}\n---\nSummarize.", ["a", "b"])
+
+        self.assertNotIn("${content}", prompt)
+        self.assertIn("JSON array of 2 items", prompt)
+        self.assertEqual(json.loads(request), [{"id": 0, "content": "a"}, {"id": 1, "content": "b"}])
+
+    def test_parse_batch_response_orders_by_id(self):
+        response = '```json\n[{"id": 1, "result": "B"}, {"id": 0, "result": "A"}]\n```'
+
+        self.assertEqual(parse_batch_response(response, 2), ["A", "B"])
+
+    def test_parse_batch_response_rejects_mismatched_count(self):
+        self.assertIsNone(parse_batch_response('[{"id": 0, "result": "A"}]', 2))
+        self.assertIsNone(parse_batch_response("not json", 1))
+
+
+class AgentBatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(batching_module, "get_llm_cache", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_full_batch_is_one_request(self):
+        calls = []
+        batcher = AgentBatcher("Summarize.", size=3, wait=10)
+
+        with mock.patch.object(batching_module, "request_ai_result", fake_batch_llm(calls)):
+            futures = [batcher.submit(text) for text in ("a", "b", "c")]
+            results = [future.result(timeout=2) for future in futures]
+
+        self.assertEqual(results, ["A", "B", "C"])
+        self.assertEqual(len(calls), 1)
+
+    def test_partial_batch_is_flushed_after_wait(self):
+        calls = []
+        batcher = AgentBatcher("Summarize.", size=10, wait=0.05)
+
+        with mock.patch.object(batching_module, "request_ai_result", fake_batch_llm(calls)):
+            futures = [batcher.submit(text) for text in ("a", "b")]
+            results = [future.result(timeout=2) for future in futures]
+
+        self.assertEqual(results, ["A", "B"])
+        self.assertEqual(len(calls), 1)
+
+    def test_queued_entries_are_answered_before_their_worker_asks(self):
+        calls = []
+        batcher = AgentBatcher("Summarize.", size=3, wait=10)
+
+        with mock.patch.object(batching_module, "request_ai_result", fake_batch_llm(calls)):
+            for text in ("a", "b", "c"):
+                batcher.queue(text)
+            results = [batcher.submit(text).result(timeout=2) for text in ("a", "b", "c")]
+
+        self.assertEqual(results, ["A", "B", "C"])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(batcher.queued, {})
+
+    def test_batch_is_sent_early_to_stay_within_the_input_budget(self):
+        calls = []
+        batcher = AgentBatcher("Summarize.", size=3, wait=10)
+        budget = SimpleNamespace(llm_max_input_tokens=None, llm_max_length=len(build_batch_request("", ["a", "b"])[1]))
+
+        with mock.patch.object(batching_module, "config", budget), \
+                mock.patch.object(batching_module, "request_ai_result", fake_batch_llm(calls)):
+            futures = [batcher.submit(text) for text in ("a", "b", "c")]
+            batcher.flush()
+            results = [future.result(timeout=2) for future in futures]
+
+        self.assertEqual(results, ["A", "B", None])
+        self.assertEqual([len(json.loads(request)) for _, request in calls], [2])
+
+    def test_batches_run_on_a_bounded_number_of_threads(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_batch_llm(prompt, request, truncate=True):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+            return fake_batch_llm([])(prompt, request, truncate)
+
+        batcher = AgentBatcher("Summarize.", size=2, wait=10, runner=BatchRunner(max_workers=1))
+
+        with mock.patch.object(batching_module, "request_ai_result", slow_batch_llm):
+            futures = [batcher.submit(text) for text in ("a", "b", "c", "d", "e", "f")]
+            results = [future.result(timeout=2) for future in futures]
+
+        self.assertEqual(results, ["A", "B", "C", "D", "E", "F"])
+        self.assertEqual(max(peak), 1)
+
+    def test_futures_are_resolved_when_caching_fails(self):
+        cache = mock.Mock(get=mock.Mock(return_value=None), set=mock.Mock(side_effect=OSError("disk full")))
+        batcher = AgentBatcher("Summarize.", size=2, wait=10)
+
+        with mock.patch.object(batching_module, "get_llm_cache", return_value=cache), \
+                mock.patch.object(batching_module, "get_cached_result", return_value=None), \
+                mock.patch.object(batching_module, "request_ai_result", fake_batch_llm([], Endpoint("openai"))):
+            futures = [batcher.submit(text) for text in ("a", "b")]
+            results = [future.result(timeout=2) for future in futures]
+
+        self.assertEqual(results, ["A", "B"])
+
+    def test_discarded_entries_are_not_kept(self):
+        batcher = AgentBatcher("Summarize.", size=3, wait=10)
+
+        with mock.patch.object(batching_module, "request_ai_result", fake_batch_llm([])):
+            batcher.queue("a")
+            batcher.discard("a")
+
+        self.assertEqual(batcher.queued, {})
+
+    def test_unparsable_response_falls_back_to_single_requests(self):
+        batcher = AgentBatcher("Summarize.", size=2, wait=10)
+
+        with mock.patch.object(batching_module, "request_ai_result", return_value=("Sorry, I can't.", None)):
+            futures = [batcher.submit(text) for text in ("a", "b")]
+            results = [future.result(timeout=2) for future in futures]
+
+        self.assertEqual(results, [None, None])
+        self.assertEqual(batcher.fallbacks, 1)
+
+
+class RunAgentsBatchingTestCase(unittest.TestCase):
+    def test_short_entries_from_parallel_workers_share_one_request(self):
+        agent = ("summary", {"prompt": "Summarize.", "batch_size": 3, "batch_wait": 10})
+        calls = []
+        single_calls = []
+        results = {}
+
+        def process(entry_id):
+            results[entry_id] = run_agents({"id": entry_id, "content": f"<p>entry {entry_id}</p>"}, [agent])[0]
+
+        batching_module.get_agent_batcher.reset()
+        self.addCleanup(batching_module.get_agent_batcher.reset)
+        with mock.patch.object(batching_module, "get_llm_cache", return_value=None), \
+                mock.patch.object(batching_module, "request_ai_result", fake_batch_llm(calls)), \
+                mock.patch.object(process_entries_module, "get_ai_result", lambda *args: single_calls.append(args)):
+            threads = [threading.Thread(target=process, args=(entry_id,)) for entry_id in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=2)
+
+        self.assertEqual(results, {0: "ENTRY 0", 1: "ENTRY 1", 2: "ENTRY 2"})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(single_calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import argparse
+import importlib.util
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import requests
+
+BENCHMARKS_DIR = Path(__file__).resolve().parents[1] / "benchmarks"
+
+
+def load_benchmark_module(name):
+    # the benchmark scripts import their siblings as top-level modules
+    if str(BENCHMARKS_DIR) not in sys.path:
+        sys.path.insert(0, str(BENCHMARKS_DIR))
+    spec = importlib.util.spec_from_file_location(name, BENCHMARKS_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+mock_servers = load_benchmark_module("mock_servers")
+pipeline = load_benchmark_module("pipeline")
+
+
+def mock_args(**overrides):
+    parser = argparse.ArgumentParser()
+    mock_servers.add_arguments(parser)
+    args = parser.parse_args([])
+    args.entries = 10
+    args.llm_latency = 0.0
+    vars(args).update(overrides)
+    return args
+
+
+class MockServersTestCase(unittest.TestCase):
+    def start(self, **overrides):
+        miniflux, llms = mock_servers.start_mock_servers(mock_args(**overrides))
+        for server in (miniflux, *llms):
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{miniflux.server_port}", f"http://127.0.0.1:{llms[0].server_port}"
+
+    def test_entries_are_generated_from_their_id(self):
+        self.assertEqual(mock_servers.make_entry(7)["content"], mock_servers.make_entry(7)["content"])
+        self.assertNotEqual(mock_servers.make_entry(7)["content"], mock_servers.make_entry(8)["content"])
+
+    def test_miniflux_pages_and_records_updates(self):
+        miniflux_url, _ = self.start()
+
+        page = requests.get(f"{miniflux_url}/v1/entries", params={"after_entry_id": 5, "limit": 100}).json()
+        self.assertEqual([entry["id"] for entry in page["entries"]], [6, 7, 8, 9, 10])
+
+        response = requests.put(f"{miniflux_url}/v1/entries/6", json={"content": "updated"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(requests.get(f"{miniflux_url}/v1/entries/6").json()["content"], "updated")
+        stats = requests.get(f"{miniflux_url}/_benchmark/stats").json()
+        self.assertEqual(list(stats["updated_at"]), ["6"])
+
+    def test_llm_answers_openai_and_gemini_requests(self):
+        _, llm_url = self.start()
+
+        openai = requests.post(f"{llm_url}/v1/chat/completions", json={"model": "m", "messages": []}).json()
+        gemini = requests.post(f"{llm_url}/v1beta/models/m:generateContent", json={}).json()
+
+        self.assertTrue(openai["choices"][0]["message"]["content"])
+        self.assertTrue(gemini["candidates"][0]["content"]["parts"][0]["text"])
+
+    def test_rate_limits_are_injected_with_retry_after(self):
+        _, llm_url = self.start(llm_429_rate=1.0, retry_after=3)
+
+        response = requests.post(f"{llm_url}/v1/chat/completions", json={})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "3")
+
+
+class PipelineTestCase(unittest.TestCase):
+    def test_compare_reports_percent_change(self):
+        baseline = {"commit": "abc123", "results": [
+            {"scenario": "fetch", "entries": 100, "entries_per_second": 50.0,
+             "latency_ms": {"p95": 200.0}, "peak_rss_mb": 80.0},
+        ]}
+        results = [{"scenario": "fetch", "entries": 100, "entries_per_second": 40.0,
+                    "latency_ms": {"p95": 300.0}, "peak_rss_mb": 80.0}]
+
+        self.assertEqual(pipeline.compare(results, baseline), [{
+            "scenario": "fetch",
+            "entries": 100,
+            "baseline_commit": "abc123",
+            "entries_per_second_pct": -20.0,
+            "latency_p95_pct": 50.0,
+            "peak_rss_pct": 0.0,
+        }])
+
+    def test_fetch_and_webhook_process_every_entry(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = Path(tmpdir) / "results.json"
+            subprocess.run(
+                [sys.executable, str(BENCHMARKS_DIR / "pipeline.py"), "--scenario", "fetch", "webhook",
+                 "--entries", "20", "--llm-latency", "0", "--min-words", "20", "--max-words", "40",
+                 "--output", str(output)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=True,
+                timeout=300,
+            )
+            report = json.loads(output.read_text())
+
+        self.assertEqual([result["scenario"] for result in report["results"]], ["fetch", "webhook"])
+        for result in report["results"]:
+            self.assertEqual(result["processed"], 20)
+            self.assertEqual(result["llm"]["openai"], 40)
+            self.assertIn("p99", result["latency_ms"])
+            self.assertGreater(result["peak_rss_mb"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
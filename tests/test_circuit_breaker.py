@@ -0,0 +1,69 @@
+import unittest
+from unittest import mock
+
+from core.circuit_breaker import CircuitBreaker, CircuitOpenError, is_transient
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("openai", failure_threshold=2, reset_timeout=60)
+
+        breaker.before_call()
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError) as raised:
+            breaker.before_call()
+        self.assertEqual(raised.exception.retry_at, breaker.opened_at + 60)
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker("openai", failure_threshold=2, reset_timeout=60)
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        breaker.before_call()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_half_open_lets_one_trial_call_through(self):
+        breaker = CircuitBreaker("openai", failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+
+        with mock.patch("core.circuit_breaker.time.time", return_value=breaker.opened_at + 61):
+            breaker.before_call()
+            with self.assertRaises(CircuitOpenError):
+                breaker.before_call()
+            breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+
+        with mock.patch("core.circuit_breaker.time.time", return_value=breaker.opened_at + 61):
+            breaker.before_call()
+            breaker.record_success()
+        breaker.before_call()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_zero_threshold_disables_the_breaker(self):
+        breaker = CircuitBreaker("openai", failure_threshold=0)
+        for _ in range(10):
+            breaker.record_failure()
+        breaker.before_call()
+
+    def test_only_transient_errors_are_failures(self):
+        def error(name, **attributes):
+            return type(name, (Exception,), attributes)()
+
+        self.assertTrue(is_transient(error("RateLimitError", status_code=429)))
+        self.assertTrue(is_transient(error("InternalServerError", status_code=503)))
+        self.assertTrue(is_transient(error("ServerError", code=500)))
+        self.assertTrue(is_transient(error("APITimeoutError")))
+        self.assertTrue(is_transient(error("APIConnectionError")))
+        self.assertTrue(is_transient(ConnectionError()))
+        self.assertFalse(is_transient(error("BadRequestError", status_code=400)))
+        self.assertFalse(is_transient(error("ClientError", code=404)))
+        self.assertFalse(is_transient(ValueError("empty response")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import asyncio
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from prometheus_client import REGISTRY
+
+from core.concurrency_limiter import ConcurrencyLimiter, is_overload
+from core.get_ai_result import get_ai_result
+from core.llm_pool import Endpoint, LLMPool
+
+limiter_module = sys.modules["core.concurrency_limiter"]
+get_ai_result_module = sys.modules["core.get_ai_result"]
+
+
+class RateLimitError(Exception):
+    status_code = 429
+    response = SimpleNamespace(headers={"retry-after": "0"})
+
+
+class ConcurrencyLimiterTestCase(unittest.TestCase):
+    def run_requests(self, limiter, count, latency=1.0):
+        for _ in range(count):
+            limiter.acquire()
+        for _ in range(count):
+            limiter.release(latency)
+
+    def test_limit_grows_while_latency_is_flat(self):
+        limiter = ConcurrencyLimiter("test", initial_limit=4, max_limit=6)
+
+        self.run_requests(limiter, 4)
+        # additive increase, a single round trip does not open a slot yet
+        self.assertEqual(limiter.slots, 4)
+
+        for _ in range(20):
+            self.run_requests(limiter, limiter.slots)
+
+        self.assertEqual(limiter.limit, 6)
+        self.assertEqual(REGISTRY.get_sample_value("miniflux_ai_llm_concurrency_limit", {"endpoint": "test"}), 6)
+
+    def test_unused_limit_does_not_grow(self):
+        limiter = ConcurrencyLimiter("test", initial_limit=8)
+
+        self.run_requests(limiter, 1)
+
+        self.assertEqual(limiter.limit, 8)
+
+    def test_overload_backs_off_once_per_round_trip(self):
+        limiter = ConcurrencyLimiter("test", initial_limit=10, backoff=0.5)
+        self.run_requests(limiter, 1, latency=60)
+        limit = limiter.limit
+
+        for _ in range(3):
+            limiter.acquire()
+        for _ in range(3):
+            limiter.release(overloaded=True)
+
+        self.assertEqual(limiter.limit, limit // 2)
+
+    def test_rising_latency_backs_off(self):
+        limiter = ConcurrencyLimiter("test", initial_limit=10, backoff=0.5, latency_tolerance=2.0)
+        for _ in range(50):
+            self.run_requests(limiter, 1, latency=0.001)
+
+        self.run_requests(limiter, 5, latency=1.0)
+
+        self.assertEqual(limiter.limit, 5)
+
+    def test_waiters_are_admitted_when_a_slot_frees(self):
+        limiter = ConcurrencyLimiter("test", initial_limit=1, max_limit=1)
+        limiter.acquire()
+        admitted = threading.Event()
+        waiter = threading.Thread(target=lambda: (limiter.acquire(), admitted.set()))
+        waiter.start()
+
+        self.assertFalse(admitted.wait(0.1))
+        limiter.release(0.1)
+        self.assertTrue(admitted.wait(1))
+        waiter.join()
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_async_waiters_are_admitted_when_a_slot_frees(self):
+        limiter = ConcurrencyLimiter("test", initial_limit=1, max_limit=1)
+        order = []
+
+        async def request(name):
+            async with limiter.slot_async():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def main():
+            await asyncio.gather(request("a"), request("b"), request("c"))
+
+        asyncio.run(main())
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_overload_errors(self):
+        self.assertTrue(is_overload(RateLimitError()))
+        self.assertTrue(is_overload(SimpleNamespace(status_code=503)))
+        self.assertTrue(is_overload(TimeoutError()))
+        self.assertFalse(is_overload(ValueError("bad request")))
+
+
+class GetAIResultTestCase(unittest.TestCase):
+    def test_rate_limited_requests_lower_the_limit(self):
+        limiter = ConcurrencyLimiter("openai", initial_limit=8, backoff=0.5)
+        calls = []
+
+        def request(prompt, text):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise RateLimitError()
+            return "done"
+
+        endpoint = Endpoint("openai")
+        endpoint.provider = SimpleNamespace(request=request)
+        with mock.patch.object(get_ai_result_module, "get_llm_cache", return_value=None), \
+                mock.patch.object(get_ai_result_module, "get_llm_pool", return_value=LLMPool([endpoint])), \
+                mock.patch.object(limiter_module, "get_concurrency_limiter", return_value=limiter):
+            self.assertEqual(get_ai_result("Summarize.", "text"), "done")
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
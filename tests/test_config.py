@@ -5,12 +5,16 @@ import unittest
 from pathlib import Path
 
 
-def load_config_class():
+def load_config_module():
     config_path = Path(__file__).resolve().parents[1] / "common" / "config.py"
     spec = importlib.util.spec_from_file_location("config_mod", config_path)
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
-    return module.Config
+    return module
+
+
+def load_config_class():
+    return load_config_module().Config
 
 
 class ConfigTestCase(unittest.TestCase):
@@ -55,6 +59,89 @@ class ConfigTestCase(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.Config()
 
+    def test_rejects_unknown_provider(self):
+        self.write_config("llm:\n  provider: claude\n")
+
+        with self.assertRaises(ValueError):
+            self.Config()
+
+    def test_rejects_endpoint_without_base_url(self):
+        self.write_config("llm:\n  endpoints:\n    - base_url: http://ollama-1:11434/v1\n    - weight: 2\n")
+
+        with self.assertRaises(ValueError):
+            self.Config()
+
+    def test_deferred_agent_needs_an_openai_endpoint(self):
+        agents = "agents:\n  translate:\n    title: 'T: '\n    prompt: Translate.\n    deferred: true\n"
+        self.write_config(
+            "llm:\n  provider: gemini\n  endpoints:\n    - base_url: http://ollama-1:11434/v1\n      provider: openai\n"
+            + agents
+        )
+        self.assertEqual(self.Config().llm_endpoints[0]["provider"], "openai")
+
+        self.write_config("llm:\n  endpoints:\n    - base_url: http://gemini\n      provider: gemini\n" + agents)
+        with self.assertRaises(ValueError):
+            self.Config()
+
+    def test_rejects_agent_without_prompt(self):
+        self.write_config("agents:\n  summary:\n    title: 'Summary: '\n")
+
+        with self.assertRaises(ValueError):
+            self.Config()
+
+
+class SharedConfigTestCase(unittest.TestCase):
+    def setUp(self):
+        self.SharedConfig = load_config_module().SharedConfig
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "config.yml"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_config(self, content):
+        self.path.write_text(content, encoding="utf8")
+
+    def test_loads_lazily_on_first_access(self):
+        shared = self.SharedConfig(self.path)
+        self.write_config("log_level: DEBUG\n")
+
+        self.assertEqual(shared.log_level, "DEBUG")
+
+    def test_reload_swaps_config_and_runs_callbacks(self):
+        self.write_config("llm:\n  RPM: 100\n")
+        shared = self.SharedConfig(self.path)
+        seen = []
+        shared.on_reload(lambda: seen.append(shared.llm_RPM))
+        self.assertEqual(shared.llm_RPM, 100)
+
+        self.write_config("llm:\n  RPM: 200\n")
+
+        self.assertTrue(shared.reload())
+        self.assertEqual(shared.llm_RPM, 200)
+        self.assertEqual(seen, [200])
+
+    def test_invalid_reload_keeps_previous_config(self):
+        self.write_config("llm:\n  RPM: 100\n")
+        shared = self.SharedConfig(self.path)
+        self.assertEqual(shared.llm_RPM, 100)
+
+        self.write_config("llm:\n  RPM: -1\n")
+
+        self.assertFalse(shared.reload())
+        self.assertEqual(shared.llm_RPM, 100)
+
+    def test_reload_if_changed_only_reloads_on_mtime_change(self):
+        self.write_config("llm:\n  RPM: 100\n")
+        shared = self.SharedConfig(self.path)
+        self.assertFalse(shared.reload_if_changed())
+
+        self.write_config("llm:\n  RPM: 300\n")
+        os.utime(self.path, (0, 0))
+
+        self.assertTrue(shared.reload_if_changed())
+        self.assertEqual(shared.llm_RPM, 300)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,232 @@
+import json
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from openai import OpenAI
+
+from core.circuit_breaker import CircuitBreaker
+from core.deferred_batch import (
+    DeferredStore,
+    defer_agent,
+    get_batch_endpoints,
+    poll_deferred_jobs,
+    run_deferred_batches,
+    submit_deferred_requests,
+)
+from core.llm_pool import Endpoint, LLMPool
+from core.miniflux_writer import MinifluxWriter
+
+deferred_batch_module = sys.modules["core.deferred_batch"]
+process_entries_module = sys.modules["core.process_entries"]
+llm_pool_module = sys.modules["core.llm_pool"]
+
+AGENT = ("translate", {"title": "T: ", "prompt": "Translate.", "style_block": False, "deferred": True})
+
+
+class StubBatchAPI(BaseHTTPRequestHandler):
+    """Minimal OpenAI files and batches API that finishes every job on the first poll."""
+
+    files = {}
+    batches = {}
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.endswith("/files"):
+            # the JSONL lines are the only JSON objects inside the multipart body
+            lines = [line for line in body.decode().splitlines() if line.startswith('{"custom_id"')]
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = lines
+            self.send_json({"id": file_id, "object": "file", "bytes": len(body), "created_at": 0,
+                            "filename": "batch.jsonl", "purpose": "batch", "status": "processed"})
+        elif self.path.endswith("/batches"):
+            request = json.loads(body)
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {"input_file_id": request["input_file_id"], "status": "validating"}
+            self.send_json(self.batch_payload(batch_id))
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if parts[-2] == "batches":
+            batch = self.batches[parts[-1]]
+            if batch["status"] != "completed":
+                output = []
+                for line in self.files[batch["input_file_id"]]:
+                    request = json.loads(line)
+                    content = request["body"]["messages"][-1]["content"].split("---\n ")[-1]
+                    output.append(json.dumps({
+                        "custom_id": request["custom_id"],
+                        "response": {"status_code": 200, "body": {"choices": [{"message": {"content": content.upper()}}]}},
+                    }))
+                output_id = f"file-{len(self.files)}"
+                self.files[output_id] = output
+                batch.update(status="completed", output_file_id=output_id)
+            self.send_json(self.batch_payload(parts[-1]))
+        elif parts[-1] == "content":
+            body = ("\n".join(self.files[parts[-2]]) + "\n").encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def batch_payload(self, batch_id):
+        batch = self.batches[batch_id]
+        return {"id": batch_id, "object": "batch", "endpoint": "/v1/chat/completions", "completion_window": "24h",
+                "created_at": 0, "input_file_id": batch["input_file_id"], "status": batch["status"],
+                "output_file_id": batch.get("output_file_id"), "error_file_id": None}
+
+
+class FakeMinifluxClient:
+    def __init__(self, entries):
+        self.entries = entries
+        self.updates = []
+
+    def get_entry(self, entry_id):
+        return dict(self.entries[entry_id])
+
+    def update_entry(self, entry_id, content):
+        self.updates.append((entry_id, content))
+        self.entries[entry_id]["content"] = content
+
+
+class DeferredBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        StubBatchAPI.files = {}
+        StubBatchAPI.batches = {}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubBatchAPI)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client = OpenAI(base_url=f"http://127.0.0.1:{self.server.server_port}/v1", api_key="test", max_retries=0)
+        self.endpoint = Endpoint("openai", model="test-model")
+        self.endpoint.provider = SimpleNamespace(client=self.client)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = Path(self.tmpdir.name) / "deferred_batch.db"
+        self.store = DeferredStore(self.db_path)
+
+        fake_config = SimpleNamespace(
+            llm_extra_params={},
+            deferred_batch_max_requests=100,
+            deferred_batch_completion_window="24h",
+            agents=dict([AGENT]),
+        )
+        for patcher in (
+            mock.patch.object(deferred_batch_module, "config", fake_config),
+            mock.patch.object(deferred_batch_module, "get_deferred_store", lambda: self.store),
+            mock.patch.object(process_entries_module, "get_entry_index", lambda: None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_deferred_requests_are_applied_after_restart(self):
+        miniflux_client = FakeMinifluxClient({
+            1: {"id": 1, "content": "<p>hello</p>"},
+            2: {"id": 2, "content": "<p>world</p>"},
+        })
+        writer = MinifluxWriter(miniflux_client, concurrency=1, retries=0)
+        self.addCleanup(writer.close)
+        patcher = mock.patch.object(process_entries_module, "get_miniflux_writer", lambda: writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        defer_agent(miniflux_client.entries[1], AGENT, "hello")
+        defer_agent(miniflux_client.entries[2], AGENT, "world")
+        defer_agent(miniflux_client.entries[1], AGENT, "hello")
+
+        batch_id = submit_deferred_requests(self.endpoint, self.store)
+        self.assertEqual(len(StubBatchAPI.files["file-0"]), 2)
+
+        # the job survives a restart of the process
+        self.store.close()
+        self.store = DeferredStore(self.db_path)
+        self.assertEqual(self.store.open_jobs(), [batch_id])
+
+        poll_deferred_jobs(self.endpoint, self.store, miniflux_client)
+
+        self.assertEqual(
+            sorted(miniflux_client.updates),
+            [(1, "T: <p>HELLO</p><hr><br /><p>hello</p>"), (2, "T: <p>WORLD</p><hr><br /><p>world</p>")],
+        )
+        self.assertEqual(self.store.open_jobs(), [])
+        self.assertEqual(self.store.stats()["requests"], {"done": 2})
+        self.assertIsNone(submit_deferred_requests(self.endpoint, self.store))
+
+    def test_failed_requests_are_sent_again_until_max_attempts(self):
+        store = DeferredStore(Path(self.tmpdir.name) / "retry.db", max_attempts=2)
+        self.addCleanup(store.close)
+        store.add("1:translate", {"messages": []})
+
+        store.add_job("batch-a", "file-a", "validating", ["1:translate"])
+        self.assertTrue(store.fail_request("1:translate"))
+        self.assertEqual([custom_id for custom_id, _ in store.pending_requests(10)], ["1:translate"])
+
+        store.add_job("batch-b", "file-b", "validating", ["1:translate"])
+        self.assertFalse(store.fail_request("1:translate"))
+        self.assertEqual(store.pending_requests(10), [])
+        self.assertEqual(store.stats()["requests"], {"failed": 1})
+
+    def test_changed_requests_are_deferred_again(self):
+        self.assertTrue(self.store.add("1:translate", {"messages": ["old"]}))
+        self.store.set_request_status("1:translate", "done")
+
+        self.assertFalse(self.store.add("1:translate", {"messages": ["old"]}))
+        self.assertTrue(self.store.add("1:translate", {"messages": ["new"]}))
+        self.assertEqual(self.store.pending_requests(10), [("1:translate", {"messages": ["new"]})])
+
+        self.store.add_job("batch-a", "file-a", "validating", ["1:translate"])
+        self.assertFalse(self.store.add("1:translate", {"messages": ["newer"]}))
+
+    def test_jobs_skip_endpoints_with_an_open_circuit(self):
+        down = Endpoint("down", model="down-model")
+        self.endpoint.name = "up"
+        breakers = {"down": CircuitBreaker("down", failure_threshold=1, reset_timeout=60)}
+        breakers["down"].record_failure()
+        pool = LLMPool([Endpoint("gemini", "gemini"), down, self.endpoint])
+        miniflux_client = FakeMinifluxClient({1: {"id": 1, "content": "<p>hello</p>"}})
+        defer_agent(miniflux_client.entries[1], AGENT, "hello")
+
+        with mock.patch.object(deferred_batch_module, "get_llm_pool", return_value=pool), \
+                mock.patch.object(llm_pool_module, "get_circuit_breaker",
+                                  lambda name: breakers.setdefault(name, CircuitBreaker(name))):
+            run_deferred_batches(miniflux_client)
+
+        self.assertEqual(self.store.open_jobs("up"), ["batch-0"])
+        self.assertEqual(json.loads(StubBatchAPI.files["file-0"][0])["body"]["model"], "test-model")
+
+
+class BatchEndpointTestCase(unittest.TestCase):
+    def test_batch_jobs_go_to_openai_endpoints(self):
+        pool = LLMPool([
+            Endpoint("gemini", "gemini", "http://gemini"),
+            Endpoint("vllm", "openai", "http://vllm/v1", model="qwen"),
+            Endpoint("hosted", "openai", "https://api.example.com/v1"),
+        ])
+
+        with mock.patch.object(deferred_batch_module, "get_llm_pool", return_value=pool):
+            endpoints = get_batch_endpoints()
+
+        self.assertEqual([endpoint.name for endpoint in endpoints], ["vllm", "hosted"])
+
+if __name__ == "__main__":
+    unittest.main()
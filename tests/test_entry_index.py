@@ -0,0 +1,64 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from core.entry_index import EntryIndex
+
+
+class EntryIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.index = EntryIndex(Path(self.tmpdir.name) / "entry_index.db")
+
+    def tearDown(self):
+        self.index.close()
+        self.tmpdir.cleanup()
+
+    def test_new_entry_is_pending_for_all_agents(self):
+        entry = {"id": 1, "content": "<p>hello</p>"}
+
+        self.assertEqual(self.index.pending_agents(entry, ["summary", "translate"]), ["summary", "translate"])
+
+    def test_processed_agents_are_skipped_for_same_content(self):
+        self.index.mark_processed(1, ["summary"], "<p>hello</p>")
+
+        pending = self.index.pending_agents({"id": 1, "content": "<p>hello</p>"}, ["summary", "translate"])
+
+        self.assertEqual(pending, ["translate"])
+
+    def test_changed_content_is_pending_again(self):
+        self.index.mark_processed(1, ["summary", "translate"], "<p>hello</p>")
+
+        pending = self.index.pending_agents({"id": 1, "content": "<p>updated</p>"}, ["summary", "translate"])
+
+        self.assertEqual(pending, ["summary", "translate"])
+
+    def test_filtered_agents_are_pending_again_when_the_filter_changes(self):
+        entry = {"id": 1, "content": "<p>hello</p>"}
+        self.index.mark_filtered(1, ["translate"], "<p>hello</p>", "deny-a")
+
+        self.assertEqual(self.index.pending_agents(entry, ["summary", "translate"], "deny-a"), ["summary"])
+        self.assertEqual(self.index.pending_agents(entry, ["summary", "translate"], "deny-b"), ["summary", "translate"])
+
+    def test_index_survives_reopen(self):
+        path = Path(self.tmpdir.name) / "entry_index.db"
+        self.index.mark_processed(1, ["summary"], "<p>hello</p>")
+        self.index.close()
+
+        self.index = EntryIndex(path)
+
+        self.assertEqual(self.index.pending_agents({"id": 1, "content": "<p>hello</p>"}, ["summary"]), [])
+
+    def test_prune_removes_old_rows(self):
+        self.index.mark_processed(1, ["summary"], "<p>hello</p>")
+        self.index.conn.execute("UPDATE processed SET processed_at = ?", (time.time() - 10 * 86400,))
+
+        removed = self.index.prune(retention_days=7)
+
+        self.assertEqual(removed, 1)
+        self.assertEqual(self.index.pending_agents({"id": 1, "content": "<p>hello</p>"}, ["summary"]), ["summary"])
+
+
+if __name__ == "__main__":
+    unittest.main()
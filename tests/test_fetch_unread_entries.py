@@ -0,0 +1,90 @@
+import concurrent.futures
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from core.fetch_unread_entries import iter_unread_pages, load_fetch_cursor, save_fetch_cursor, submit_unread_entries
+
+fetch_module = sys.modules["core.fetch_unread_entries"]
+
+
+class FakeMinifluxClient:
+    def __init__(self, entry_ids):
+        self.entries = [{"id": entry_id, "content": f"<p>{entry_id}</p>"} for entry_id in entry_ids]
+        self.calls = []
+
+    def get_entries(self, **kwargs):
+        self.calls.append(kwargs)
+        entries = [entry for entry in self.entries if entry["id"] > kwargs["after_entry_id"]]
+        return {"total": len(entries), "entries": entries[: kwargs["limit"]]}
+
+
+class FetchUnreadEntriesTestCase(unittest.TestCase):
+    def test_iter_unread_pages_walks_cursor_in_fixed_size_pages(self):
+        client = FakeMinifluxClient(range(1, 8))
+
+        pages = list(iter_unread_pages(client, after_entry_id=0, page_size=3))
+
+        self.assertEqual([[entry["id"] for entry in page] for page in pages], [[1, 2, 3], [4, 5, 6], [7]])
+        self.assertEqual([call["after_entry_id"] for call in client.calls], [0, 3, 6])
+        self.assertTrue(all(call["order"] == "id" and call["direction"] == "asc" for call in client.calls))
+
+    def test_iter_unread_pages_starts_after_cursor(self):
+        client = FakeMinifluxClient(range(1, 8))
+
+        pages = list(iter_unread_pages(client, after_entry_id=5, page_size=3))
+
+        self.assertEqual([[entry["id"] for entry in page] for page in pages], [[6, 7]])
+
+    def test_fetch_cursor_round_trip(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            state_file = Path(temp_dir) / "fetch_state.json"
+
+            self.assertEqual(load_fetch_cursor(state_file), 0)
+            save_fetch_cursor(42, state_file)
+            self.assertEqual(load_fetch_cursor(state_file), 42)
+
+    def test_corrupted_fetch_cursor_restarts_from_zero(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            state_file = Path(temp_dir) / "fetch_state.json"
+            state_file.write_text("{not json", encoding="utf-8")
+
+            self.assertEqual(load_fetch_cursor(state_file), 0)
+
+    def run_incremental_poll(self, outcome):
+        config = SimpleNamespace(miniflux_fetch_mode="incremental", miniflux_fetch_state_file="fetch_state.json",
+                                 miniflux_page_size=3)
+        saved = []
+
+        def submit(entry):
+            future = concurrent.futures.Future()
+            result = outcome(entry["id"])
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+            return future
+
+        with mock.patch.object(fetch_module, "load_fetch_cursor", return_value=0), \
+                mock.patch.object(fetch_module, "save_fetch_cursor", lambda cursor, file_path: saved.append(cursor)), \
+                mock.patch.object(fetch_module, "filter_pending_entries", lambda config, entries: entries):
+            submit_unread_entries(config, FakeMinifluxClient(range(1, 8)), submit)
+        return saved
+
+    def test_cursor_moves_past_entries_that_succeeded(self):
+        self.assertEqual(self.run_incremental_poll(lambda entry_id: []), [7])
+
+    def test_cursor_stays_below_failed_entries(self):
+        def outcome(entry_id):
+            if entry_id == 4:
+                return RuntimeError("write-back failed")
+            return ["summary"] if entry_id == 6 else []
+
+        self.assertEqual(self.run_incremental_poll(outcome), [3])
+
+
+if __name__ == "__main__":
+    unittest.main()
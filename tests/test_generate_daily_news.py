@@ -0,0 +1,67 @@
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from core.generate_daily_news import chunk_budget, chunk_entries, map_reduce_summary, pack_chunks
+
+generate_daily_news_module = sys.modules["core.generate_daily_news"]
+
+
+class DailyNewsChunkingTestCase(unittest.TestCase):
+    def test_pack_chunks_respects_token_budget(self):
+        texts = ["a" * 40] * 5  # 11 estimated tokens each
+
+        chunks = pack_chunks(texts, max_tokens=25)
+
+        self.assertEqual([chunk.count("\n") + 1 for chunk in chunks], [2, 2, 1])
+
+    def test_pack_chunks_min_items_always_merges(self):
+        texts = ["a" * 400] * 3
+
+        chunks = pack_chunks(texts, max_tokens=10, min_items=2)
+
+        self.assertEqual(len(chunks), 2)
+
+    def test_pack_chunks_respects_character_budget(self):
+        chunks = pack_chunks(["abcd"] * 4, max_tokens=1000, max_chars=10)
+
+        self.assertEqual(chunks, ["abcd\nabcd"] * 2)
+
+    def test_chunk_budget_stays_within_the_llm_input_limits(self):
+        limits = SimpleNamespace(llm_max_input_tokens=1000, llm_max_length=5000)
+
+        with mock.patch.object(generate_daily_news_module, "config", limits):
+            self.assertEqual(chunk_budget(3000), (1000, 5000))
+            self.assertEqual(chunk_budget(500), (500, 5000))
+
+    def test_chunk_entries_groups_by_category(self):
+        entries = [
+            {"category": "Tech", "content": "t1"},
+            {"category": "World", "content": "w1"},
+            {"category": "Tech", "content": "t2"},
+        ]
+
+        chunks = chunk_entries(entries, max_tokens=1000)
+
+        self.assertEqual(chunks, ["## Tech\nt1\nt2", "## World\nw1"])
+
+    def test_map_reduce_summary_covers_every_chunk(self):
+        entries = [{"category": f"C{i}", "content": f"item {i}"} for i in range(5)]
+        calls = []
+
+        def fake_get_ai_result(prompt, content):
+            calls.append(content)
+            return f"summary({len(calls)})"
+
+        with mock.patch.object(generate_daily_news_module, "get_ai_result", fake_get_ai_result):
+            result = map_reduce_summary("prompt", entries, chunk_tokens=5)
+
+        mapped = [call for call in calls if call.startswith("## ")]
+        self.assertEqual(sorted(mapped), [f"## C{i}\nitem {i}" for i in range(5)])
+        self.assertTrue(result.startswith("summary("))
+        self.assertGreater(len(calls), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
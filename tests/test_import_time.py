@@ -0,0 +1,38 @@
+import importlib.util
+import unittest
+from pathlib import Path
+
+
+def load_import_time_module():
+    module_path = Path(__file__).resolve().parents[1] / "benchmarks" / "import_time.py"
+    spec = importlib.util.spec_from_file_location("import_time", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.import_time = load_import_time_module()
+
+    def test_parse_importtime_keeps_cumulative_time(self):
+        modules = self.import_time.parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   yaml\n"
+            "import time:       300 |        420 | main\n"
+        )
+
+        self.assertEqual(modules, {"yaml": 120, "main": 420})
+
+    def test_provider_sdks_are_not_imported_at_startup(self):
+        for provider in ("openai", "gemini"):
+            with self.subTest(provider=provider):
+                modules = self.import_time.measure_import("main", provider)
+
+                self.assertIn("main", modules)
+                for name in self.import_time.LAZY_MODULES:
+                    self.assertNotIn(name, modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from core.llm_cache import MemoryLLMCache, SQLiteLLMCache, make_cache_key
+
+
+class CacheKeyTestCase(unittest.TestCase):
+    def test_key_ignores_whitespace_differences(self):
+        first = make_cache_key("openai", "gpt", {}, "prompt", "<p>Hello   world</p>\n")
+        second = make_cache_key("openai", "gpt", {}, "prompt", " <p>Hello world</p>")
+
+        self.assertEqual(first, second)
+
+    def test_key_depends_on_model_params_and_prompt(self):
+        base = make_cache_key("openai", "gpt", {}, "prompt", "content")
+
+        self.assertNotEqual(base, make_cache_key("gemini", "gpt", {}, "prompt", "content"))
+        self.assertNotEqual(base, make_cache_key("openai", "other", {}, "prompt", "content"))
+        self.assertNotEqual(base, make_cache_key("openai", "gpt", {"temperature": 0}, "prompt", "content"))
+        self.assertNotEqual(base, make_cache_key("openai", "gpt", {}, "other prompt", "content"))
+        self.assertNotEqual(base, make_cache_key("openai", "gpt", {}, "prompt", "content", [100, None]))
+
+
+class LLMCacheTestMixin:
+    def make_cache(self, ttl=None, max_entries=None):
+        raise NotImplementedError
+
+    def test_get_returns_stored_value_and_counts_hits(self):
+        cache = self.make_cache()
+        cache.set("key", "value")
+
+        self.assertEqual(cache.get("key"), "value")
+        self.assertIsNone(cache.get("missing"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_expired_values_are_misses(self):
+        cache = self.make_cache(ttl=0.01)
+        cache.set("key", "value")
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get("key"))
+
+    def test_least_recently_used_value_is_evicted(self):
+        cache = self.make_cache(max_entries=2)
+        cache.set("a", "1")
+        time.sleep(0.001)
+        cache.set("b", "2")
+        time.sleep(0.001)
+        cache.get("a")
+        time.sleep(0.001)
+        cache.set("c", "3")
+
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "3")
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["size"], 2)
+
+
+class MemoryLLMCacheTestCase(LLMCacheTestMixin, unittest.TestCase):
+    def make_cache(self, ttl=None, max_entries=None):
+        return MemoryLLMCache(ttl, max_entries)
+
+
+class SQLiteLLMCacheTestCase(LLMCacheTestMixin, unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.caches = []
+
+    def tearDown(self):
+        for cache in self.caches:
+            cache.close()
+        self.tmpdir.cleanup()
+
+    def make_cache(self, ttl=None, max_entries=None):
+        cache = SQLiteLLMCache(Path(self.tmpdir.name) / "llm_cache.db", ttl, max_entries)
+        self.caches.append(cache)
+        return cache
+
+    def test_values_survive_reopen(self):
+        self.make_cache().set("key", "value")
+
+        self.assertEqual(self.make_cache().get("key"), "value")
+
+
+if __name__ == "__main__":
+    unittest.main()
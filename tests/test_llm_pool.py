@@ -0,0 +1,182 @@
+import asyncio
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core.get_ai_result import get_ai_result, get_cache_key
+from core.llm_cache import MemoryLLMCache
+from core.llm_pool import Endpoint, LLMPool, build_endpoints
+
+llm_pool_module = sys.modules["core.llm_pool"]
+get_ai_result_module = sys.modules["core.get_ai_result"]
+
+
+def make_endpoint(name, answer=None, error=None, **options):
+    def request(prompt, text):
+        if error:
+            raise error
+        return answer or name
+
+    async def request_async(prompt, text):
+        return request(prompt, text)
+
+    def health_check():
+        if error:
+            raise error
+
+    endpoint = Endpoint(name, **options)
+    endpoint.provider = SimpleNamespace(request=request, request_async=request_async, health_check=health_check)
+    return endpoint
+
+
+def send(endpoint):
+    return endpoint.get_provider().request("Summarize.", "text")
+
+
+class LLMPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.breakers = {}
+        patcher = mock.patch.object(
+            llm_pool_module,
+            "get_circuit_breaker",
+            lambda name: self.breakers.setdefault(name, CircuitBreaker(name, failure_threshold=1, reset_timeout=60)),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_least_outstanding_spreads_by_weight(self):
+        pool = LLMPool([make_endpoint("a", weight=2), make_endpoint("b")])
+
+        chosen = [pool.acquire(set()).name for _ in range(6)]
+
+        self.assertEqual(chosen.count("a"), 4)
+        self.assertEqual(chosen.count("b"), 2)
+
+    def test_latency_routing_prefers_the_faster_endpoint(self):
+        slow, fast = make_endpoint("slow"), make_endpoint("fast")
+        slow.latency, fast.latency = 2.0, 0.5
+        pool = LLMPool([slow, fast], routing="latency")
+
+        chosen = [pool.acquire(set()).name for _ in range(4)]
+
+        self.assertEqual(chosen, ["fast", "fast", "fast", "slow"])
+
+    def test_failed_request_fails_over_and_opens_the_circuit(self):
+        pool = LLMPool([make_endpoint("a", error=ConnectionError("down")), make_endpoint("b", weight=0.5)])
+
+        self.assertEqual(pool.request(send), "b")
+        self.assertEqual(self.breakers["a"].state, "open")
+        self.assertEqual(pool.request(send), "b")
+        self.assertEqual([endpoint.outstanding for endpoint in pool.endpoints], [0, 0])
+
+    def test_fallback_answer_is_cached_under_its_own_model(self):
+        primary = make_endpoint("a", error=ConnectionError("down"), model="large")
+        fallback = make_endpoint("b", model="small")
+        cache = MemoryLLMCache()
+
+        with mock.patch.object(get_ai_result_module, "get_llm_cache", return_value=cache), \
+                mock.patch.object(get_ai_result_module, "get_llm_pool", return_value=LLMPool([primary, fallback])):
+            self.assertEqual(get_ai_result("Summarize.", "text"), "b")
+            self.assertEqual(get_ai_result("Summarize.", "text"), "b")
+
+        self.assertIsNone(cache.get(get_cache_key("Summarize.", "text", primary)))
+        self.assertEqual(cache.get(get_cache_key("Summarize.", "text", fallback)), "b")
+
+    def test_last_error_is_raised_when_every_endpoint_failed(self):
+        pool = LLMPool([make_endpoint("a", error=ConnectionError("a down")),
+                        make_endpoint("b", error=ConnectionError("b down"))])
+
+        with self.assertRaises(ConnectionError):
+            pool.request(send)
+        with self.assertRaises(CircuitOpenError):
+            pool.request(send)
+
+    def test_rejected_request_neither_fails_over_nor_opens_the_circuit(self):
+        bad_request = type("BadRequestError", (Exception,), {"status_code": 400})("context length exceeded")
+        pool = LLMPool([make_endpoint("a", error=bad_request, weight=2), make_endpoint("b")])
+
+        with self.assertRaises(type(bad_request)):
+            pool.request(send)
+        self.assertEqual(self.breakers["a"].state, "closed")
+        self.assertNotIn("b", self.breakers)
+
+    def test_full_endpoints_wait_for_a_free_slot(self):
+        pool = LLMPool([make_endpoint("a", max_concurrency=1)])
+        endpoint = pool.acquire(set())
+        answers = []
+        waiter = threading.Thread(target=lambda: answers.append(pool.request(send)))
+        waiter.start()
+
+        waiter.join(0.1)
+        self.assertEqual(answers, [])
+        pool.release(endpoint, 0.1)
+        waiter.join(1)
+        self.assertEqual(answers, ["a"])
+
+    def test_async_waiters_are_woken_when_a_slot_frees(self):
+        pool = LLMPool([make_endpoint("a", max_concurrency=1)])
+        endpoint = pool.acquire(set())
+
+        async def main():
+            waiter = asyncio.ensure_future(pool.acquire_async(set()))
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiter.done())
+            threading.Timer(0.05, pool.release, (endpoint, 0.1)).start()
+            return await asyncio.wait_for(waiter, 1)
+
+        self.assertIs(asyncio.run(main()), endpoint)
+        self.assertEqual(pool.async_waiters, [])
+
+    def test_unhealthy_endpoints_are_skipped(self):
+        pool = LLMPool([make_endpoint("a", error=ConnectionError("down"), weight=10), make_endpoint("b")])
+
+        pool.check_health()
+
+        self.assertEqual([endpoint.healthy for endpoint in pool.endpoints], [False, True])
+        self.assertEqual(pool.acquire(set()).name, "b")
+
+    def test_async_requests_fail_over(self):
+        pool = LLMPool([make_endpoint("a", error=ConnectionError("down")), make_endpoint("b", weight=0.5)])
+
+        result = asyncio.run(pool.request_async(lambda endpoint: endpoint.get_provider().request_async("p", "t")))
+
+        self.assertEqual(result, "b")
+
+
+class BuildEndpointsTestCase(unittest.TestCase):
+    def test_endpoints_default_to_the_llm_settings(self):
+        fake_config = SimpleNamespace(
+            llm_provider="openai",
+            llm_base_url="http://localhost:11434/v1",
+            llm_api_key="ollama",
+            llm_model="llama3.1",
+            llm_endpoints=[
+                {"base_url": "http://ollama-1:11434/v1", "weight": 2},
+                {"base_url": "http://ollama-1:11434/v1", "model": "qwen2.5"},
+                {"name": "hosted", "base_url": "https://api.openai.com/v1", "api_key": "sk", "model": "gpt-4o-mini"},
+            ],
+        )
+
+        with mock.patch.object(llm_pool_module, "config", fake_config):
+            endpoints = build_endpoints()
+
+        self.assertEqual([e.name for e in endpoints], ["ollama-1:11434", "ollama-1:11434#1", "hosted"])
+        self.assertEqual([e.model for e in endpoints], ["llama3.1", "qwen2.5", "gpt-4o-mini"])
+        self.assertEqual([e.api_key for e in endpoints], ["ollama", "ollama", "sk"])
+        self.assertEqual(endpoints[0].weight, 2)
+
+    def test_single_endpoint_is_named_after_the_provider(self):
+        fake_config = SimpleNamespace(llm_provider="gemini", llm_base_url=None, llm_api_key="key",
+                                      llm_model="gemini-2.5-flash", llm_endpoints=[])
+
+        with mock.patch.object(llm_pool_module, "config", fake_config):
+            endpoints = build_endpoints()
+
+        self.assertEqual([(e.name, e.provider_name) for e in endpoints], [("gemini", "gemini")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import asyncio
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from prometheus_client import REGISTRY
+
+from core.llm_providers import OutputBudget, collect_stream, collect_stream_async
+
+llm_providers_module = sys.modules["core.llm_providers"]
+
+
+LABELS = ("openai", "test-model")
+
+
+def stream_config(max_output_tokens=None, max_stream_seconds=None):
+    return SimpleNamespace(llm_max_output_tokens=max_output_tokens, llm_max_stream_seconds=max_stream_seconds)
+
+
+def stream_metric(name):
+    return REGISTRY.get_sample_value(name, {"provider": "openai", "model": "test-model", "agent": ""}) or 0
+
+
+class OutputBudgetTestCase(unittest.TestCase):
+    def test_tracks_first_token_and_token_budget(self):
+        budget = OutputBudget(max_tokens=3)
+
+        self.assertTrue(budget.add(None))
+        self.assertIsNone(budget.first_token_seconds)
+        self.assertTrue(budget.add("abcd"))
+        self.assertIsNotNone(budget.first_token_seconds)
+        self.assertFalse(budget.add("你好"))
+
+
+class CollectStreamTestCase(unittest.TestCase):
+    def test_stream_is_joined_and_closed(self):
+        closed = []
+
+        def chunks():
+            try:
+                yield from ["Hello", None, ", world"]
+            finally:
+                closed.append(True)
+
+        first_tokens = stream_metric("miniflux_ai_llm_first_token_seconds_count")
+
+        with mock.patch.object(llm_providers_module, "config", stream_config()):
+            self.assertEqual(collect_stream(chunks(), LABELS), "Hello, world")
+        self.assertEqual(closed, [True])
+        self.assertEqual(stream_metric("miniflux_ai_llm_first_token_seconds_count"), first_tokens + 1)
+
+    def test_runaway_stream_is_cut_at_output_budget(self):
+        produced = []
+
+        def chunks():
+            while True:
+                produced.append(1)
+                yield "word "
+
+        truncated = stream_metric("miniflux_ai_llm_truncated_streams_total")
+
+        with mock.patch.object(llm_providers_module, "config", stream_config(max_output_tokens=10)):
+            result = collect_stream(chunks(), LABELS)
+
+        self.assertTrue(result.endswith(" …"))
+        self.assertLess(len(produced), 20)
+        self.assertEqual(stream_metric("miniflux_ai_llm_truncated_streams_total"), truncated + 1)
+
+    def test_async_stream_is_cut_at_output_budget(self):
+        closed = []
+
+        async def chunks():
+            try:
+                while True:
+                    yield "word "
+            finally:
+                closed.append(True)
+
+        with mock.patch.object(llm_providers_module, "config", stream_config(max_output_tokens=10)):
+            result = asyncio.run(collect_stream_async(chunks(), LABELS))
+
+        self.assertTrue(result.endswith(" …"))
+        self.assertEqual(closed, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
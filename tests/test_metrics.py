@@ -0,0 +1,114 @@
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+from prometheus_client import REGISTRY
+
+from common.metrics import agent_context
+from core.get_ai_result import request_llm
+from core.llm_pool import Endpoint
+from core.miniflux_writer import InstrumentedSession, endpoint_label
+from myapp import app
+
+metrics_module = sys.modules["myapp.metrics"]
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class NotFoundHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class MinifluxMetricsTestCase(unittest.TestCase):
+    def test_endpoint_ids_are_replaced(self):
+        self.assertEqual(endpoint_label("https://rss.example.com/v1/entries/42"), "/v1/entries/:id")
+        self.assertEqual(endpoint_label("https://rss.example.com/v1/feeds/7/entries?limit=1"), "/v1/feeds/:id/entries")
+
+    def test_latency_and_errors_are_recorded(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), NotFoundHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        labels = {"method": "GET", "endpoint": "/v1/entries/:id"}
+        count = sample("miniflux_ai_miniflux_request_seconds_count", **labels)
+        errors = sample("miniflux_ai_miniflux_errors_total", reason="404", **labels)
+
+        response = InstrumentedSession().get(f"http://127.0.0.1:{server.server_port}/v1/entries/1")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(sample("miniflux_ai_miniflux_request_seconds_count", **labels), count + 1)
+        self.assertEqual(sample("miniflux_ai_miniflux_errors_total", reason="404", **labels), errors + 1)
+
+        with self.assertRaises(requests.ConnectionError):
+            InstrumentedSession().get("http://127.0.0.1:1/v1/entries/1")
+        self.assertEqual(sample("miniflux_ai_miniflux_errors_total", reason="ConnectionError", **labels), 1)
+
+
+class LLMMetricsTestCase(unittest.TestCase):
+    def test_request_latency_and_tokens_are_labelled_by_agent(self):
+        labels = {"provider": "openai", "model": "test-model", "agent": "summary"}
+        endpoint = Endpoint("openai", "openai", model="test-model")
+        endpoint.provider = SimpleNamespace(request=lambda prompt, request: "a short answer")
+
+        with agent_context("summary"):
+            request_llm("Summarize.", "some entry text", endpoint)
+
+        self.assertEqual(sample("miniflux_ai_llm_request_seconds_count", **labels), 1)
+        self.assertGreater(sample("miniflux_ai_llm_prompt_tokens_total", **labels), 0)
+        self.assertGreater(sample("miniflux_ai_llm_completion_tokens_total", **labels), 0)
+
+
+class MetricsEndpointTestCase(unittest.TestCase):
+    def test_metrics_are_served_with_queue_depth(self):
+        retry_queue = SimpleNamespace(stats=lambda: {"pending": 3, "dead": 1})
+        fake_config = SimpleNamespace(metrics_enabled=True, webhook_queue_enabled=False, agents={})
+
+        with mock.patch.object(metrics_module, "config", fake_config), \
+                mock.patch.object(metrics_module, "queue_collector", metrics_module.QueueCollector()), \
+                mock.patch.object(metrics_module, "get_retry_queue", return_value=retry_queue):
+            response = app.test_client().get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.get_data(as_text=True)
+        self.assertIn("miniflux_ai_llm_request_seconds", body)
+        self.assertIn('miniflux_ai_queue_depth{queue="retry"} 3.0', body)
+        self.assertIn('miniflux_ai_queue_depth{queue="dead_letter"} 1.0', body)
+
+    def test_queue_depth_is_counted_once_per_max_age(self):
+        retry_queue = mock.Mock()
+        retry_queue.stats.return_value = {"pending": 2}
+        fake_config = SimpleNamespace(metrics_enabled=True, webhook_queue_enabled=False, agents={})
+        collector = metrics_module.QueueCollector(max_age=60)
+
+        with mock.patch.object(metrics_module, "config", fake_config), \
+                mock.patch.object(metrics_module, "get_retry_queue", return_value=retry_queue):
+            first = list(collector.collect())[0].samples
+            retry_queue.stats.return_value = {"pending": 5}
+            second = list(collector.collect())[0].samples
+            collector.counted_at -= 60
+            third = list(collector.collect())[0].samples
+
+        self.assertEqual(retry_queue.stats.call_count, 2)
+        self.assertEqual([s.value for s in first], [2, 0])
+        self.assertEqual(first, second)
+        self.assertEqual([s.value for s in third], [5, 0])
+
+    def test_metrics_are_disabled_by_default(self):
+        with mock.patch.object(metrics_module, "config", SimpleNamespace(metrics_enabled=False)):
+            self.assertEqual(app.test_client().get("/metrics").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
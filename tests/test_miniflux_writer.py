@@ -0,0 +1,134 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+import miniflux
+import requests
+
+from core.miniflux_writer import MinifluxWriter, WriteConflict
+
+
+def error_response(status_code):
+    return SimpleNamespace(status_code=status_code, headers={}, json=lambda: {})
+
+
+class FakeMinifluxClient:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.entries = {}
+        self.updates = []
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_entry(self, entry_id):
+        return {"id": entry_id, "content": self.entries.get(entry_id, "")}
+
+    def update_entry(self, entry_id, content):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            self.release.wait(2)
+            if self.failures:
+                failure = self.failures.pop(0)
+                if failure == "applied":
+                    # the update reached Miniflux but the response was lost
+                    self.entries[entry_id] = content
+                    raise requests.ConnectionError("connection reset")
+                raise failure
+            self.updates.append((entry_id, content))
+            self.entries[entry_id] = content
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class MinifluxWriterTestCase(unittest.TestCase):
+    def make_writer(self, client, concurrency=1, retries=3):
+        writer = MinifluxWriter(client, concurrency=concurrency, retries=retries, backoff=0)
+        self.addCleanup(writer.close)
+        return writer
+
+    def test_pending_updates_for_an_entry_are_coalesced(self):
+        client = FakeMinifluxClient()
+        client.release.clear()
+        writer = self.make_writer(client)
+
+        blocker = writer.submit(1, "A: body", "A: ")
+        futures = [writer.submit(2, "B: body", "B: "), writer.submit(2, "C: B: body", "C: ")]
+        client.release.set()
+
+        self.assertEqual(blocker.result(timeout=2), "written")
+        self.assertEqual([future.result(timeout=2) for future in futures], ["written", "written"])
+        self.assertEqual(client.updates, [(1, "A: body"), (2, "C: B: body")])
+        self.assertEqual(writer.stats()["coalesced"], 1)
+
+    def test_updates_of_the_same_entry_are_rebased(self):
+        client = FakeMinifluxClient()
+        client.release.clear()
+        writer = self.make_writer(client)
+
+        futures = [writer.submit(1, "A: body", "A: "), writer.submit(1, "B: body", "B: "), writer.submit(1, "C: body", "C: ")]
+        client.release.set()
+
+        self.assertEqual([future.result(timeout=2) for future in futures], ["written"] * 3)
+        self.assertEqual(client.entries[1], "C: B: A: body")
+
+    def test_conflicting_updates_are_rejected(self):
+        client = FakeMinifluxClient()
+        client.release.clear()
+        writer = self.make_writer(client)
+
+        queued = writer.submit(1, "A: body", "A: ")
+        conflicting = writer.submit(1, "B: edited body", "B: ")
+        client.release.set()
+
+        with self.assertRaises(WriteConflict):
+            conflicting.result(timeout=2)
+        self.assertEqual(queued.result(timeout=2), "written")
+        self.assertEqual(client.entries[1], "A: body")
+
+    def test_retryable_errors_are_retried(self):
+        client = FakeMinifluxClient(failures=[requests.ConnectionError("down"), miniflux.ServerError(error_response(503))])
+        writer = self.make_writer(client)
+
+        self.assertEqual(writer.submit(1, "A: body", "A: ").result(timeout=2), "written")
+        self.assertEqual(client.updates, [(1, "A: body")])
+        self.assertEqual(writer.stats()["retried"], 2)
+
+    def test_retry_is_skipped_when_the_update_was_applied(self):
+        client = FakeMinifluxClient(failures=["applied"])
+        writer = self.make_writer(client)
+
+        self.assertEqual(writer.submit(1, "A: body", "A: ").result(timeout=2), "skipped")
+        self.assertEqual(client.updates, [])
+        self.assertEqual(client.entries[1], "A: body")
+
+    def test_client_errors_are_not_retried(self):
+        client = FakeMinifluxClient(failures=[miniflux.ResourceNotFound(error_response(404))])
+        writer = self.make_writer(client)
+
+        with self.assertRaises(miniflux.ClientError):
+            writer.submit(1, "A: body", "A: ").result(timeout=2)
+        self.assertEqual(writer.stats()["failed"], 1)
+        self.assertEqual(writer.stats()["retried"], 0)
+
+    def test_concurrency_is_limited(self):
+        client = FakeMinifluxClient()
+        client.release.clear()
+        writer = self.make_writer(client, concurrency=2)
+
+        futures = [writer.submit(entry_id, "A: body", "A: ") for entry_id in range(6)]
+        threading.Timer(0.1, client.release.set).start()
+        for future in futures:
+            future.result(timeout=2)
+
+        self.assertEqual(client.max_active, 2)
+        self.assertEqual(len(client.updates), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
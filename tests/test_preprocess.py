@@ -0,0 +1,75 @@
+import sys
+import unittest
+from unittest import mock
+
+from core.preprocess import preprocess_content, truncate_text
+from core.process_entries import run_agents
+from core.rate_limiter import estimate_tokens
+
+process_entries_module = sys.modules["core.process_entries"]
+preprocess_module = sys.modules["core.preprocess"]
+
+
+class PreprocessContentTestCase(unittest.TestCase):
+    def test_strips_boilerplate_and_converts_to_markdown(self):
+        html = (
+            "<nav>Home | About</nav>"
+            "<h2>Title</h2>"
+            '<p>Read <a href="https://example.com">this</a> now. <img src="x.png"></p>'
+            "<script>track()</script>"
+            "<p>The post Title appeared first on Example Blog.</p>"
+            "<footer>Copyright</footer>"
+        )
+
+        self.assertEqual(
+            preprocess_content(html),
+            "## Title\n\nRead [this](https://example.com) now.",
+        )
+
+    def test_plain_text_keeps_block_boundaries(self):
+        html = "<h2>Title</h2><p>Read <a href='u'>this</a> now.</p><ul><li>one</li><li>two</li></ul>"
+
+        self.assertEqual(preprocess_content(html, "text"), "Title\nRead this now.\none\ntwo")
+
+
+class TruncateTextTestCase(unittest.TestCase):
+    def test_short_text_is_unchanged(self):
+        self.assertEqual(truncate_text("One. Two.", max_tokens=100, max_chars=100), "One. Two.")
+
+    def test_cuts_at_sentence_boundary_within_token_budget(self):
+        text = "First sentence is here. Second sentence is here. Third sentence is here."
+
+        result = truncate_text(text, max_tokens=14)
+
+        self.assertEqual(result, "First sentence is here. Second sentence is here.")
+        self.assertLessEqual(estimate_tokens(result), 14)
+
+    def test_cuts_cjk_sentences(self):
+        self.assertEqual(truncate_text("第一句话。第二句话。", max_chars=6), "第一句话。")
+
+    def test_single_long_sentence_is_cut_proportionally(self):
+        result = truncate_text("a" * 400, max_tokens=10)
+
+        self.assertLessEqual(estimate_tokens(result), 11)
+        self.assertTrue(result)
+
+
+class RunAgentsPreprocessTestCase(unittest.TestCase):
+    def test_entry_is_converted_once_for_all_agents(self):
+        agents = [("summary", {"prompt": "a"}), ("translate", {"prompt": "b"})]
+        requests = []
+
+        def fake_get_ai_result(prompt, request):
+            requests.append(request)
+            return "ok"
+
+        with mock.patch.object(process_entries_module, "get_ai_result", fake_get_ai_result), \
+                mock.patch.object(preprocess_module, "to_text", wraps=preprocess_module.to_text) as to_text:
+            run_agents({"id": 1, "content": "<p>Unique body for the once test.</p>"}, agents)
+
+        self.assertEqual(to_text.call_count, 1)
+        self.assertEqual(requests, ["Unique body for the once test."] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
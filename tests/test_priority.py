@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import unittest
+from datetime import datetime, timezone
+
+from core.priority import EntryPrioritizer, PriorityExecutor, PrioritySemaphore
+
+NOW = 1_800_000_000
+
+
+def make_entry(hours_old=0.0, content="short", feed_id=1, category="News"):
+    return {
+        "id": 1,
+        "published_at": datetime.fromtimestamp(NOW - hours_old * 3600, timezone.utc).isoformat(),
+        "content": content,
+        "feed": {"id": feed_id, "title": "Feed", "site_url": "https://example.com", "category": {"title": category}},
+    }
+
+
+class EntryPrioritizerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.prioritizer = EntryPrioritizer(
+            feeds={"7": 4},
+            categories={"Tech": 2},
+            freshness_hours=24,
+            length_tokens=1000,
+            max_wait=600,
+        )
+
+    def test_feed_weight_beats_category_weight(self):
+        self.assertEqual(self.prioritizer.weight(make_entry(feed_id=7, category="Tech")), 4)
+        self.assertEqual(self.prioritizer.weight(make_entry(category="Tech")), 2)
+        self.assertEqual(self.prioritizer.weight(make_entry()), 1)
+
+    def test_fresh_and_short_entries_score_higher(self):
+        fresh = self.prioritizer.score(make_entry(hours_old=1), NOW)
+        old = self.prioritizer.score(make_entry(hours_old=72), NOW)
+        long = self.prioritizer.score(make_entry(hours_old=1, content="word " * 4000), NOW)
+
+        self.assertGreater(fresh, old)
+        self.assertGreater(fresh, long)
+        self.assertAlmostEqual(self.prioritizer.score(make_entry(hours_old=24), NOW), 0.5, places=2)
+
+    def test_waiting_entries_are_not_starved(self):
+        backlog_key = self.prioritizer.key(make_entry(hours_old=72), enqueued_at=NOW)
+        important_now = self.prioritizer.key(make_entry(feed_id=7), enqueued_at=NOW)
+        important_later = self.prioritizer.key(make_entry(feed_id=7), enqueued_at=NOW + 601)
+
+        self.assertGreater(important_now, backlog_key)
+        self.assertGreater(backlog_key, important_later)
+
+
+class PriorityExecutorTestCase(unittest.TestCase):
+    def test_highest_priority_runs_first(self):
+        started = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def blocker():
+            started.set()
+            release.wait(2)
+
+        with PriorityExecutor(max_workers=1) as executor:
+            executor.submit(0, blocker)
+            started.wait(2)
+            futures = [executor.submit(priority, order.append, priority) for priority in (1, 3, 2, 3)]
+            release.set()
+            for future in futures:
+                future.result(timeout=2)
+
+        self.assertEqual(order, [3, 3, 2, 1])
+
+    def test_exceptions_are_set_on_the_future(self):
+        with PriorityExecutor(max_workers=1) as executor:
+            future = executor.submit(0, lambda: 1 / 0)
+
+        with self.assertRaises(ZeroDivisionError):
+            future.result(timeout=2)
+
+
+class PrioritySemaphoreTestCase(unittest.TestCase):
+    def test_waiters_are_woken_by_priority(self):
+        async def scenario():
+            semaphore = PrioritySemaphore(1)
+            order = []
+
+            async def task(priority):
+                await semaphore.acquire(priority)
+                order.append(priority)
+                await asyncio.sleep(0)
+                semaphore.release()
+
+            await semaphore.acquire()
+            tasks = [asyncio.create_task(task(priority)) for priority in (1, 5, 3)]
+            await asyncio.sleep(0)
+            semaphore.release()
+            await asyncio.gather(*tasks)
+            return order, semaphore.value
+
+        order, value = asyncio.run(scenario())
+
+        self.assertEqual(order, [5, 3, 1])
+        self.assertEqual(value, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+from core.process_entries import run_agents
+
+process_entries_module = sys.modules["core.process_entries"]
+
+
+class RunAgentsTestCase(unittest.TestCase):
+    def test_agents_run_in_parallel_and_keep_configured_order(self):
+        agents = [
+            ("summary", {"prompt": "slow"}),
+            ("translate", {"prompt": "fast"}),
+        ]
+        barrier = threading.Barrier(2, timeout=2)
+
+        def fake_get_ai_result(prompt, request):
+            # both agents must be in flight at the same time to pass the barrier
+            barrier.wait()
+            time.sleep(0.05 if prompt == "slow" else 0)
+            return prompt + "-result"
+
+        with mock.patch.object(process_entries_module, "get_ai_result", fake_get_ai_result):
+            results = run_agents({"id": 1, "content": "body"}, agents)
+
+        self.assertEqual(results, ["slow-result", "fast-result"])
+
+    def test_failed_agent_returns_exception_without_cancelling_others(self):
+        agents = [
+            ("summary", {"prompt": "boom"}),
+            ("translate", {"prompt": "ok"}),
+        ]
+
+        def fake_get_ai_result(prompt, request):
+            if prompt == "boom":
+                raise RuntimeError("provider error")
+            return "ok-result"
+
+        with mock.patch.object(process_entries_module, "get_ai_result", fake_get_ai_result):
+            results = run_agents({"id": 1, "content": "body"}, agents)
+
+        self.assertIsInstance(results[0], RuntimeError)
+        self.assertEqual(results[1], "ok-result")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from core.rate_limiter import RateLimiter, TokenBucket, estimate_tokens, get_retry_after
+
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class FakeRateLimitError(Exception):
+    def __init__(self, headers=None):
+        super().__init__("rate limited")
+        self.status_code = 429
+        self.response = FakeResponse(headers or {})
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    def test_burst_up_to_capacity_then_queue(self):
+        bucket = TokenBucket(60, now=0)
+
+        delays = [bucket.reserve(1, now=0) for _ in range(62)]
+
+        self.assertEqual(delays[:60], [0.0] * 60)
+        self.assertAlmostEqual(delays[60], 1.0)
+        self.assertAlmostEqual(delays[61], 2.0)
+
+    def test_refills_over_time(self):
+        bucket = TokenBucket(60, now=0)
+        for _ in range(60):
+            bucket.reserve(1, now=0)
+
+        self.assertEqual(bucket.reserve(1, now=1.0), 0.0)
+
+    def test_oversized_request_is_capped_at_capacity(self):
+        bucket = TokenBucket(100, now=0)
+
+        self.assertEqual(bucket.reserve(1000, now=0), 0.0)
+        self.assertAlmostEqual(bucket.reserve(100, now=0), 60.0)
+
+
+class RateLimiterTestCase(unittest.TestCase):
+    def test_token_budget_delays_requests(self):
+        limiter = RateLimiter(rpm=1000, tpm=600)
+
+        self.assertEqual(limiter.reserve(600), 0.0)
+        self.assertAlmostEqual(limiter.reserve(60), 6.0, places=1)
+
+    def test_completion_tokens_are_charged_to_the_budget(self):
+        limiter = RateLimiter(rpm=1000, tpm=600)
+
+        self.assertEqual(limiter.reserve(300), 0.0)
+        limiter.charge(300)
+        self.assertAlmostEqual(limiter.reserve(60), 6.0, places=1)
+
+    def test_pause_holds_back_next_reservation(self):
+        limiter = RateLimiter(rpm=1000)
+        limiter.pause(5)
+
+        self.assertGreater(limiter.reserve(), 4.9)
+
+
+class HelpersTestCase(unittest.TestCase):
+    def test_estimate_tokens_counts_cjk_characters_individually(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("a" * 40), 11)
+        self.assertEqual(estimate_tokens("新闻摘要"), 5)
+
+    def test_get_retry_after_reads_header(self):
+        self.assertEqual(get_retry_after(FakeRateLimitError({"retry-after": "12"})), 12.0)
+        self.assertEqual(get_retry_after(FakeRateLimitError()), 5)
+        self.assertIsNone(get_retry_after(ValueError("other error")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from core.circuit_breaker import CircuitOpenError
+from core.retry_queue import RetryQueue, RetryWorkers, retry_agent
+
+retry_queue_module = sys.modules["core.retry_queue"]
+
+AGENT = ("summary", {"title": "S: ", "prompt": "Summarize.", "style_block": False})
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+class FakeMinifluxClient:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def get_entry(self, entry_id):
+        return dict(self.entries[entry_id])
+
+
+class RetryQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = Path(self.tmpdir.name) / "retry_queue.db"
+        self.queue = RetryQueue(self.db_path, max_attempts=3, backoff=10, max_backoff=100)
+        self.addCleanup(self.queue.close)
+
+    def test_failed_calls_survive_a_restart(self):
+        self.queue.add(1, "summary", "body", RuntimeError("timeout"), retry_at=0)
+        self.queue.close()
+
+        self.queue = RetryQueue(self.db_path)
+        self.assertEqual(self.queue.due(), [(1, "summary", "body")])
+
+    def test_backoff_grows_and_ends_in_dead_letter(self):
+        self.queue.add(1, "summary", "body", RuntimeError("timeout"))
+        self.assertEqual(self.queue.due(), [])
+        self.assertEqual(len(self.queue.due(now=time.time() + 10)), 1)
+
+        self.assertFalse(self.queue.fail(1, "summary", RuntimeError("timeout")))
+        # the second attempt waits 10 to 20 seconds
+        self.assertEqual(self.queue.due(now=time.time() + 9), [])
+        self.assertEqual(len(self.queue.due(now=time.time() + 20)), 1)
+
+        self.assertTrue(self.queue.fail(1, "summary", RuntimeError("timeout")))
+        self.assertEqual(self.queue.due(now=time.time() + 1000), [])
+        self.assertEqual(self.queue.stats(), {"dead": 1})
+
+    def test_only_the_failed_agent_is_retried(self):
+        self.queue.add(1, "summary", "body", RuntimeError("timeout"), retry_at=0)
+        miniflux_client = FakeMinifluxClient({1: {"id": 1, "content": "T: done<p>body</p>"}})
+        applied = []
+
+        with mock.patch.object(retry_queue_module, "config", SimpleNamespace(agents=dict([AGENT]))), \
+                mock.patch.object(retry_queue_module, "get_ai_result", return_value="short") as get_ai_result, \
+                mock.patch("core.process_entries.apply_agent_result", lambda *args: applied.append(args)):
+            retry_agent(miniflux_client, self.queue, 1, "summary", "body")
+
+        get_ai_result.assert_called_once_with("Summarize.", "body")
+        self.assertEqual(applied, [(miniflux_client, 1, AGENT, "short")])
+        self.assertEqual(self.queue.stats(), {})
+
+    def test_open_circuit_postpones_without_counting_an_attempt(self):
+        self.queue.add(1, "summary", "body", RuntimeError("timeout"), retry_at=0)
+        retry_at = time.time() + 60
+
+        with mock.patch.object(retry_queue_module, "config", SimpleNamespace(agents=dict([AGENT]))), \
+                mock.patch.object(retry_queue_module, "get_ai_result", side_effect=CircuitOpenError("openai", retry_at)):
+            retry_agent(None, self.queue, 1, "summary", "body")
+
+        self.assertEqual(self.queue.due(), [])
+        self.assertEqual(self.queue.due(now=retry_at), [(1, "summary", "body")])
+        row = self.queue.conn.execute("SELECT attempts FROM retries").fetchone()
+        self.assertEqual(row, (1,))
+
+    def test_rejected_requests_are_dead_lettered_on_the_first_failure(self):
+        self.queue.add(1, "summary", "body", TimeoutError("timeout"), retry_at=0)
+
+        with mock.patch.object(retry_queue_module, "config", SimpleNamespace(agents=dict([AGENT]))), \
+                mock.patch.object(retry_queue_module, "get_ai_result", side_effect=BadRequestError("context length")):
+            retry_agent(None, self.queue, 1, "summary", "body")
+
+        self.assertEqual(self.queue.stats(), {"dead": 1})
+
+    def test_running_retries_are_not_submitted_twice(self):
+        workers = RetryWorkers(max_workers=2)
+        self.addCleanup(workers.executor.shutdown)
+        release = threading.Event()
+        calls = []
+
+        def retry(name):
+            calls.append(name)
+            release.wait(5)
+
+        self.assertTrue(workers.submit((1, "summary"), retry, "first"))
+        self.assertFalse(workers.submit((1, "summary"), retry, "second"))
+        release.set()
+        workers.executor.shutdown()
+
+        self.assertEqual(calls, ["first"])
+        self.assertEqual(workers.running, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
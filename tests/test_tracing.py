@@ -0,0 +1,89 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+try:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+except ImportError:
+    TracerProvider = None
+
+from common.tracing import build_exporter, build_tracer, span
+from core.llm_pool import Endpoint, LLMPool
+from core.process_entries import run_agents
+
+tracing_module = sys.modules["common.tracing"]
+get_ai_result_module = sys.modules["core.get_ai_result"]
+
+
+@unittest.skipIf(TracerProvider is None, "opentelemetry-sdk is not installed")
+class TracingTestCase(unittest.TestCase):
+    def trace_with(self, exporter):
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        patcher = mock.patch.object(tracing_module, "get_tracer", lambda: provider.get_tracer("test"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_agent_threads_continue_the_entry_trace(self):
+        exporter = InMemorySpanExporter()
+        self.trace_with(exporter)
+        agents = [("summary", {"prompt": "Summarize."}), ("translate", {"prompt": "Translate."})]
+        endpoint = Endpoint("openai")
+        endpoint.provider = SimpleNamespace(request=lambda prompt, request: prompt + " done")
+
+        with mock.patch.object(get_ai_result_module, "get_llm_cache", return_value=None), \
+                mock.patch.object(get_ai_result_module, "get_llm_pool", return_value=LLMPool([endpoint])), \
+                span("process_entry", {"entry.id": 1}):
+            results = run_agents({"id": 1, "content": "<p>body</p>"}, agents)
+
+        self.assertEqual(results, ["Summarize. done", "Translate. done"])
+        spans = {}
+        for finished in exporter.get_finished_spans():
+            spans.setdefault(finished.name, []).append(finished)
+        root = spans["process_entry"][0]
+        self.assertEqual({s.context.trace_id for group in spans.values() for s in group}, {root.context.trace_id})
+        self.assertEqual(spans["preprocess"][0].parent.span_id, root.context.span_id)
+        self.assertEqual({s.parent.span_id for s in spans["agent"]}, {root.context.span_id})
+        self.assertEqual(
+            {s.parent.span_id for s in spans["get_ai_result"]},
+            {s.context.span_id for s in spans["agent"]},
+        )
+        self.assertEqual(len(spans["llm.request"]), 2)
+        self.assertEqual(len(spans["rate_limit.wait"]), 2)
+
+    def test_file_exporter_writes_one_span_per_line(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "traces.jsonl"
+            exporter = build_exporter("file", path)
+            self.trace_with(exporter)
+
+            with span("process_entry", {"entry.id": 7}):
+                with span("preprocess"):
+                    pass
+            exporter.shutdown()
+
+            self.assertTrue(exporter.out.closed)
+            lines = path.read_text().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["preprocess", "process_entry"])
+
+    def test_sample_rate_zero_records_nothing(self):
+        tracer = build_tracer("file", "/dev/null", sample_rate=0.0)
+        with tracer.start_as_current_span("process_entry") as current:
+            self.assertFalse(current.is_recording())
+
+
+class DisabledTracingTestCase(unittest.TestCase):
+    def test_span_is_a_no_op_when_disabled(self):
+        with mock.patch.object(tracing_module, "config", SimpleNamespace(tracing_enabled=False)):
+            with span("process_entry") as current:
+                self.assertIsNone(current)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from core.work_queue import WorkQueue, start_queue_workers
+
+
+class WorkQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.queue_file = Path(self.tmpdir.name) / "webhook_queue.db"
+        self.queue = WorkQueue(self.queue_file, max_size=2)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmpdir.cleanup()
+
+    def test_put_get_done_in_fifo_order(self):
+        self.queue.put({"id": 2, "content": "b"})
+        self.queue.put({"id": 1, "content": "a"})
+
+        self.assertEqual(self.queue.get(timeout=0)["id"], 2)
+        self.assertEqual(self.queue.get(timeout=0)["id"], 1)
+        self.assertIsNone(self.queue.get(timeout=0))
+        self.queue.done(2)
+        self.queue.done(1)
+        self.assertEqual(self.queue.stats()["completed"], 2)
+
+    def test_higher_priority_is_claimed_first(self):
+        self.queue.put({"id": 1}, priority=0.5)
+        self.queue.put({"id": 2}, priority=2.0)
+
+        self.assertEqual(self.queue.get(timeout=0)["id"], 2)
+        self.assertEqual(self.queue.get(timeout=0)["id"], 1)
+
+    def test_duplicate_and_full_entries_are_not_queued(self):
+        self.assertEqual(self.queue.put({"id": 1}), "queued")
+        self.assertEqual(self.queue.put({"id": 1}), "duplicate")
+        self.assertEqual(self.queue.put({"id": 2}), "queued")
+        self.assertEqual(self.queue.put({"id": 3}), "full")
+
+        stats = self.queue.stats()
+        self.assertEqual(stats["depth"], 2)
+        self.assertEqual(stats["deduplicated"], 1)
+        self.assertEqual(stats["rejected"], 1)
+
+    def test_claimed_entries_are_requeued_after_restart(self):
+        self.queue.put({"id": 1})
+        self.queue.get(timeout=0)
+        self.queue.close()
+
+        self.queue = WorkQueue(self.queue_file, max_size=2)
+
+        self.assertEqual(self.queue.requeue_claimed(), 1)
+        self.assertEqual(self.queue.get(timeout=0), {"id": 1})
+
+    def test_opening_the_file_does_not_release_claimed_entries(self):
+        self.queue.put({"id": 1})
+        self.queue.get(timeout=0)
+
+        other = WorkQueue(self.queue_file, max_size=2)
+        self.addCleanup(other.close)
+
+        self.assertIsNone(self.queue.get(timeout=0))
+        self.assertEqual(other.stats()["in_flight"], 1)
+
+    def test_failed_entries_are_kept_and_handed_out_again(self):
+        queue = WorkQueue(Path(self.tmpdir.name) / "retry.db", max_attempts=2, backoff=0)
+        self.addCleanup(queue.close)
+        queue.put({"id": 1})
+
+        queue.get(timeout=0)
+        self.assertTrue(queue.fail(1))
+        self.assertEqual(queue.get(timeout=0), {"id": 1})
+        self.assertFalse(queue.fail(1))
+        self.assertIsNone(queue.get(timeout=0))
+        self.assertEqual(queue.stats()["failed_entries"], 1)
+
+        # the webhook sending the entry again starts over
+        self.assertEqual(queue.put({"id": 1, "content": "new"}), "queued")
+        self.assertEqual(queue.get(timeout=0), {"id": 1, "content": "new"})
+
+    def test_failed_entries_wait_for_the_backoff(self):
+        self.queue.put({"id": 1})
+        self.queue.get(timeout=0)
+
+        self.assertTrue(self.queue.fail(1))
+
+        self.assertIsNone(self.queue.get(timeout=0))
+        self.assertEqual(self.queue.stats()["depth"], 1)
+
+    def test_workers_drain_queue(self):
+        processed = []
+        finished = threading.Event()
+
+        def process(entry):
+            processed.append(entry["id"])
+            if len(processed) == 2:
+                finished.set()
+
+        self.queue.put({"id": 1})
+        self.queue.put({"id": 2})
+        stop_event = threading.Event()
+        threads = start_queue_workers(self.queue, process, workers=2, stop_event=stop_event)
+
+        self.assertTrue(finished.wait(timeout=5))
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(sorted(processed), [1, 2])
+
+    def test_workers_keep_entries_whose_agents_failed(self):
+        queue = WorkQueue(Path(self.tmpdir.name) / "workers.db", max_attempts=1)
+        self.addCleanup(queue.close)
+        queue.put({"id": 1})
+        stop_event = threading.Event()
+        threads = start_queue_workers(queue, lambda entry: ["summary"], workers=1, stop_event=stop_event)
+
+        deadline = time.monotonic() + 5
+        while queue.stats()["failed_entries"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(queue.stats()["failed_entries"], 1)
+        self.assertEqual(queue.stats()["completed"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()